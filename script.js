@@ -2,7 +2,15 @@
 let cart = [];
 let cartCount = 0;
 
-// Subject data for each grade
+// Catalogue snapshots written by the importer and served by the backend.
+// latest.json is revalidated; every other file is content-hashed and cached forever.
+// The backend serves them on the page's own origin; a page hosted elsewhere sets
+// window.CATALOGUE_URL before loading this script.
+const CATALOGUE_URL = window.CATALOGUE_URL
+    || (window.location.protocol === 'file:' ? 'http://localhost:5000' : window.location.origin) + '/catalogue';
+let catalogueIndex = null;
+
+// CAPS subjects for each grade, shown when the catalogue index cannot be loaded
 const gradeSubjects = {
     'preschool': ['Life Skills', 'English', 'Mathematics', 'Creative Arts'],
     'reception': ['Life Skills', 'English', 'Mathematics', 'Creative Arts', 'Afrikaans'],
@@ -66,10 +74,16 @@ function showNotification(message) {
     }, 3000);
 }
 
-// Show subjects for a grade
-function showSubjects(grade, gradeName) {
-    const subjects = gradeSubjects[grade];
-    if (!subjects) return;
+// Show subjects for a grade: the ones the catalogue has shards for, with their counts
+async function showSubjects(grade, gradeName) {
+    let subjects;
+    try {
+        const shards = (await loadCatalogueIndex()).shards[grade] || {};
+        subjects = Object.keys(shards).sort().map(subject => ({ name: subject, count: shards[subject].count }));
+    } catch (error) {
+        console.error('Catalogue error:', error);
+        subjects = (gradeSubjects[grade] || []).map(subject => ({ name: subject, count: null }));
+    }
     
     // Create modal overlay
     const modal = document.createElement('div');
@@ -77,43 +91,108 @@ function showSubjects(grade, gradeName) {
     modal.innerHTML = `
         <div class="modal-content">
             <button class="close-modal">&times;</button>
-            <h2 class="modal-title">${gradeName} - Select a Subject</h2>
+            <h2 class="modal-title">${escapeHtml(gradeName)} - Select a Subject</h2>
             <div class="subjects-grid">
-                ${subjects.map(subject => `
+                ${subjects.length ? subjects.map((subject, i) => `
                     <div class="subject-card">
                         <div class="subject-icon">📚</div>
-                        <h3>${subject}</h3>
-                        <p>Click here for ${subject} Resources</p>
-                        <button class="btn-subject" onclick="viewSubject('${grade}', '${subject}')">View Resources</button>
+                        <h3>${escapeHtml(subject.name)}</h3>
+                        <p class="subject-count">${subject.count === null
+                            ? `Click here for ${escapeHtml(subject.name)} Resources`
+                            : `${subject.count} resources available`}</p>
+                        <button class="btn-subject" data-subject="${i}">View Resources</button>
                     </div>
-                `).join('')}
+                `).join('') : '<p>No resources available yet.</p>'}
             </div>
         </div>
     `;
     
     document.body.appendChild(modal);
-    
-    // Close modal functionality
-    const closeBtn = modal.querySelector('.close-modal');
-    closeBtn.addEventListener('click', () => {
+    closeModalOnDismiss(modal);
+    modal.querySelectorAll('[data-subject]').forEach(button => {
+        button.addEventListener('click', () => viewSubject(grade, subjects[button.dataset.subject].name));
+    });
+}
+
+// Close a modal from its close button or a click on the background
+function closeModalOnDismiss(modal) {
+    const close = () => {
         modal.style.animation = 'fadeOut 0.3s ease-out';
         setTimeout(() => document.body.removeChild(modal), 300);
-    });
-    
-    // Close on background click
+    };
+    modal.querySelector('.close-modal').addEventListener('click', close);
     modal.addEventListener('click', (e) => {
-        if (e.target === modal) {
-            modal.style.animation = 'fadeOut 0.3s ease-out';
-            setTimeout(() => document.body.removeChild(modal), 300);
-        }
+        if (e.target === modal) close();
     });
 }
 
+function escapeHtml(text) {
+    const div = document.createElement('div');
+    div.textContent = text;
+    return div.innerHTML;
+}
+
+// Current facet index: one revalidated fetch of latest.json, then the cached index
+function loadCatalogueIndex() {
+    if (!catalogueIndex) {
+        catalogueIndex = fetch(`${CATALOGUE_URL}/latest.json`, { cache: 'no-cache' })
+            .then(response => response.json())
+            .then(latest => fetch(`${CATALOGUE_URL}/${latest.index}`))
+            .then(response => response.json())
+            .catch(error => {
+                catalogueIndex = null;
+                throw error;
+            });
+    }
+    return catalogueIndex;
+}
+
+// Products for one grade and subject, newest first, from its snapshot shard
+async function loadSubjectProducts(grade, subject) {
+    const index = await loadCatalogueIndex();
+    const shard = (index.shards[grade] || {})[subject];
+    if (!shard) return [];
+    const response = await fetch(`${CATALOGUE_URL}/${shard.file}`);
+    return (await response.json()).products;
+}
+
 // View subject resources
-function viewSubject(grade, subject) {
+async function viewSubject(grade, subject) {
     showNotification(`Loading ${subject} resources for ${grade}...`);
-    // Here you would load the actual resources
-    console.log(`Loading resources for ${grade} - ${subject}`);
+    let products;
+    try {
+        products = await loadSubjectProducts(grade, subject);
+    } catch (error) {
+        console.error('Catalogue error:', error);
+        showNotification('Could not load resources, please try again');
+        return;
+    }
+    
+    const modal = document.createElement('div');
+    modal.className = 'subjects-modal';
+    modal.innerHTML = `
+        <div class="modal-content">
+            <button class="close-modal">&times;</button>
+            <h2 class="modal-title">${escapeHtml(subject)} Resources</h2>
+            <div class="subjects-grid">
+                ${products.length ? products.map((product, i) => `
+                    <div class="subject-card">
+                        <div class="subject-icon">📄</div>
+                        <h3>${escapeHtml(product.title)}</h3>
+                        <p>${escapeHtml(product.fileType)} | ${product.pages} pages | ${escapeHtml(product.fileSize)}</p>
+                        <p>R${product.price.toFixed(2)}</p>
+                        <button class="btn-subject" data-product="${i}">Add to Cart</button>
+                    </div>
+                `).join('') : '<p>No resources available yet.</p>'}
+            </div>
+        </div>
+    `;
+    
+    document.body.appendChild(modal);
+    closeModalOnDismiss(modal);
+    modal.querySelectorAll('[data-product]').forEach(button => {
+        button.addEventListener('click', () => addToCart(products[button.dataset.product]));
+    });
 }
 
 // Smooth scrolling for navigation links
@@ -0,0 +1,97 @@
+import os
+import zipfile
+
+from instrumentation import emit
+
+try:
+    import rarfile
+except ImportError:
+    rarfile = None
+
+try:
+    import py7zr
+except ImportError:
+    py7zr = None
+
+# Members larger than this are skipped rather than read into memory
+MAX_MEMBER_BYTES = 256 * 1024 * 1024
+
+# 7z archives are usually solid, so members are read in groups of roughly this
+# many uncompressed bytes per decompression pass
+SEVEN_ZIP_BATCH_BYTES = 64 * 1024 * 1024
+
+# Display path of a member: <archive path>!/<path inside the archive>
+MEMBER_SEPARATOR = '!/'
+
+def member_path(archive_path, member_name):
+    return f"{archive_path}{MEMBER_SEPARATOR}{member_name}"
+
+def _wanted(name, size, suffixes, archive_path):
+    if os.path.splitext(name)[1].lower() not in suffixes:
+        return False
+    if size > MAX_MEMBER_BYTES:
+        emit('skipped', [f"  ⚠️  {name} is too large to read from {os.path.basename(archive_path)}, skipping..."],
+             path=member_path(archive_path, name), reason='member too large')
+        return False
+    return True
+
+def _iter_zip(archive_path, suffixes):
+    with zipfile.ZipFile(archive_path) as archive:
+        for info in archive.infolist():
+            if info.is_dir() or not _wanted(info.filename, info.file_size, suffixes, archive_path):
+                continue
+            yield info.filename, lambda info=info: archive.read(info)
+
+def _iter_rar(archive_path, suffixes):
+    with rarfile.RarFile(archive_path) as archive:
+        # infolist() is in archive order, so solid archives are decompressed once
+        for info in archive.infolist():
+            if info.is_dir() or not _wanted(info.filename, info.file_size, suffixes, archive_path):
+                continue
+            yield info.filename, lambda info=info: archive.read(info)
+
+def _iter_7z(archive_path, suffixes):
+    with py7zr.SevenZipFile(archive_path, 'r') as archive:
+        members = [info for info in archive.list()
+                   if not info.is_directory and _wanted(info.filename, info.uncompressed, suffixes, archive_path)]
+        batch = []
+        batch_bytes = 0
+        for i, info in enumerate(members):
+            batch.append(info.filename)
+            batch_bytes += info.uncompressed
+            if batch_bytes < SEVEN_ZIP_BATCH_BYTES and i < len(members) - 1:
+                continue
+            archive.reset()
+            contents = archive.read(batch)
+            for name in batch:
+                data = contents[name].read()
+                yield name, lambda data=data: data
+            batch = []
+            batch_bytes = 0
+
+ARCHIVE_READERS = {
+    '.zip': _iter_zip,
+    '.rar': _iter_rar if rarfile else None,
+    '.7z': _iter_7z if py7zr else None
+}
+
+def archive_supported(archive_path):
+    """True if the library needed to read this kind of archive is installed"""
+    return ARCHIVE_READERS.get(os.path.splitext(archive_path)[1].lower()) is not None
+
+def iter_archive_members(archive_path, suffixes):
+    """Yield (member name, bytes) for supported documents inside an archive, in archive order
+
+    Members are read one at a time straight from the archive, never extracted
+    to disk; nested archives and directories are skipped. A member that cannot
+    be read (encrypted, corrupt) is reported and skipped.
+    """
+    reader = ARCHIVE_READERS[os.path.splitext(archive_path)[1].lower()]
+    for name, read in reader(archive_path, suffixes):
+        try:
+            data = read()
+        except Exception as e:
+            emit('error', [f"  ❌ Error reading {name} from {os.path.basename(archive_path)}: {e}"],
+                 path=member_path(archive_path, name), error=str(e))
+            continue
+        yield name, data
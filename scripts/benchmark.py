@@ -0,0 +1,822 @@
+import io
+import os
+import re
+import sys
+import random
+import json
+import time
+import argparse
+import shutil
+import platform
+import tempfile
+import subprocess
+import statistics
+from itertools import accumulate
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+from contextlib import redirect_stdout
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+import organize_pdfs
+from organize_pdfs import (
+    PdfReader, Document, load_workbook, Presentation,
+    RESOURCES_FOLDER, GRADE_PATTERNS, SUBJECT_PATTERNS, TYPE_PATTERNS, SCAN_SUFFIXES,
+    extract_document, get_file_type, classify, clean_text_for_filename,
+    extract_text_from_pdf, extract_text_from_docx, extract_text_from_excel, extract_text_from_pptx,
+    extract_grade, extract_subject, extract_type
+)
+
+from placement import PLACEMENT_MODES, place_file
+from scanner import scan_files
+from search_index import SearchIndex
+from instrumentation import configure_output, percentile
+from import_to_database import (
+    MongoClient, bulk_upsert, collection_breakdown, ensure_indexes, import_to_database
+)
+from generate_corpus import generate_corpus, load_labels
+
+CLASSIFIER_CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'classifier_corpus.json')
+
+BENCHMARK_FORMATS = ['pdf', 'word', 'excel', 'powerpoint']
+
+def _peak_rss_kb():
+    """Peak resident set size of this process in KB (None where unsupported)"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, Linux reports kilobytes
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+def _legacy_parse(file_path):
+    """The pre-extractor code path: one open for text, a second for the page count"""
+    file_type = get_file_type(file_path)
+    text = ""
+    pages = 1
+    if file_type == 'pdf' and PdfReader:
+        reader = PdfReader(file_path)
+        for i in range(min(2, len(reader.pages))):
+            text += (reader.pages[i].extract_text() or "") + "\n"
+        pages = len(PdfReader(file_path).pages)
+    elif file_type == 'word' and Document:
+        for para in Document(file_path).paragraphs[:20]:
+            text += para.text + "\n"
+        pages = len(Document(file_path).paragraphs)
+    elif file_type == 'excel' and load_workbook:
+        for row in load_workbook(file_path).active.iter_rows(values_only=True, max_row=100):
+            text += " ".join(str(cell) for cell in row if cell)
+        pages = len(load_workbook(file_path).sheetnames)
+    elif file_type == 'powerpoint' and Presentation:
+        for slide in list(Presentation(file_path).slides)[:3]:
+            for shape in slide.shapes:
+                if hasattr(shape, "text"):
+                    text += shape.text + "\n"
+        pages = len(Presentation(file_path).slides)
+    return text.lower(), pages, os.path.getsize(file_path)
+
+def _single_open_parse(file_path):
+    """The current code path through extract_document"""
+    document = extract_document(file_path)
+    return document['text'], document['pages'], document['size']
+
+PARSE_MODES = {
+    'legacy': _legacy_parse,
+    'single-open': _single_open_parse
+}
+
+def _run_parse(mode, files):
+    """Parse every file with one mode; runs in a fresh process so peak RSS is per-mode"""
+    baseline = _peak_rss_kb()
+    parse = PARSE_MODES[mode]
+    start = time.perf_counter()
+    for file_path in files:
+        try:
+            parse(file_path)
+        except Exception:
+            pass
+    elapsed = time.perf_counter() - start
+    peak = _peak_rss_kb()
+    return elapsed, (peak - baseline) if peak is not None else None
+
+def collect_corpus(corpus_dir):
+    """Group every supported file under corpus_dir by file type"""
+    by_format = {fmt: [] for fmt in BENCHMARK_FORMATS}
+    for root, dirs, files in os.walk(corpus_dir):
+        for file in sorted(files):
+            fmt = get_file_type(file)
+            if fmt in by_format:
+                by_format[fmt].append(os.path.join(root, file))
+    return by_format
+
+def bench_extraction(corpus_dir, repeat=3):
+    """Compare legacy double-open parsing with single-open extraction per format"""
+    report = {}
+    context = multiprocessing.get_context('spawn')
+    for fmt, files in collect_corpus(corpus_dir).items():
+        if not files:
+            continue
+        report[fmt] = {'files': len(files)}
+        for mode in PARSE_MODES:
+            timings = []
+            rss = []
+            for _ in range(repeat):
+                with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                    elapsed, peak = executor.submit(_run_parse, mode, files).result()
+                timings.append(elapsed)
+                if peak is not None:
+                    rss.append(peak)
+            report[fmt][mode] = {
+                'seconds': round(statistics.median(timings), 4),
+                'ms_per_file': round(statistics.median(timings) / len(files) * 1000, 3),
+                'peak_rss_delta_kb': max(rss) if rss else None
+            }
+        print(f"  {fmt.upper()}: {len(files)} files")
+        for mode in PARSE_MODES:
+            result = report[fmt][mode]
+            print(f"    - {mode}: {result['ms_per_file']} ms/file, "
+                  f"peak RSS +{result['peak_rss_delta_kb']} KB")
+    return report
+
+def _legacy_classify(text, filename):
+    """The pre-classifier code path: one substring scan per pattern"""
+    combined = text + " " + filename.lower()
+    grade = next((g for g, patterns in GRADE_PATTERNS.items()
+                  if any(p in combined for p in patterns)), None)
+    
+    def best(table, default):
+        scores = {label: sum(combined.count(p) for p in patterns) for label, patterns in table.items()}
+        scores = {label: score for label, score in scores.items() if score}
+        return max(scores, key=scores.get) if scores else default
+    
+    years = re.findall(r'\b(20\d{2})\b', text + " " + filename)
+    return {
+        'grade': grade,
+        'subject': best(SUBJECT_PATTERNS, "General"),
+        'type': best(TYPE_PATTERNS, "worksheets"),
+        'year': years[0] if years else "2024"
+    }
+
+CLASSIFIERS = {
+    'legacy': _legacy_classify,
+    'compiled': classify
+}
+
+def load_classifier_corpus(corpus_path=CLASSIFIER_CORPUS):
+    """Load the labelled regression corpus of (filename, text, expected) records"""
+    with open(corpus_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def bench_classifier(corpus_path=CLASSIFIER_CORPUS, repeat=200):
+    """Accuracy on the labelled corpus plus throughput in docs/sec and MB/sec"""
+    corpus = load_classifier_corpus(corpus_path)
+    corpus_bytes = sum(len((doc['text'] + doc['filename']).encode('utf-8')) for doc in corpus)
+    report = {'documents': len(corpus)}
+    
+    for name, classifier in CLASSIFIERS.items():
+        correct = {field: 0 for field in ('grade', 'subject', 'type', 'year')}
+        misses = []
+        for doc in corpus:
+            result = classifier(doc['text'], doc['filename'])
+            for field, expected in doc['expected'].items():
+                if result[field] == expected:
+                    correct[field] += 1
+                else:
+                    misses.append({'filename': doc['filename'], 'field': field,
+                                   'expected': expected, 'got': result[field]})
+        
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for doc in corpus:
+                classifier(doc['text'], doc['filename'])
+        elapsed = time.perf_counter() - start
+        
+        accuracy = {field: round(hits / len(corpus), 4) for field, hits in correct.items()}
+        report[name] = {
+            'accuracy': accuracy,
+            'overall_accuracy': round(sum(correct.values()) / (len(corpus) * len(correct)), 4),
+            'docs_per_sec': round(len(corpus) * repeat / elapsed, 1),
+            'mb_per_sec': round(corpus_bytes * repeat / elapsed / 1024 / 1024, 2),
+            'misses': misses
+        }
+        print(f"  {name}: {report[name]['overall_accuracy']:.1%} accurate, "
+              f"{report[name]['docs_per_sec']} docs/sec, {report[name]['mb_per_sec']} MB/sec")
+    return report
+
+def _io_write_bytes():
+    """Bytes this process has caused to be written to storage (Linux only)"""
+    try:
+        with open('/proc/self/io', 'r') as f:
+            for line in f:
+                if line.startswith('write_bytes:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+def make_synthetic_tree(root, files, file_size, seed=42):
+    """Write `files` files of `file_size` seeded random bytes across nested folders"""
+    block = random.Random(seed).randbytes(min(file_size, 1024 * 1024))
+    paths = []
+    for i in range(files):
+        folder = os.path.join(root, f"dir{i % 16:02d}")
+        os.makedirs(folder, exist_ok=True)
+        path = os.path.join(folder, f"file{i:05d}.pdf")
+        with open(path, 'wb') as f:
+            # A unique prefix keeps files distinct for filesystems that dedupe
+            f.write(i.to_bytes(8, 'little'))
+            remaining = file_size - 8
+            while remaining > 0:
+                f.write(block[:remaining])
+                remaining -= len(block)
+        paths.append(path)
+    return paths
+
+def bench_placement(work_dir=None, files=200, file_size=1024 * 1024):
+    """Wall time and bytes written per placement mode on a synthetic tree"""
+    report = {'files': files, 'file_size': file_size}
+    for mode in PLACEMENT_MODES:
+        with tempfile.TemporaryDirectory(dir=work_dir) as tmp:
+            sources = make_synthetic_tree(os.path.join(tmp, 'src'), files, file_size)
+            dest = os.path.join(tmp, 'dest')
+            os.makedirs(dest)
+            if hasattr(os, 'sync'):
+                os.sync()
+            
+            usage_before = shutil.disk_usage(tmp).used
+            io_before = _io_write_bytes()
+            start = time.perf_counter()
+            used = {}
+            for i, src in enumerate(sources):
+                dst = os.path.join(dest, f"placed{i:05d}.pdf")
+                open(dst, 'wb').close()
+                actual = place_file(src, dst, mode)
+                used[actual] = used.get(actual, 0) + 1
+            if hasattr(os, 'sync'):
+                os.sync()
+            elapsed = time.perf_counter() - start
+            io_after = _io_write_bytes()
+            
+            report[mode] = {
+                'seconds': round(elapsed, 4),
+                'files_per_sec': round(files / elapsed, 1),
+                'io_write_bytes': (io_after - io_before) if io_before is not None else None,
+                'disk_used_delta_bytes': shutil.disk_usage(tmp).used - usage_before,
+                'modes_used': used
+            }
+        result = report[mode]
+        print(f"  {mode}: {result['seconds']}s, {result['files_per_sec']} files/sec, "
+              f"{result['io_write_bytes']} bytes written, used as {result['modes_used']}")
+    return report
+
+# Mix of names in the synthetic scan tree; most real folders also hold unsupported files
+SCAN_TREE_NAMES = ['doc{}.pdf', 'Doc{}.DOCX', 'sheet{}.xlsx', 'slides{}.pptx', 'image{}.png', 'notes{}.txt']
+
+def make_scan_tree(root, files, per_dir=100, fanout=10):
+    """Create `files` empty files, `per_dir` to a folder, in a tree `fanout` folders wide"""
+    created = 0
+    folder_index = 0
+    while created < files:
+        # Digits of the folder number (least significant first) make a nested path
+        parts = []
+        n = folder_index
+        while True:
+            parts.append(f"d{n % fanout}")
+            n //= fanout
+            if not n:
+                break
+        folder = os.path.join(root, *parts)
+        os.makedirs(folder, exist_ok=True)
+        for i in range(min(per_dir, files - created)):
+            name = SCAN_TREE_NAMES[(created + i) % len(SCAN_TREE_NAMES)].format(created + i)
+            open(os.path.join(folder, name), 'wb').close()
+        created += per_dir
+        folder_index += 1
+
+def _legacy_scan(root):
+    """The pre-scanner code path: os.walk, any(endswith) per file, then a stat per match"""
+    supported_extensions = ['.pdf', '.docx', '.doc', '.xlsx', '.xls', '.pptx', '.ppt']
+    for walk_root, dirs, files in os.walk(root):
+        dirs.sort()
+        for file in sorted(files):
+            if any(file.lower().endswith(ext) for ext in supported_extensions):
+                file_path = os.path.join(walk_root, file)
+                yield file_path, os.stat(file_path)
+
+def bench_scan(work_dir=None, files=500000, threads=8, repeat=3):
+    """Walk time, files/sec and time to first file for the legacy walk and the scanner"""
+    scanners = {
+        'legacy': _legacy_scan,
+        'scandir': lambda root: scan_files(root, SCAN_SUFFIXES, 1),
+        f'scandir-{threads}-threads': lambda root: scan_files(root, SCAN_SUFFIXES, threads)
+    }
+    report = {'files': files}
+    with tempfile.TemporaryDirectory(dir=work_dir) as tmp:
+        start = time.perf_counter()
+        make_scan_tree(tmp, files)
+        report['build_seconds'] = round(time.perf_counter() - start, 2)
+        print(f"  Built {files} files in {report['build_seconds']}s")
+        
+        for name, scan in scanners.items():
+            timings = []
+            first = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                found = 0
+                for _ in scan(tmp):
+                    if not found:
+                        first.append(time.perf_counter() - start)
+                    found += 1
+                timings.append(time.perf_counter() - start)
+            elapsed = statistics.median(timings)
+            report[name] = {
+                'matched': found,
+                'seconds': round(elapsed, 4),
+                'files_per_sec': round(files / elapsed, 1),
+                'first_file_ms': round(statistics.median(first) * 1000, 3) if first else None
+            }
+            result = report[name]
+            print(f"  {name}: {result['seconds']}s, {result['files_per_sec']} files/sec, "
+                  f"first file after {result['first_file_ms']} ms")
+    return report
+
+SEARCH_QUERIES = ['fractions', 'photosynthesis', 'algebra worksheet', 'exam 2023', 'mathematics', 'term 3 test',
+                  'afrikaans', 'memo', 'geography map', 'accounting ledger']
+
+def synthetic_vocabulary(rng, size=30000):
+    """Classifier corpus words mixed into `size` pseudo-words, in Zipf rank order"""
+    syllables = ['ka', 'ne', 'ti', 'mo', 'ra', 'lu', 'se', 'po', 'di', 'van', 'tor', 'eng', 'ba', 'shi', 'que']
+    words = {rng.choice(syllables) + rng.choice(syllables) + rng.choice(syllables) + rng.choice(syllables)
+             for _ in range(size * 2)}
+    words = sorted(words)[:size]
+    for doc in load_classifier_corpus():
+        words.extend(re.findall(r'[a-z]+', doc['text']))
+    words = sorted(set(words))
+    rng.shuffle(words)
+    return words
+
+def build_search_index(path, documents, seed=42):
+    """Fill a search index with `documents` synthetic documents
+
+    Text follows a Zipf distribution over a large vocabulary, as natural
+    language does, so common words match many documents and rare ones few.
+    """
+    rng = random.Random(seed)
+    vocabulary = synthetic_vocabulary(rng)
+    cum_weights = list(accumulate(1 / rank ** 1.1 for rank in range(1, len(vocabulary) + 1)))
+    grades = list(GRADE_PATTERNS)
+    subjects = list(SUBJECT_PATTERNS)
+    types = list(TYPE_PATTERNS)
+    with SearchIndex(path) as index:
+        for i in range(documents):
+            grade, subject, doc_type = rng.choice(grades), rng.choice(subjects), rng.choice(types)
+            year = str(rng.randint(2015, 2025))
+            result = {
+                'new_filename': f"{grade}-{subject.lower().replace(' ', '-')}-{doc_type}-{year}-{i}.pdf",
+                'original_path': f"{subject} {doc_type} {i}.pdf",
+                'grade': grade, 'subject': subject, 'type': doc_type, 'year': year, 'file_type': 'pdf'
+            }
+            text = " ".join(rng.choices(vocabulary, cum_weights=cum_weights, k=rng.randint(100, 400)))
+            index.upsert(result, f"{subject.lower()} {doc_type} {text}")
+        index.optimize()
+
+def bench_search(work_dir=None, documents=100000, repeat=5):
+    """Query latency (p50/p95/max ms) of the full-text index, cold and cached, with and without filters"""
+    report = {'documents': documents}
+    with tempfile.TemporaryDirectory(dir=work_dir) as tmp:
+        path = os.path.join(tmp, 'search.sqlite')
+        start = time.perf_counter()
+        build_search_index(path, documents)
+        report['build_seconds'] = round(time.perf_counter() - start, 2)
+        report['index_bytes'] = sum(os.path.getsize(os.path.join(tmp, name)) for name in os.listdir(tmp))
+        print(f"  Indexed {documents} documents in {report['build_seconds']}s "
+              f"({report['index_bytes'] // (1024 * 1024)} MB)")
+        
+        with SearchIndex(path) as index:
+            cases = {
+                'search': lambda q: index.search(q),
+                'search_grade_filter': lambda q: index.search(q, grade='grade10'),
+                'facets': lambda q: index.facets(q)
+            }
+            for name, run in cases.items():
+                report[name] = {}
+                # cold: every query computed from the index; warm: answered from the query cache
+                for temperature in ('cold', 'warm'):
+                    samples = []
+                    if temperature == 'warm':
+                        for query in SEARCH_QUERIES:
+                            run(query)
+                    for _ in range(repeat):
+                        for query in SEARCH_QUERIES:
+                            if temperature == 'cold':
+                                index.clear_cache()
+                            start = time.perf_counter()
+                            run(query)
+                            samples.append((time.perf_counter() - start) * 1000)
+                    samples.sort()
+                    report[name][temperature] = {
+                        'queries': len(samples),
+                        'p50_ms': round(percentile(samples, 0.50), 3),
+                        'p95_ms': round(percentile(samples, 0.95), 3),
+                        'max_ms': round(samples[-1], 3)
+                    }
+                    result = report[name][temperature]
+                    print(f"  {name} ({temperature}): p50 {result['p50_ms']} ms, "
+                          f"p95 {result['p95_ms']} ms, max {result['max_ms']} ms")
+    return report
+
+def make_results(records, seed=42):
+    """Synthetic organizer results shaped like the real JSONL records"""
+    rng = random.Random(seed)
+    grades = list(GRADE_PATTERNS)
+    subjects = list(SUBJECT_PATTERNS)
+    types = list(TYPE_PATTERNS)
+    file_types = ['pdf', 'word', 'excel', 'powerpoint']
+    results = []
+    for i in range(records):
+        grade, subject, doc_type = rng.choice(grades), rng.choice(subjects), rng.choice(types)
+        year = str(rng.randint(2015, 2025))
+        results.append({
+            'new_filename': f"{grade}-{subject.lower().replace(' ', '-')}-{doc_type}-{year}-{i}.pdf",
+            'grade': grade, 'subject': subject, 'type': doc_type, 'year': year,
+            'pages': rng.randint(1, 60), 'file_size': f"{rng.randint(10, 9000)} KB",
+            'file_type': rng.choice(file_types), 'extension': '.pdf',
+            'text_preview': f"{grade} {subject.lower()} {doc_type} {year}"
+        })
+    return results
+
+def bench_import(uri, sizes=(1000, 10000, 100000), concurrency=(1, 4, 8), batch_size=500, pool_size=8,
+                 database='caps-resources-benchmark'):
+    """Records/sec of the importer against a scratch database, per size and in-flight batch count
+
+    A fresh insert run and an immediate re-run (every record unchanged) are
+    measured for each combination, followed by the $facet summary query.
+    """
+    if uri == 'mongomock':
+        import mongomock
+        client = mongomock.MongoClient()
+    else:
+        client = MongoClient(uri, maxPoolSize=pool_size)
+    collection = client[database]['products']
+    report = {'batch_size': batch_size, 'pool_size': pool_size}
+    try:
+        for size in sizes:
+            results = make_results(size)
+            report[size] = {}
+            for in_flight in concurrency:
+                collection.drop()
+                ensure_indexes(collection)
+                timings = {}
+                for run in ('insert', 'unchanged'):
+                    start = time.perf_counter()
+                    with redirect_stdout(io.StringIO()):
+                        counts = bulk_upsert(collection, iter(results), batch_size, in_flight)
+                    timings[run] = time.perf_counter() - start
+                    if counts['errors']:
+                        raise RuntimeError(f"{counts['errors']} import errors")
+                start = time.perf_counter()
+                collection_breakdown(collection)
+                summary_seconds = time.perf_counter() - start
+                report[size][in_flight] = {
+                    'insert_records_per_sec': round(size / timings['insert'], 1),
+                    'unchanged_records_per_sec': round(size / timings['unchanged'], 1),
+                    'summary_ms': round(summary_seconds * 1000, 3)
+                }
+                result = report[size][in_flight]
+                print(f"  {size} records, {in_flight} in flight: "
+                      f"{result['insert_records_per_sec']} inserts/sec, "
+                      f"{result['unchanged_records_per_sec']} unchanged/sec, summary {result['summary_ms']} ms")
+        collection.drop()
+    finally:
+        client.close()
+    return report
+
+def _corpus(corpus_dir, work_dir, documents, seed):
+    """An existing generated corpus, or a fresh seeded one under work_dir"""
+    if corpus_dir:
+        return corpus_dir, load_labels(corpus_dir)
+    corpus_dir = os.path.join(work_dir, 'corpus')
+    return corpus_dir, generate_corpus(corpus_dir, documents, seed)
+
+def _per_call(func, args_list, repeat):
+    """Mean microseconds per call of func over every argument tuple, repeat times"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for args in args_list:
+            func(*args)
+    elapsed = time.perf_counter() - start
+    calls = len(args_list) * repeat
+    return {'calls': calls, 'us_per_call': round(elapsed / calls * 1e6, 2)}
+
+EXTRACTORS = {
+    'pdf': extract_text_from_pdf,
+    'word': extract_text_from_docx,
+    'excel': extract_text_from_excel,
+    'powerpoint': extract_text_from_pptx
+}
+
+def bench_micro(corpus_dir=None, documents=100, seed=42, repeat=3, work_dir=None):
+    """Time per call of each pipeline building block on a generated corpus
+
+    Covers every extract_text_from_*, the three classifiers,
+    clean_text_for_filename and place_file in each placement mode.
+    """
+    with tempfile.TemporaryDirectory(dir=work_dir) as tmp:
+        corpus_dir, labels = _corpus(corpus_dir, tmp, documents, seed)
+        paths = [os.path.join(corpus_dir, label['path']) for label in labels]
+        report = {'documents': len(paths), 'seed': seed, 'functions': {}}
+        functions = report['functions']
+        
+        for fmt, extractor in EXTRACTORS.items():
+            files = [(path,) for path in paths if get_file_type(path) == fmt]
+            if files:
+                functions[extractor.__name__] = _per_call(extractor, files, repeat)
+        
+        samples = [(extract_document(path)['text'], os.path.basename(path)) for path in paths]
+        for classifier in (extract_grade, extract_subject, extract_type):
+            functions[classifier.__name__] = _per_call(classifier, samples, repeat * 10)
+        subjects = [(subject,) for subject in SUBJECT_PATTERNS] + [(label['filename'],) for label in labels]
+        functions['clean_text_for_filename'] = _per_call(clean_text_for_filename, subjects, repeat * 100)
+        
+        for mode in PLACEMENT_MODES:
+            dest = os.path.join(tmp, f"placed-{mode}")
+            os.makedirs(dest)
+            targets = []
+            for i, path in enumerate(paths):
+                target = os.path.join(dest, f"{i:05d}{os.path.splitext(path)[1]}")
+                open(target, 'wb').close()
+                targets.append((path, target, mode))
+            if mode == 'move':
+                # Move copies of the corpus so the sources survive for the other modes
+                sources = os.path.join(tmp, 'move-sources')
+                shutil.copytree(corpus_dir, sources)
+                targets = [(os.path.join(sources, os.path.relpath(src, corpus_dir)), dst, mode)
+                           for src, dst, mode in targets]
+            functions[f"place_file[{mode}]"] = _per_call(place_file, targets, 1)
+    
+    for name, result in functions.items():
+        print(f"  {name}: {result['us_per_call']} µs/call ({result['calls']} calls)")
+    return report
+
+def _run_quietly(func, *args, **kwargs):
+    """Call func with the organizer's per-file output and all printing suppressed"""
+    configure_output('quiet')
+    try:
+        with redirect_stdout(io.StringIO()):
+            return func(*args, **kwargs)
+    finally:
+        configure_output('text')
+
+def bench_end_to_end(corpus_dir=None, documents=500, seed=42, workers=(1, 4), uri='mongomock',
+                     thumbnails=False, work_dir=None):
+    """Full scan_and_organize and import_to_database runs over a generated corpus
+
+    For each worker count: a cold run into an empty output folder, a warm
+    (incremental, nothing changed) run, classification accuracy against the
+    corpus labels, and an import of the results into a scratch database
+    (mongomock by default, or a local mongod).
+    """
+    folders = (organize_pdfs.RESOURCES_FOLDER, organize_pdfs.ORGANIZED_FOLDER, organize_pdfs.THUMBNAILS_FOLDER)
+    with tempfile.TemporaryDirectory(dir=work_dir) as tmp:
+        corpus_dir, labels = _corpus(corpus_dir, tmp, documents, seed)
+        expected = {os.path.join(corpus_dir, label['path']): label['expected'] for label in labels}
+        report = {'documents': len(labels), 'seed': seed, 'thumbnails': thumbnails, 'uri': uri}
+        try:
+            for count in workers:
+                out = os.path.join(tmp, f"organized-{count}")
+                organize_pdfs.RESOURCES_FOLDER = corpus_dir
+                organize_pdfs.ORGANIZED_FOLDER = out
+                organize_pdfs.THUMBNAILS_FOLDER = os.path.join(tmp, f"thumbnails-{count}")
+                
+                timings = {}
+                for run in ('cold', 'warm'):
+                    start = time.perf_counter()
+                    _run_quietly(organize_pdfs.scan_and_organize, workers=count, thumbnails=thumbnails)
+                    timings[run] = time.perf_counter() - start
+                with open(os.path.join(out, organize_pdfs.PROFILE_FILENAME), 'r', encoding='utf-8') as f:
+                    stages = json.load(f)['run_stages']
+                
+                stream = os.path.join(out, organize_pdfs.STREAM_FILENAME)
+                correct = total = organized = 0
+                for result in organize_pdfs.iter_stream_records(stream):
+                    organized += 1
+                    for field, value in expected.get(result['original_path'], {}).items():
+                        total += 1
+                        correct += result[field] == value
+                
+                if uri == 'mongomock':
+                    import mongomock
+                    client = mongomock.MongoClient()
+                else:
+                    client = MongoClient(uri)
+                collection = client['caps-resources-benchmark']['products']
+                collection.drop()
+                start = time.perf_counter()
+                counts = _run_quietly(import_to_database, collection, stream, snapshot_dir=None)
+                import_seconds = time.perf_counter() - start
+                collection.drop()
+                client.close()
+                
+                report[count] = {
+                    'cold_seconds': round(timings['cold'], 4),
+                    'cold_files_per_sec': round(len(labels) / timings['cold'], 1),
+                    'warm_seconds': round(timings['warm'], 4),
+                    'warm_stages': stages,
+                    'organized': organized,
+                    'accuracy': round(correct / total, 4) if total else None,
+                    'import_seconds': round(import_seconds, 4),
+                    'import_records_per_sec': round(counts['read'] / import_seconds, 1)
+                }
+                result = report[count]
+                print(f"  {count} workers: cold {result['cold_seconds']}s ({result['cold_files_per_sec']} files/sec), "
+                      f"warm {result['warm_seconds']}s, {result['organized']} organized, "
+                      f"accuracy {result['accuracy']}, import {result['import_records_per_sec']} records/sec")
+        finally:
+            (organize_pdfs.RESOURCES_FOLDER, organize_pdfs.ORGANIZED_FOLDER,
+             organize_pdfs.THUMBNAILS_FOLDER) = folders
+    return report
+
+def _flatten(value, prefix=''):
+    """Numeric leaves of a report as {'dotted.key': number}"""
+    if isinstance(value, dict):
+        leaves = {}
+        for key, child in value.items():
+            leaves.update(_flatten(child, f"{prefix}.{key}" if prefix else str(key)))
+        return leaves
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return {prefix: value}
+    return {}
+
+def _higher_is_better(key):
+    return 'per_sec' in key or 'accuracy' in key
+
+def compare_reports(baseline_path, current_path, threshold=0.1):
+    """Change in every shared metric between two saved reports; flags regressions over threshold"""
+    reports = []
+    for path in (baseline_path, current_path):
+        with open(path, 'r', encoding='utf-8') as f:
+            reports.append(json.load(f))
+    baseline, current = (_flatten(report['results']) for report in reports)
+    print(f"  baseline: {reports[0].get('meta', {}).get('commit')}  current: {reports[1].get('meta', {}).get('commit')}")
+    
+    report = {'threshold': threshold, 'metrics': {}, 'regressions': []}
+    for key in sorted(baseline.keys() & current.keys()):
+        before, after = baseline[key], current[key]
+        if not before:
+            continue
+        change = (after - before) / abs(before)
+        worse = -change if _higher_is_better(key) else change
+        report['metrics'][key] = {'baseline': before, 'current': after, 'change': round(change, 4)}
+        if worse > threshold:
+            report['regressions'].append(key)
+        if abs(change) > threshold:
+            marker = "⚠️ " if worse > threshold else "✅"
+            print(f"  {marker} {key}: {before} -> {after} ({change:+.1%})")
+    print(f"  {len(report['metrics'])} metrics compared, {len(report['regressions'])} regressions "
+          f"over {threshold:.0%}")
+    return report
+
+def _git_commit():
+    """Commit of the checkout the benchmark ran from, so reports can be compared across commits"""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (subprocess.SubprocessError, OSError):
+        return None
+
+def report_meta(args):
+    """Where and how a report was produced"""
+    return {
+        'commit': _git_commit(),
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'options': {key: value for key, value in vars(args).items() if key not in ('output', 'benchmark')}
+    }
+
+def parse_args(argv=None):
+    """Parse command-line options"""
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--output', help="write the JSON report to this file")
+
+    parser = argparse.ArgumentParser(description="Benchmark the document ingestion pipeline")
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+
+    extraction = subparsers.add_parser('extraction', parents=[common],
+                                       help="parse time and peak RSS per format")
+    extraction.add_argument('--corpus', default=RESOURCES_FOLDER,
+                            help="folder of sample documents (default: RESOURCES_FOLDER)")
+    extraction.add_argument('--repeat', type=int, default=3)
+
+    classifier = subparsers.add_parser('classifier', parents=[common],
+                                       help="classifier accuracy and throughput")
+    classifier.add_argument('--corpus', default=CLASSIFIER_CORPUS,
+                            help="labelled regression corpus (default: classifier_corpus.json)")
+    classifier.add_argument('--repeat', type=int, default=200)
+    classifier.add_argument('--min-accuracy', type=float, default=1.0,
+                            help="exit non-zero if the compiled classifier falls below this")
+
+    placement = subparsers.add_parser('placement', parents=[common],
+                                      help="wall time and bytes written per placement mode")
+    placement.add_argument('--dir', help="where to build the synthetic tree (use the target volume)")
+    placement.add_argument('--files', type=int, default=200)
+    placement.add_argument('--file-size', type=int, default=1024 * 1024)
+
+    scan = subparsers.add_parser('scan', parents=[common],
+                                 help="directory scan time on a synthetic tree")
+    scan.add_argument('--dir', help="where to build the synthetic tree (use a network share to measure one)")
+    scan.add_argument('--files', type=int, default=500000)
+    scan.add_argument('--threads', type=int, default=8)
+    scan.add_argument('--repeat', type=int, default=3)
+
+    search = subparsers.add_parser('search', parents=[common],
+                                   help="full-text search latency on a synthetic index")
+    search.add_argument('--dir', help="where to build the synthetic index")
+    search.add_argument('--documents', type=int, default=100000)
+    search.add_argument('--repeat', type=int, default=5)
+
+    importer = subparsers.add_parser('import', parents=[common],
+                                     help="importer throughput against a scratch MongoDB database")
+    importer.add_argument('--uri', default='mongodb://localhost:27017',
+                          help="MongoDB to write to (a local mongod; 'mongomock' for a dry run)")
+    importer.add_argument('--records', type=int, nargs='+', default=[1000, 10000, 100000])
+    importer.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 8],
+                          help="bulk writes in flight to compare")
+    importer.add_argument('--batch-size', type=int, default=500)
+    importer.add_argument('--pool-size', type=int, default=8)
+
+    micro = subparsers.add_parser('micro', parents=[common],
+                                  help="time per call of extraction, classification and placement")
+    micro.add_argument('--corpus', help="folder written by generate_corpus.py (default: generate one)")
+    micro.add_argument('--documents', type=int, default=100)
+    micro.add_argument('--seed', type=int, default=42)
+    micro.add_argument('--repeat', type=int, default=3)
+    micro.add_argument('--dir', help="where to put the temporary corpus and placed files")
+
+    e2e = subparsers.add_parser('e2e', parents=[common],
+                                help="full organizer and importer runs over a generated corpus")
+    e2e.add_argument('--corpus', help="folder written by generate_corpus.py (default: generate one)")
+    e2e.add_argument('--documents', type=int, default=500)
+    e2e.add_argument('--seed', type=int, default=42)
+    e2e.add_argument('--workers', type=int, nargs='+', default=[1, 4])
+    e2e.add_argument('--uri', default='mongomock',
+                     help="database for the import ('mongomock' by default, or a local mongod URI)")
+    e2e.add_argument('--thumbnails', action='store_true', help="include thumbnail rendering")
+    e2e.add_argument('--dir', help="where to put the temporary corpus and output folders")
+
+    compare = subparsers.add_parser('compare', parents=[common],
+                                    help="compare two saved reports, e.g. from two commits")
+    compare.add_argument('baseline')
+    compare.add_argument('current')
+    compare.add_argument('--threshold', type=float, default=0.1,
+                         help="relative change that counts as a regression (default: 0.1)")
+    compare.add_argument('--fail-on-regression', action='store_true',
+                         help="exit non-zero if any metric regressed beyond the threshold")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    print("=" * 80)
+    print(f"BENCHMARK: {args.benchmark}")
+    print("=" * 80)
+
+    if args.benchmark == 'extraction':
+        report = bench_extraction(args.corpus, args.repeat)
+    elif args.benchmark == 'classifier':
+        report = bench_classifier(args.corpus, args.repeat)
+    elif args.benchmark == 'placement':
+        report = bench_placement(args.dir, args.files, args.file_size)
+    elif args.benchmark == 'scan':
+        report = bench_scan(args.dir, args.files, args.threads, args.repeat)
+    elif args.benchmark == 'search':
+        report = bench_search(args.dir, args.documents, args.repeat)
+    elif args.benchmark == 'import':
+        report = bench_import(args.uri, args.records, args.concurrency, args.batch_size, args.pool_size)
+    elif args.benchmark == 'micro':
+        report = bench_micro(args.corpus, args.documents, args.seed, args.repeat, args.dir)
+    elif args.benchmark == 'e2e':
+        report = bench_end_to_end(args.corpus, args.documents, args.seed, args.workers, args.uri,
+                                  args.thumbnails, args.dir)
+    elif args.benchmark == 'compare':
+        report = compare_reports(args.baseline, args.current, args.threshold)
+
+    report = {'benchmark': args.benchmark, 'meta': report_meta(args), 'results': report}
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n💾 Report saved to: {args.output}")
+    else:
+        print(json.dumps(report, indent=2))
+
+    if args.benchmark == 'classifier' and report['results']['compiled']['overall_accuracy'] < args.min_accuracy:
+        print(f"\n❌ Classifier accuracy below {args.min_accuracy:.1%}")
+        sys.exit(1)
+    if args.benchmark == 'compare' and args.fail_on_regression and report['results']['regressions']:
+        print(f"\n❌ {len(report['results']['regressions'])} metrics regressed")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
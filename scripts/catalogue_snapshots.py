@@ -0,0 +1,167 @@
+import os
+import re
+import gzip
+import json
+import hashlib
+from collections import Counter
+from datetime import datetime
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Served by the backend at /catalogue (server/routes/catalogue.js)
+SNAPSHOT_FOLDER = r"C:\caps-resources-website\catalogue"
+
+# The only file without a content hash; it names the current index and is never cached
+LATEST_FILENAME = 'latest.json'
+
+# Versions whose files are kept, so a page that loaded an older index can still fetch its shards
+KEEP_VERSIONS = 3
+
+# Hex digits of the content hash in snapshot filenames
+HASH_LENGTH = 16
+
+# What a listing shows; textPreview, tags and pdfFileName stay in MongoDB
+LISTING_FIELDS = [
+    'title', 'description', 'grade', 'subject', 'category', 'price', 'fileType', 'fileSize', 'pages',
+    'thumbnail', 'memberCount', 'createdAt'
+]
+
+# Fields counted in the facet index
+FACET_FIELDS = ['grade', 'subject', 'category', 'fileType']
+
+SNAPSHOT_NAME = re.compile(rf"^[\w-]+\.[0-9a-f]{{{HASH_LENGTH}}}\.json(\.gz|\.br)?$")
+
+def encode(document):
+    """Canonical JSON bytes, so unchanged content always gets the same hash"""
+    return json.dumps(document, ensure_ascii=False, sort_keys=True, separators=(',', ':')).encode('utf-8')
+
+def slug(text):
+    return re.sub(r'[^a-z0-9]+', '-', text.lower()).strip('-')
+
+def write_atomic(path, data):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+def write_hashed(snapshot_dir, stem, document):
+    """Write a document as <stem>.<hash>.json plus .gz and .br copies; returns (filename, new)
+
+    A file whose hash is already on disk has identical content and is not
+    rewritten, so re-importing an unchanged catalogue writes nothing but the
+    latest pointer.
+    """
+    data = encode(document)
+    filename = f"{stem}.{hashlib.sha256(data).hexdigest()[:HASH_LENGTH]}.json"
+    path = os.path.join(snapshot_dir, filename)
+    if os.path.exists(path):
+        return filename, False
+    # Compressed copies first: once the plain file exists the snapshot counts as written
+    write_atomic(f"{path}.gz", gzip.compress(data, compresslevel=9, mtime=0))
+    if brotli is not None:
+        write_atomic(f"{path}.br", brotli.compress(data, quality=11))
+    write_atomic(path, data)
+    return filename, True
+
+def listing(product):
+    """The listing fields of one product document, JSON-ready"""
+    item = {'id': str(product['_id'])}
+    for field in LISTING_FIELDS:
+        value = product.get(field)
+        if value is None:
+            continue
+        item[field] = value.isoformat() if isinstance(value, datetime) else value
+    return item
+
+def read_versions(snapshot_dir):
+    try:
+        with open(os.path.join(snapshot_dir, LATEST_FILENAME), 'r', encoding='utf-8') as f:
+            return json.load(f).get('versions', [])
+    except (FileNotFoundError, json.JSONDecodeError):
+        return []
+
+def prune(snapshot_dir, versions):
+    """Delete snapshot files no index in versions refers to; returns how many"""
+    keep = set()
+    for version in versions:
+        keep.add(version['index'])
+        try:
+            with open(os.path.join(snapshot_dir, version['index']), 'r', encoding='utf-8') as f:
+                index = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            continue
+        keep.update(shard['file'] for subjects in index['shards'].values() for shard in subjects.values())
+    removed = 0
+    for name in os.listdir(snapshot_dir):
+        match = SNAPSHOT_NAME.match(name)
+        if match and name[:len(name) - len(match.group(1) or '')] not in keep:
+            os.remove(os.path.join(snapshot_dir, name))
+            removed += 1
+    return removed
+
+def write_snapshots(collection, snapshot_dir=SNAPSHOT_FOLDER):
+    """Write the active catalogue as static snapshots the storefront can cache forever
+
+    Active products are read once, newest first (the order the products API
+    uses), and written as one shard per grade and subject. A facet index
+    records each shard's file and product count together with counts per
+    grade, subject, category and file type. Shards and index are named by
+    their content hash and never change once written; latest.json, the only
+    mutable file, points at the current index and is replaced last, so a
+    reader never sees a half-written version.
+    """
+    os.makedirs(snapshot_dir, exist_ok=True)
+    projection = {field: 1 for field in LISTING_FIELDS}
+    shards = {}
+    facets = {field: Counter() for field in FACET_FIELDS}
+    total = 0
+    for product in collection.find({'isActive': True}, projection).sort('createdAt', -1):
+        item = listing(product)
+        shards.setdefault(item['grade'], {}).setdefault(item['subject'], []).append(item)
+        for field in FACET_FIELDS:
+            if item.get(field) is not None:
+                facets[field][item[field]] += 1
+        total += 1
+
+    written = 0
+    shard_index = {}
+    for grade, subjects in sorted(shards.items()):
+        for subject, products in sorted(subjects.items()):
+            filename, new = write_hashed(snapshot_dir, f"{grade}-{slug(subject)}", {
+                'grade': grade, 'subject': subject, 'products': products
+            })
+            written += new
+            shard_index.setdefault(grade, {})[subject] = {'file': filename, 'count': len(products)}
+
+    index_file, new = write_hashed(snapshot_dir, 'index', {
+        'total': total,
+        'facets': {field: dict(sorted(counts.items())) for field, counts in facets.items()},
+        'shards': shard_index
+    })
+    written += new
+    version = index_file.split('.')[1]
+    generated_at = datetime.now().isoformat(timespec='seconds')
+    versions = [v for v in read_versions(snapshot_dir) if v['version'] != version]
+    versions = [{'version': version, 'index': index_file, 'generated_at': generated_at}] + versions
+    versions = versions[:KEEP_VERSIONS]
+    write_atomic(os.path.join(snapshot_dir, LATEST_FILENAME), encode({
+        'version': version, 'index': index_file, 'generated_at': generated_at, 'versions': versions
+    }))
+    removed = prune(snapshot_dir, versions)
+    return {
+        'version': version,
+        'products': total,
+        'shards': sum(len(subjects) for subjects in shard_index.values()),
+        'written': written,
+        'removed': removed,
+        'directory': snapshot_dir
+    }
+
+def print_snapshot_summary(snapshot):
+    print(f"🗂️  Catalogue snapshot {snapshot['version']}: {snapshot['products']} products in "
+          f"{snapshot['shards']} shards ({snapshot['written']} new files, {snapshot['removed']} old removed)")
+    print(f"🗂️  Saved to: {snapshot['directory']}"
+          + ("" if brotli is not None else " (gzip only; pip install brotli for .br copies)"))
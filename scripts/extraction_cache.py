@@ -0,0 +1,104 @@
+import time
+import sqlite3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS extractions (
+    content_hash TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    pages INTEGER NOT NULL,
+    bytes INTEGER NOT NULL,
+    last_used REAL NOT NULL,
+    PRIMARY KEY (content_hash, version)
+);
+CREATE INDEX IF NOT EXISTS extractions_last_used ON extractions (last_used);
+"""
+
+# Seconds a worker waits for another process's write before giving up
+BUSY_TIMEOUT = 30
+
+class ExtractionCache:
+    """Extracted text and page counts on disk, keyed by content hash and extractor version
+
+    Classification only needs the text, so a re-run after changing the
+    patterns, or a --full run over unchanged documents, skips parsing
+    entirely. The file is SQLite in WAL mode, so every worker process can
+    read and write it at once. Entries remember when they were last used,
+    and evict() trims the least recently used down to a size budget.
+    """
+
+    def __init__(self, path, version):
+        self.path = path
+        self.version = version
+        self.connection = sqlite3.connect(path, timeout=BUSY_TIMEOUT, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.connection.close()
+
+    def get(self, content_hash):
+        """{'text', 'pages'} extracted from this content by this extractor version, or None"""
+        row = self.connection.execute(
+            "SELECT text, pages FROM extractions WHERE content_hash = ? AND version = ?",
+            (content_hash, self.version)
+        ).fetchone()
+        if row is None:
+            return None
+        self.connection.execute(
+            "UPDATE extractions SET last_used = ? WHERE content_hash = ? AND version = ?",
+            (time.time(), content_hash, self.version)
+        )
+        return {'text': row[0], 'pages': row[1]}
+
+    def put(self, content_hash, text, pages):
+        self.connection.execute(
+            """INSERT OR REPLACE INTO extractions (content_hash, version, text, pages, bytes, last_used)
+               VALUES (?, ?, ?, ?, ?, ?)""",
+            (content_hash, self.version, text, pages, len(text.encode('utf-8')), time.time())
+        )
+
+    def size(self):
+        """(entries, bytes of text) currently cached"""
+        entries, total = self.connection.execute(
+            "SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM extractions").fetchone()
+        return entries, total
+
+    def evict(self, max_bytes):
+        """Drop other extractor versions, then the least recently used text over max_bytes
+
+        Returns the number of entries removed.
+        """
+        removed = self.connection.execute(
+            "DELETE FROM extractions WHERE version != ?", (self.version,)).rowcount
+        removed += self.connection.execute(
+            """DELETE FROM extractions WHERE rowid IN (
+                   SELECT rowid FROM (
+                       SELECT rowid, SUM(bytes) OVER (ORDER BY last_used DESC, rowid DESC) AS running
+                       FROM extractions
+                   ) WHERE running > ?
+               )""",
+            (max_bytes,)
+        ).rowcount
+        if removed:
+            self.connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        return removed
+
+# One open cache per path in each process, so pool workers reuse their connection
+_shared = {}
+
+def shared_cache(path, version):
+    """This process's ExtractionCache for path (None if path is None)"""
+    if path is None:
+        return None
+    key = (path, version)
+    if key not in _shared:
+        _shared[key] = ExtractionCache(path, version)
+    return _shared[key]
@@ -0,0 +1,250 @@
+import os
+import re
+import json
+import random
+import zipfile
+import argparse
+
+from organize_pdfs import GRADE_PATTERNS, SUBJECT_PATTERNS, TYPE_PATTERNS
+
+try:
+    import pymupdf
+except ImportError:
+    try:
+        import fitz as pymupdf
+    except ImportError:
+        pymupdf = None
+
+try:
+    from docx import Document
+except ImportError:
+    Document = None
+
+try:
+    from openpyxl import Workbook
+except ImportError:
+    Workbook = None
+
+try:
+    from pptx import Presentation
+except ImportError:
+    Presentation = None
+
+# Expected grade/subject/type/year of every generated document, next to the documents
+LABELS_FILENAME = '_corpus_labels.json'
+
+CORPUS_FORMATS = ['pdf', 'word', 'excel', 'powerpoint']
+
+FORMAT_EXTENSIONS = {
+    'pdf': '.pdf',
+    'word': '.docx',
+    'excel': '.xlsx',
+    'powerpoint': '.pptx'
+}
+
+# Share of documents per format, roughly as suppliers deliver them
+FORMAT_WEIGHTS = {
+    'pdf': 6,
+    'word': 2,
+    'excel': 1,
+    'powerpoint': 1
+}
+
+# Share of documents whose filename is meaningless (scans, phone photos, downloads),
+# and of documents that name no grade anywhere and should be skipped
+RANDOM_NAME_SHARE = 0.3
+NO_GRADE_SHARE = 0.05
+
+# Topic words per subject, none of which is itself a classifier pattern
+SUBJECT_TOPICS = {
+    'Mathematics': ['fractions', 'algebra', 'geometry', 'decimals', 'patterns', 'probability'],
+    'English': ['comprehension', 'poetry', 'novel', 'essay', 'punctuation', 'vocabulary'],
+    'Afrikaans': ['begrip', 'gedigte', 'opstel', 'woordeskat', 'leesstuk'],
+    'Life Skills': ['personal wellbeing', 'safety', 'hygiene', 'friendship', 'feelings'],
+    'Natural Sciences': ['matter', 'energy', 'ecosystems', 'planet earth', 'materials'],
+    'Social Sciences': ['maps', 'climate', 'settlements', 'colonialism', 'democracy'],
+    'Physical Sciences': ['momentum', 'electric circuits', 'chemical bonding', 'waves', 'stoichiometry'],
+    'Life Sciences': ['photosynthesis', 'genetics', 'evolution', 'cells', 'human reproduction'],
+    'Accounting': ['ledger', 'journals', 'trial balance', 'vat', 'cash budget'],
+    'Business Studies': ['entrepreneurship', 'marketing', 'business ventures', 'ethics'],
+    'Economics': ['inflation', 'markets', 'growth', 'public sector', 'trade'],
+    'Technology': ['structures', 'mechanical systems', 'electrical systems', 'design process'],
+    'Creative Arts': ['drama', 'dance', 'drawing', 'rhythm', 'performance'],
+    'Mathematical Literacy': ['finance', 'measurement', 'maps and plans', 'data handling'],
+    'First Additional Language': ['reading', 'writing', 'listening', 'speaking'],
+    'Home Language': ['reading', 'writing', 'listening', 'speaking']
+}
+
+# Neutral filler: no word here matches a grade, subject or type pattern
+FILLER = [
+    'learners', 'answer', 'the', 'following', 'questions', 'use', 'diagram', 'below', 'complete',
+    'table', 'explain', 'your', 'reasoning', 'marks', 'read', 'carefully', 'before', 'write',
+    'show', 'all', 'working', 'name', 'date', 'class', 'term', 'section', 'question', 'total',
+    'instructions', 'example', 'discuss', 'compare', 'describe', 'identify', 'list', 'three'
+]
+
+def _phrase(rng, patterns):
+    """One of the first two spellings of a label, as a document would word it"""
+    return rng.choice(patterns[:2]).title()
+
+def _paragraph(rng, topics, words=40):
+    chosen = [rng.choice(FILLER) for _ in range(words)]
+    for _ in range(3):
+        chosen.insert(rng.randrange(len(chosen)), rng.choice(topics))
+    return " ".join(chosen).capitalize() + "."
+
+def document_spec(rng, index):
+    """Pick the labels, filename and wording of one synthetic document"""
+    fmt = rng.choices(CORPUS_FORMATS, weights=[FORMAT_WEIGHTS[f] for f in CORPUS_FORMATS])[0]
+    grade = None if rng.random() < NO_GRADE_SHARE else rng.choice(list(GRADE_PATTERNS))
+    subject = rng.choice(list(SUBJECT_PATTERNS))
+    doc_type = rng.choice(list(TYPE_PATTERNS))
+    year = str(rng.randint(2015, 2025))
+
+    grade_phrase = _phrase(rng, GRADE_PATTERNS[grade]) if grade else ""
+    subject_phrase = _phrase(rng, SUBJECT_PATTERNS[subject])
+    type_phrase = _phrase(rng, TYPE_PATTERNS[doc_type])
+    title = " ".join(part for part in (grade_phrase, subject_phrase, type_phrase, year) if part)
+
+    if rng.random() < RANDOM_NAME_SHARE:
+        stem = rng.choice(['scan_{:05d}', 'IMG_{:04d}', 'document ({})', 'download-{}'])
+        stem = stem.format(rng.randint(1, 9999))
+    else:
+        stem = title.replace(' ', rng.choice([' ', '_', '-']))
+    topics = SUBJECT_TOPICS[subject]
+    return {
+        'filename': f"{stem}-{index:05d}{FORMAT_EXTENSIONS[fmt]}",
+        'format': fmt,
+        'title': title,
+        'subtitle': f"{subject_phrase} {type_phrase}",
+        'pages': [[_paragraph(rng, topics) for _ in range(rng.randint(2, 5))]
+                  for _ in range(rng.randint(1, 8))],
+        'expected': {
+            'grade': grade,
+            'subject': subject,
+            'type': doc_type,
+            'year': year
+        }
+    }
+
+def _freeze_package(path):
+    """Rewrite an Office package with fixed timestamps so the same seed gives the same bytes"""
+    with zipfile.ZipFile(path) as package:
+        members = [(info, package.read(info)) for info in package.infolist()]
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as package:
+        for info, data in members:
+            if info.filename == 'docProps/core.xml':
+                # Some writers stamp the save time regardless of the properties set
+                data = re.sub(rb'(<dcterms:(?:created|modified)[^>]*>)[^<]*', rb'\g<1>2024-01-01T00:00:00Z', data)
+            frozen = zipfile.ZipInfo(info.filename, date_time=(2024, 1, 1, 0, 0, 0))
+            frozen.compress_type = zipfile.ZIP_DEFLATED
+            package.writestr(frozen, data)
+
+def write_pdf(path, spec):
+    document = pymupdf.open()
+    for number, paragraphs in enumerate(spec['pages']):
+        page = document.new_page()
+        text = "\n\n".join(([spec['title'], spec['subtitle']] if number == 0 else []) + paragraphs)
+        page.insert_textbox(pymupdf.Rect(54, 54, page.rect.width - 54, page.rect.height - 54), text,
+                            fontsize=11)
+    document.set_metadata({})
+    document.save(path, garbage=3, deflate=True, no_new_id=True)
+    document.close()
+
+def write_docx(path, spec):
+    document = Document()
+    document.add_heading(spec['title'], level=1)
+    document.add_paragraph(spec['subtitle'])
+    for paragraphs in spec['pages']:
+        for paragraph in paragraphs:
+            document.add_paragraph(paragraph)
+    document.save(path)
+    _freeze_package(path)
+
+def write_xlsx(path, spec):
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.append([spec['title']])
+    sheet.append([spec['subtitle']])
+    for number, paragraphs in enumerate(spec['pages']):
+        for paragraph in paragraphs:
+            sheet.append([f"Question {number + 1}", paragraph, len(paragraph) % 10 + 1])
+    workbook.save(path)
+    _freeze_package(path)
+
+def write_pptx(path, spec):
+    presentation = Presentation()
+    slide = presentation.slides.add_slide(presentation.slide_layouts[0])
+    slide.shapes.title.text = spec['title']
+    slide.placeholders[1].text = spec['subtitle']
+    for paragraphs in spec['pages']:
+        slide = presentation.slides.add_slide(presentation.slide_layouts[1])
+        slide.shapes.title.text = paragraphs[0].split('.')[0][:40]
+        slide.placeholders[1].text = "\n".join(paragraphs)
+    presentation.save(path)
+    _freeze_package(path)
+
+CORPUS_WRITERS = {
+    'pdf': (write_pdf, lambda: pymupdf),
+    'word': (write_docx, lambda: Document),
+    'excel': (write_xlsx, lambda: Workbook),
+    'powerpoint': (write_pptx, lambda: Presentation)
+}
+
+def generate_corpus(output_dir, documents=200, seed=42, formats=None):
+    """Write a seeded corpus of CAPS-style documents and their expected labels
+
+    The same seed always produces the same documents, names and labels.
+    Formats whose writing library is not installed are left out. Returns the
+    label records, which are also saved to LABELS_FILENAME in output_dir.
+    """
+    formats = set(formats or CORPUS_FORMATS)
+    available = {fmt for fmt in formats if CORPUS_WRITERS[fmt][1]() is not None}
+    os.makedirs(output_dir, exist_ok=True)
+    rng = random.Random(seed)
+    labels = []
+    index = 0
+    while len(labels) < documents:
+        spec = document_spec(rng, index)
+        index += 1
+        if spec['format'] not in formats:
+            continue
+        if spec['format'] not in available:
+            continue
+        folder = os.path.join(output_dir, spec['expected']['grade'] or 'unsorted')
+        os.makedirs(folder, exist_ok=True)
+        path = os.path.join(folder, spec['filename'])
+        CORPUS_WRITERS[spec['format']][0](path, spec)
+        labels.append({
+            'path': os.path.relpath(path, output_dir),
+            'filename': spec['filename'],
+            'format': spec['format'],
+            'expected': spec['expected']
+        })
+    with open(os.path.join(output_dir, LABELS_FILENAME), 'w', encoding='utf-8') as f:
+        json.dump({'seed': seed, 'documents': labels}, f, indent=2)
+    return labels
+
+def load_labels(corpus_dir):
+    """Label records of a generated corpus"""
+    with open(os.path.join(corpus_dir, LABELS_FILENAME), 'r', encoding='utf-8') as f:
+        return json.load(f)['documents']
+
+def parse_args(argv=None):
+    """Parse command-line options"""
+    parser = argparse.ArgumentParser(description="Generate a synthetic CAPS document corpus")
+    parser.add_argument('output', help="folder to write the documents to")
+    parser.add_argument('--documents', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--formats', nargs='+', choices=CORPUS_FORMATS, default=CORPUS_FORMATS)
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    args = parse_args()
+    labels = generate_corpus(args.output, args.documents, args.seed, args.formats)
+    by_format = {}
+    for label in labels:
+        by_format[label['format']] = by_format.get(label['format'], 0) + 1
+    print(f"📝 Wrote {len(labels)} documents to {args.output}: "
+          + ", ".join(f"{fmt} {count}" for fmt, count in sorted(by_format.items())))
+    print(f"🏷️  Labels saved to: {os.path.join(args.output, LABELS_FILENAME)}")
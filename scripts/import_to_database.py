@@ -1,17 +1,37 @@
 import json
 import os
-from pymongo import MongoClient
+import time
+import asyncio
+import argparse
+from pymongo import MongoClient, UpdateOne, ASCENDING
+from pymongo.errors import BulkWriteError, OperationFailure
 from dotenv import load_dotenv
 from datetime import datetime
 
-# Load environment variables
-load_dotenv('../server/.env')
+from catalogue_snapshots import SNAPSHOT_FOLDER, print_snapshot_summary, write_snapshots
 
-# MongoDB connection
-MONGODB_URI = os.getenv('MONGODB_URI', 'mongodb://localhost:27017/caps-resources')
-client = MongoClient(MONGODB_URI)
-db = client['caps-resources']
-products_collection = db['products']
+# MongoDB connection, opened on first use (see get_products_collection)
+ENV_FILE = '../server/.env'
+DEFAULT_MONGODB_URI = 'mongodb://localhost:27017/caps-resources'
+DATABASE_NAME = 'caps-resources'
+
+# Bulk writes in flight at once, and the driver's connection pool size
+DEFAULT_CONCURRENCY = 4
+DEFAULT_POOL_SIZE = 8
+
+_clients = {}
+
+RESULTS_FILE = r'C:\caps-resources-website\server\storage\pdfs\_organization_results.json'
+RESULTS_STREAM = r'C:\caps-resources-website\server\storage\pdfs\_organization_results.jsonl'
+
+# How often follow mode polls the stream for new records
+FOLLOW_POLL_INTERVAL = 1.0
+
+# Number of upserts sent per bulk_write round-trip
+DEFAULT_BATCH_SIZE = 500
+
+# MongoDB error code for unique index violations
+DUPLICATE_KEY_ERROR = 11000
 
 # Default prices by grade level
 PRICE_MAP = {
@@ -50,136 +70,605 @@ def generate_description(result):
     description = f"Comprehensive {result['type'].replace('-', ' ')} for {result['grade'].replace('grade', 'Grade ')} {result['subject']}. "
     description += f"This {result['pages']}-page resource provides quality educational content aligned with CAPS curriculum requirements. "
     description += f"Perfect for educators and parents supporting learners in {result['subject']}."
+    if result.get('member_count'):
+        description += f" This bundle contains {result['member_count']} resources in a single download."
     
     return description
 
-def import_to_database():
-    """Import organized files into MongoDB"""
+# Map file types to content types for database
+CONTENT_TYPE_MAP = {
+    'pdf': 'PDF Document',
+    'word': 'Word Document',
+    'excel': 'Excel Spreadsheet',
+    'powerpoint': 'PowerPoint Presentation',
+    'archive': 'Resource Bundle'
+}
+
+def build_product(result):
+    """Build the catalogue fields for one organized file"""
+    file_type = result.get('file_type', 'pdf').upper()
+    product = {
+        'title': generate_title(
+            result['grade'],
+            result['subject'],
+            result['type'],
+            result['year']
+        ),
+        'description': generate_description(result),
+        'grade': result['grade'],
+        'subject': result['subject'],
+        'price': PRICE_MAP.get(result['grade'], 49.99),
+        'pdfFileName': result['new_filename'],
+        'fileSize': result['file_size'],
+        'pages': result['pages'],
+        'fileType': file_type,
+        'contentType': CONTENT_TYPE_MAP.get(result.get('file_type', 'pdf'), 'Document'),
+        'textPreview': result.get('text_preview', ''),
+        'thumbnail': result.get('thumbnail') or f"/images/products/{result['grade']}-{result['subject'].lower().replace(' ', '-')}.jpg",
+        'category': result['type'],
+        'tags': [
+            result['grade'],
+            result['subject'],
+            result['type'],
+            result['year'],
+            'CAPS',
+            'South Africa',
+            file_type
+        ]
+    }
+    if result.get('member_count'):
+        product['memberCount'] = result['member_count']
+        product['bundleMembers'] = result['member_files']
+    if result.get('bundle'):
+        product['bundleFileName'] = result['bundle']
+    if result.get('near_duplicates'):
+        product['alternateFiles'] = result['near_duplicates']
+    return product
+
+# Fields build_product only sets for bundles, their members and near-duplicate clusters
+OPTIONAL_FIELDS = ['memberCount', 'bundleMembers', 'bundleFileName', 'alternateFiles']
+
+# Set on a product hidden for being a near-duplicate (the canonical's pdfFileName), so it
+# is reactivated if it stops being one; products hidden for other reasons stay hidden
+NEAR_DUPLICATE_FIELD = 'nearDuplicateOf'
+
+# Fields sync compares against the collection; downloads and createdAt are the store's
+CATALOGUE_FIELDS = [
+    'title', 'description', 'grade', 'subject', 'price', 'pdfFileName', 'fileSize', 'pages',
+    'fileType', 'contentType', 'textPreview', 'thumbnail', 'category', 'tags'
+] + OPTIONAL_FIELDS
+
+def build_upsert(result, activate=False):
+    """Idempotent upsert keyed on pdfFileName
+
+    Catalogue fields are refreshed on every import, and optional fields the
+    result no longer has (e.g. alternateFiles) are removed; counters and flags
+    that the store owns (downloads, isActive, createdAt) are only set when
+    inserting. With activate, a product that was deactivated is made active again.
+    """
+    return product_upsert(build_product(result), activate)
+
+def product_upsert(product, activate=False):
+    """The upsert build_upsert sends for an already built product"""
+    on_insert = {
+        'downloads': 0,
+        'isActive': True,
+        'createdAt': datetime.now()
+    }
+    update = {'$set': product, '$setOnInsert': on_insert}
+    if activate:
+        update['$set'] = dict(product, isActive=True)
+        update['$unset'] = {NEAR_DUPLICATE_FIELD: ""}
+        del on_insert['isActive']
+    absent = [field for field in OPTIONAL_FIELDS if field not in product]
+    if absent:
+        update.setdefault('$unset', {}).update((field, "") for field in absent)
+    return UpdateOne({'pdfFileName': product['pdfFileName']}, update, upsert=True)
+
+def deactivate_product(pdf_file_name):
+    """Hide a product whose file is gone; it is kept, with its downloads, not deleted"""
+    return UpdateOne({'pdfFileName': pdf_file_name}, {'$set': {'isActive': False}})
+
+def retire_near_duplicate(pdf_file_name, canonical):
+    """Hide a product that is now another edition of canonical, noting why so it can come back"""
+    return UpdateOne({'pdfFileName': pdf_file_name},
+                     {'$set': {'isActive': False, NEAR_DUPLICATE_FIELD: canonical}})
+
+def restore_near_duplicate(pdf_file_name):
+    """Make a product hidden only for being a near-duplicate active again; others are left alone"""
+    return UpdateOne({'pdfFileName': pdf_file_name, NEAR_DUPLICATE_FIELD: {'$exists': True}},
+                     {'$set': {'isActive': True}, '$unset': {NEAR_DUPLICATE_FIELD: ""}})
+
+def result_operations(result):
+    """The writes that bring one result's product up to date, in any order
+
+    A near-duplicate is hidden; any other result is upserted, and reactivated
+    if it was only hidden for being a near-duplicate.
+    """
+    name = result['new_filename']
+    if result.get('near_duplicate_of'):
+        return [retire_near_duplicate(name, result['near_duplicate_of'])]
+    return [build_upsert(result), restore_near_duplicate(name)]
+
+def get_products_collection(uri=None, pool_size=DEFAULT_POOL_SIZE):
+    """The products collection, connecting (and reading server/.env) on first use"""
+    if uri is None:
+        load_dotenv(ENV_FILE)
+        uri = os.getenv('MONGODB_URI', DEFAULT_MONGODB_URI)
+    key = (uri, pool_size)
+    if key not in _clients:
+        _clients[key] = MongoClient(uri, maxPoolSize=pool_size)
+    return _clients[key][DATABASE_NAME]['products']
+
+def ensure_indexes(collection):
+    """Create the unique pdfFileName index that makes upserts race-free"""
+    collection.create_index([('pdfFileName', ASCENDING)], unique=True)
+
+def write_batch(collection, operations, retries=1):
+    """Send one unordered bulk_write and return (inserted, updated, unchanged, errors)
+
+    Two concurrent imports can both try to upsert the same new pdfFileName; the
+    unique index rejects the loser with a duplicate key error. Those operations
+    are retried, when they resolve to a plain update.
+    """
+    try:
+        result = collection.bulk_write(operations, ordered=False)
+        details = {
+            'nUpserted': result.upserted_count,
+            'nMatched': result.matched_count,
+            'nModified': result.modified_count,
+            'writeErrors': []
+        }
+    except BulkWriteError as e:
+        details = e.details
+    
+    inserted = details['nUpserted']
+    updated = details['nModified']
+    unchanged = details['nMatched'] - details['nModified']
+    errors = 0
+    
+    retry = []
+    for error in details['writeErrors']:
+        if error['code'] == DUPLICATE_KEY_ERROR and retries > 0:
+            retry.append(operations[error['index']])
+        else:
+            print(f"❌ Error importing {error.get('op', {}).get('q', {}).get('pdfFileName', 'unknown')}: {error['errmsg']}")
+            errors += 1
+    
+    if retry:
+        retried = write_batch(collection, retry, retries - 1)
+        inserted += retried[0]
+        updated += retried[1]
+        unchanged += retried[2]
+        errors += retried[3]
+    
+    return inserted, updated, unchanged, errors
+
+def iter_results(results_file, follow=False, poll_interval=FOLLOW_POLL_INTERVAL):
+    """Yield organizer records from a JSONL stream (or a legacy JSON array)
+
+    In follow mode the stream is tailed while the organizer is still writing it:
+    None is yielded whenever no new record is available, so callers can flush
+    partial batches, and iteration stops at the organizer's end-of-run event.
+    A stream that is already complete belongs to an earlier run, so reading
+    waits until a run with a new id starts it over. A stream that shrinks was
+    restarted by a new organizer run and is re-read. Otherwise a last line
+    without its newline is skipped.
+    """
+    if not results_file.endswith('.jsonl'):
+        with open(results_file, 'r', encoding='utf-8') as f:
+            yield from json.load(f)
+        return
+    
+    while follow and not os.path.exists(results_file):
+        yield None
+        time.sleep(poll_interval)
+    
+    if follow and stream_finished(results_file):
+        finished_run = stream_run(results_file)
+        print("⏳ The stream is from a finished run; waiting for the organizer to start a new one...")
+        while not os.path.exists(results_file) or stream_run(results_file) == finished_run:
+            yield None
+            time.sleep(poll_interval)
+    
+    f = open(results_file, 'r', encoding='utf-8')
+    try:
+        partial = ""
+        while True:
+            line = f.readline()
+            if line.endswith("\n"):
+                record = json.loads(partial + line) if (partial + line).strip() else None
+                partial = ""
+                if record is None:
+                    continue
+                if record.get('_event') == 'end' and follow:
+                    return
+                if '_event' not in record:
+                    yield record
+                continue
+            
+            # A line without a newline is still being written, or was cut
+            # short when the organizer died; either way it is not a record yet
+            partial += line
+            if not follow:
+                return
+            if os.path.getsize(results_file) < f.tell():
+                f.close()
+                f = open(results_file, 'r', encoding='utf-8')
+                partial = ""
+            yield None
+            time.sleep(poll_interval)
+    finally:
+        f.close()
+
+def stream_run(results_file):
+    """The run id in a stream's start event, or None (no start event yet, or an older organizer)"""
+    try:
+        with open(results_file, 'r', encoding='utf-8') as f:
+            line = f.readline()
+    except OSError:
+        return None
+    if not line.endswith("\n"):
+        return None
+    try:
+        record = json.loads(line)
+    except ValueError:
+        return None
+    return record.get('run') if record.get('_event') == 'start' else None
+
+def stream_finished(results_file):
+    """Whether a JSONL stream ends with the organizer's end-of-run event
+
+    The stream is rewritten from scratch by every run, so until that event
+    is written it only holds the files processed so far. A JSON report is
+    always complete.
+    """
+    if not results_file.endswith('.jsonl'):
+        return True
+    with open(results_file, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        f.seek(max(0, f.tell() - 4096))
+        tail = f.read().decode('utf-8', errors='replace')
+    if not tail.endswith("\n"):
+        return False
+    lines = [line for line in tail.splitlines() if line.strip()]
+    try:
+        return bool(lines) and json.loads(lines[-1]).get('_event') == 'end'
+    except ValueError:
+        return False
+
+async def bulk_upsert_async(collection, results, batch_size=DEFAULT_BATCH_SIZE, concurrency=DEFAULT_CONCURRENCY):
+    """Upsert results in chunks of batch_size, up to `concurrency` bulk writes at a time
+
+    pymongo is thread-safe and pools its connections, so each bulk write runs
+    in a worker thread while the next batch is being read and built; at most
+    `concurrency` batches are in flight, which bounds memory and server load.
+    results may be any iterable, including a follow-mode stream: a None item
+    means no more records are ready yet, so the partial batch is sent.
+    
+    A file can be streamed more than once (e.g. again once it is found to be
+    a near-duplicate), so only its last record counts: a batch keeps one
+    record's writes per pdfFileName, and it is not sent while an earlier
+    batch with one of the same files is still in flight.
+    """
+    counts = {'read': 0, 'inserted': 0, 'updated': 0, 'unchanged': 0, 'aliases': 0, 'near_duplicates': 0,
+              'errors': 0}
+    batch = {}
+    in_flight = {}
+    
+    def tally(task):
+        size, (inserted, updated, unchanged, errors) = task.result()
+        counts['inserted'] += inserted
+        counts['updated'] += updated
+        counts['unchanged'] += unchanged
+        counts['errors'] += errors
+        print(f"  📦 Batch of {size}: +{inserted} new, {updated} updated, {unchanged} unchanged")
+    
+    async def send(size, operations):
+        return size, await asyncio.to_thread(write_batch, collection, operations)
+    
+    async def flush():
+        names = set(batch)
+        while len(in_flight) >= concurrency or any(sent & names for sent in in_flight.values()):
+            done, _ = await asyncio.wait(set(in_flight), return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                del in_flight[task]
+                tally(task)
+        operations = [operation for writes in batch.values() for operation in writes]
+        in_flight[asyncio.create_task(send(len(batch), operations))] = names
+        batch.clear()
+    
+    for result in results:
+        if result is None:
+            if batch:
+                await flush()
+            # Let finished writes report while the organizer produces more records
+            await asyncio.sleep(0)
+            continue
+        counts['read'] += 1
+        if result.get('alias_of'):
+            # Exact duplicate of another organized file; it is not a separate product
+            counts['aliases'] += 1
+            continue
+        if result.get('near_duplicate_of'):
+            # Another edition or format of a product, listed under its alternateFiles. It may
+            # have been streamed (and imported) before the organizer found its cluster.
+            counts['near_duplicates'] += 1
+        try:
+            writes = result_operations(result)
+        except Exception as e:
+            print(f"❌ Error importing {result.get('new_filename', 'unknown')}: {e}")
+            counts['errors'] += 1
+            continue
+        batch.pop(result['new_filename'], None)
+        batch[result['new_filename']] = writes
+        if len(batch) >= batch_size:
+            await flush()
+    if batch:
+        await flush()
+    if in_flight:
+        done, _ = await asyncio.wait(set(in_flight))
+        for task in done:
+            tally(task)
+    return counts
+
+def bulk_upsert(collection, results, batch_size=DEFAULT_BATCH_SIZE, concurrency=DEFAULT_CONCURRENCY):
+    """Synchronous entry point to bulk_upsert_async"""
+    return asyncio.run(bulk_upsert_async(collection, results, batch_size, concurrency))
+
+def plan_sync(collection, results):
+    """Diff organizer results against the products collection
+
+    The collection is read once, projected down to the catalogue fields.
+    Returns a list of (action, pdfFileName, changes, operation), where action
+    is 'insert', 'update', 'reactivate' or 'deactivate' and changes maps each
+    changed field to its (old, new) values. Products that are already
+    inactive and not in the results are left alone. A file streamed more
+    than once counts as its last record. Near-duplicates are deactivated
+    with the NEAR_DUPLICATE_FIELD mark, which reactivation clears.
+    """
+    wanted = {}
+    near_duplicates = {}
+    for result in results:
+        if result.get('alias_of'):
+            continue
+        name = result['new_filename']
+        if result.get('near_duplicate_of'):
+            wanted.pop(name, None)
+            near_duplicates[name] = result['near_duplicate_of']
+            continue
+        near_duplicates.pop(name, None)
+        wanted[name] = build_product(result)
+    
+    projection = {'_id': 0, 'isActive': 1, NEAR_DUPLICATE_FIELD: 1, **{field: 1 for field in CATALOGUE_FIELDS}}
+    plan = []
+    for current in collection.find({}, projection):
+        name = current.get('pdfFileName')
+        product = wanted.pop(name, None)
+        if product is None:
+            if current.get('isActive', True):
+                operation = (retire_near_duplicate(name, near_duplicates[name]) if name in near_duplicates
+                             else deactivate_product(name))
+                plan.append(('deactivate', name, {'isActive': (True, False)}, operation))
+            continue
+        changes = {field: (current.get(field), value) for field, value in product.items()
+                   if current.get(field) != value}
+        removed = [field for field in OPTIONAL_FIELDS if field in current and field not in product]
+        changes.update((field, (current[field], None)) for field in removed)
+        update = {}
+        if changes:
+            update['$set'] = {field: product[field] for field in changes if field in product}
+            if removed:
+                update['$unset'] = {field: "" for field in removed}
+        action = 'update'
+        if not current.get('isActive', True):
+            action = 'reactivate'
+            changes['isActive'] = (False, True)
+            update.setdefault('$set', {})['isActive'] = True
+        if NEAR_DUPLICATE_FIELD in current:
+            update.setdefault('$unset', {})[NEAR_DUPLICATE_FIELD] = ""
+        if update:
+            plan.append((action, name, changes, UpdateOne({'pdfFileName': name}, update)))
+    
+    for name, product in wanted.items():
+        plan.append(('insert', name, {}, product_upsert(product)))
+    return plan
+
+def describe_change(action, name, changes):
+    """One line describing a planned sync change"""
+    icons = {'insert': '➕', 'update': '🔄', 'reactivate': '♻️ ', 'deactivate': '🚫'}
+    if action in ('insert', 'deactivate'):
+        return f"  {icons[action]} {action.title()} {name}"
+    shown = []
+    for field, (old, new) in changes.items():
+        if field in ('price', 'grade', 'subject', 'category'):
+            shown.append(f"{field} {old} → {new}")
+        elif field != 'isActive':
+            shown.append(field)
+    return f"  {icons[action]} {action.title()} {name}: {', '.join(shown) or 'isActive'}"
+
+def sync_catalogue(collection=None, results_file=None, dry_run=False, pool_size=DEFAULT_POOL_SIZE,
+                   snapshot_dir=SNAPSHOT_FOLDER):
+    """Make the products collection match the organizer results
+
+    New files are inserted, changed catalogue fields (including prices from
+    PRICE_MAP) are updated, and products whose files are gone, or that are
+    now near-duplicates of another product, are marked isActive: False
+    rather than deleted. downloads and createdAt are never
+    touched. All changes go out in one unordered bulk write; with dry_run
+    they are only printed. A JSONL stream is only synced once the
+    organizer's end-of-run record is in it. Storefront snapshots are then rewritten into
+    snapshot_dir (None to skip).
+    """
+    if results_file is None:
+        results_file = RESULTS_STREAM if os.path.exists(RESULTS_STREAM) else RESULTS_FILE
+    
     print("=" * 80)
-    print("IMPORTING RESOURCES TO DATABASE")
+    print("SYNCING CATALOGUE" + (" (DRY RUN)" if dry_run else ""))
     print("=" * 80)
     
-    # Load results
-    results_file = r'C:\caps-resources-website\server\storage\pdfs\_organization_results.json'
-    
     if not os.path.exists(results_file):
         print(f"❌ Results file not found: {results_file}")
         print("Please run organize_pdfs.py first!")
         return
     
-    with open(results_file, 'r', encoding='utf-8') as f:
-        results = json.load(f)
+    if not stream_finished(results_file):
+        # Everything a partial stream leaves out would be deactivated
+        print(f"❌ {results_file} has no end-of-run record")
+        print("The organizer is still running or was interrupted. Sync once it completes,")
+        print("or pass --results with the JSON report of the last completed run.")
+        return
+    
+    print(f"📊 Reading resources from {results_file}")
+    print()
     
-    print(f"📊 Found {len(results)} resources to import\n")
+    if collection is None:
+        collection = get_products_collection(pool_size=pool_size)
+    if not dry_run:
+        try:
+            ensure_indexes(collection)
+        except OperationFailure as e:
+            print(f"❌ Could not create unique index on pdfFileName: {e}")
+            print("Remove duplicate pdfFileName documents and run the sync again.")
+            return
     
-    imported = 0
-    skipped = 0
-    errors = 0
+    plan = plan_sync(collection, iter_results(results_file))
+    counts = {'insert': 0, 'update': 0, 'reactivate': 0, 'deactivate': 0, 'repriced': 0, 'errors': 0}
+    for action, name, changes, _ in plan:
+        counts[action] += 1
+        if 'price' in changes and action != 'insert':
+            counts['repriced'] += 1
+        if dry_run:
+            print(describe_change(action, name, changes))
     
-    # Map file types to content types for database
-    content_type_map = {
-        'pdf': 'PDF Document',
-        'word': 'Word Document',
-        'excel': 'Excel Spreadsheet',
-        'powerpoint': 'PowerPoint Presentation',
-        'archive': 'Resource Bundle'
+    if plan and not dry_run:
+        counts['errors'] = write_batch(collection, [operation for *_, operation in plan])[3]
+    
+    print("\n" + "=" * 80)
+    print("SYNC SUMMARY" + (" (nothing written)" if dry_run else ""))
+    print("=" * 80)
+    print(f"➕ Inserted: {counts['insert']}")
+    print(f"🔄 Updated: {counts['update']} ({counts['repriced']} repriced)")
+    print(f"♻️  Reactivated: {counts['reactivate']}")
+    print(f"🚫 Deactivated: {counts['deactivate']}")
+    print(f"❌ Errors: {counts['errors']}")
+    if snapshot_dir and not dry_run:
+        print_snapshot_summary(write_snapshots(collection, snapshot_dir))
+    
+    print("\n✨ Sync complete!" if not dry_run else "\n👀 Dry run complete, run without --dry-run to apply")
+    return counts
+
+def collection_breakdown(collection):
+    """Total, per-grade and per-file-type product counts from a single $facet aggregation"""
+    pipeline = [{'$facet': {
+        'total': [{'$count': 'count'}],
+        'by_grade': [{'$group': {'_id': '$grade', 'count': {'$sum': 1}}}, {'$sort': {'_id': 1}}],
+        'by_file_type': [{'$group': {'_id': '$fileType', 'count': {'$sum': 1}}}, {'$sort': {'_id': 1}}]
+    }}]
+    facets = next(collection.aggregate(pipeline))
+    return {
+        'total': facets['total'][0]['count'] if facets['total'] else 0,
+        'by_grade': [(item['_id'], item['count']) for item in facets['by_grade']],
+        'by_file_type': [(item['_id'], item['count']) for item in facets['by_file_type']]
     }
+
+def import_to_database(collection=None, results_file=None, batch_size=DEFAULT_BATCH_SIZE, follow=False,
+                       concurrency=DEFAULT_CONCURRENCY, pool_size=DEFAULT_POOL_SIZE, snapshot_dir=SNAPSHOT_FOLDER):
+    """Import organized files into MongoDB, then write storefront snapshots into snapshot_dir (None to skip)"""
+    if results_file is None:
+        # Prefer the organizer's JSONL stream; fall back to the JSON report
+        results_file = RESULTS_STREAM if follow or os.path.exists(RESULTS_STREAM) else RESULTS_FILE
     
-    for result in results:
-        try:
-            # Check if already exists
-            existing = products_collection.find_one({
-                'pdfFileName': result['new_filename']
-            })
-            
-            if existing:
-                print(f"⏭️  Skipping {result['new_filename']} (already exists)")
-                skipped += 1
-                continue
-            
-            # Get file extension
-            file_ext = result.get('extension', '').lower()
-            file_type = result.get('file_type', 'pdf').upper()
-            content_type = content_type_map.get(result.get('file_type', 'pdf'), 'Document')
-            
-            # Create product document
-            product = {
-                'title': generate_title(
-                    result['grade'],
-                    result['subject'],
-                    result['type'],
-                    result['year']
-                ),
-                'description': generate_description(result),
-                'grade': result['grade'],
-                'subject': result['subject'],
-                'price': PRICE_MAP.get(result['grade'], 49.99),
-                'pdfFileName': result['new_filename'],
-                'fileSize': result['file_size'],
-                'pages': result['pages'],
-                'fileType': file_type,
-                'contentType': content_type,
-                'thumbnail': f"/images/products/{result['grade']}-{result['subject'].lower().replace(' ', '-')}.jpg",
-                'category': result['type'],
-                'tags': [
-                    result['grade'],
-                    result['subject'],
-                    result['type'],
-                    result['year'],
-                    'CAPS',
-                    'South Africa',
-                    file_type
-                ],
-                'downloads': 0,
-                'isActive': True,
-                'createdAt': datetime.now()
-            }
-            
-            # Insert into database
-            products_collection.insert_one(product)
-            print(f"✅ Imported: {product['title']} ({file_type})")
-            imported += 1
-            
-        except Exception as e:
-            print(f"❌ Error importing {result.get('new_filename', 'unknown')}: {e}")
-            errors += 1
+    print("=" * 80)
+    print("IMPORTING RESOURCES TO DATABASE")
+    print("=" * 80)
+    
+    # Stream results
+    if not follow and not os.path.exists(results_file):
+        print(f"❌ Results file not found: {results_file}")
+        print("Please run organize_pdfs.py first!")
+        return
+    
+    print(f"📊 Reading resources from {results_file}")
+    if follow:
+        print("👀 Following the stream until the organizer finishes...")
+    print()
+    
+    if collection is None:
+        collection = get_products_collection(pool_size=pool_size)
+    try:
+        ensure_indexes(collection)
+    except OperationFailure as e:
+        print(f"❌ Could not create unique index on pdfFileName: {e}")
+        print("Remove duplicate pdfFileName documents and run the import again.")
+        return
+    
+    counts = bulk_upsert(collection, iter_results(results_file, follow), batch_size, concurrency)
+    breakdown = collection_breakdown(collection)
     
     # Summary
     print("\n" + "=" * 80)
     print("IMPORT SUMMARY")
     print("=" * 80)
-    print(f"✅ Successfully imported: {imported}")
-    print(f"⏭️  Skipped (duplicates): {skipped}")
-    print(f"❌ Errors: {errors}")
-    print(f"📊 Total in database: {products_collection.count_documents({})}")
+    print(f"📥 Records read: {counts['read']}")
+    print(f"✅ Inserted: {counts['inserted']}")
+    print(f"🔄 Updated: {counts['updated']}")
+    print(f"⏭️  Unchanged: {counts['unchanged']}")
+    print(f"🔗 Duplicates skipped: {counts['aliases']}")
+    print(f"🪞 Near-duplicates folded into their product: {counts['near_duplicates']}")
+    print(f"❌ Errors: {counts['errors']}")
+    print(f"📊 Total in database: {breakdown['total']}")
     
     # Show breakdown by grade
     print("\n📚 Database Breakdown by Grade:")
-    pipeline = [
-        {'$group': {
-            '_id': '$grade',
-            'count': {'$sum': 1}
-        }},
-        {'$sort': {'_id': 1}}
-    ]
-    
-    for item in products_collection.aggregate(pipeline):
-        print(f"  {item['_id']}: {item['count']} resources")
+    for grade, count in breakdown['by_grade']:
+        print(f"  {grade}: {count} resources")
     
     # Show breakdown by file type
     print("\n📋 Database Breakdown by File Type:")
-    pipeline = [
-        {'$group': {
-            '_id': '$fileType',
-            'count': {'$sum': 1}
-        }},
-        {'$sort': {'_id': 1}}
-    ]
+    for file_type, count in breakdown['by_file_type']:
+        print(f"  {file_type}: {count} resources")
     
-    for item in products_collection.aggregate(pipeline):
-        print(f"  {item['_id']}: {item['count']} resources")
+    if snapshot_dir:
+        print()
+        print_snapshot_summary(write_snapshots(collection, snapshot_dir))
     
     print("\n✨ Import complete!")
+    return counts
+
+def parse_args(argv=None):
+    """Parse command-line options"""
+    parser = argparse.ArgumentParser(description="Import organized resources into MongoDB")
+    parser.add_argument('--results',
+                        help="organizer results (.jsonl stream or .json report)")
+    parser.add_argument('--follow', action='store_true',
+                        help="tail the JSONL stream while the organizer is still running")
+    parser.add_argument('--sync', action='store_true',
+                        help="insert, update, reprice and deactivate products to match the results")
+    parser.add_argument('--dry-run', action='store_true',
+                        help="with --sync, print the planned changes without writing them")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                        help=f"upserts per bulk write (default: {DEFAULT_BATCH_SIZE})")
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY,
+                        help=f"bulk writes in flight at once (default: {DEFAULT_CONCURRENCY})")
+    parser.add_argument('--pool-size', type=int, default=DEFAULT_POOL_SIZE,
+                        help=f"MongoDB connection pool size (default: {DEFAULT_POOL_SIZE})")
+    parser.add_argument('--snapshot-dir', default=SNAPSHOT_FOLDER,
+                        help=f"where storefront catalogue snapshots go (default: {SNAPSHOT_FOLDER})")
+    parser.add_argument('--no-snapshots', dest='snapshots', action='store_false',
+                        help="do not write catalogue snapshots after importing")
+    parser.add_argument('--snapshots-only', action='store_true',
+                        help="only rewrite the catalogue snapshots from the products collection")
+    return parser.parse_args(argv)
 
 if __name__ == "__main__":
-    import_to_database()
+    args = parse_args()
+    snapshot_dir = args.snapshot_dir if args.snapshots else None
+    if args.snapshots_only:
+        print_snapshot_summary(write_snapshots(get_products_collection(pool_size=args.pool_size), args.snapshot_dir))
+    elif args.sync:
+        sync_catalogue(results_file=args.results, dry_run=args.dry_run, pool_size=args.pool_size,
+                       snapshot_dir=snapshot_dir)
+    else:
+        import_to_database(results_file=args.results, batch_size=args.batch_size, follow=args.follow,
+                           concurrency=args.concurrency, pool_size=args.pool_size, snapshot_dir=snapshot_dir)
@@ -0,0 +1,136 @@
+import sys
+import json
+import math
+import time
+import heapq
+from contextlib import contextmanager
+
+# Per-file progress output: emoji lines, one JSON object per event, or nothing
+OUTPUT_MODES = ['text', 'json', 'quiet']
+
+_output_mode = 'text'
+
+def configure_output(mode):
+    """Select the per-file output mode (also used as a worker pool initializer)"""
+    global _output_mode
+    _output_mode = mode
+
+def output_mode():
+    """The per-file output mode, passed on to worker pools"""
+    return _output_mode
+
+def announce(*lines):
+    """Run-level progress and summary lines; suppressed in json mode, which emits events instead"""
+    if _output_mode != 'json':
+        for line in lines:
+            print(line)
+
+def emit(event, lines=(), **fields):
+    """Report a per-file event in the configured output mode
+
+    Text mode prints the human-readable lines; json mode prints a single
+    structured line with the fields instead; quiet mode prints nothing.
+    """
+    if _output_mode == 'text':
+        for line in lines:
+            print(line)
+    elif _output_mode == 'json':
+        sys.stdout.write(json.dumps({'event': event, **fields}, ensure_ascii=False, default=str) + "\n")
+
+def entry_results(entry):
+    """Every result recorded by a manifest entry: the file (or bundle) and any archive members"""
+    results = [entry['result']] if entry.get('result') else []
+    return results + entry.get('members', [])
+
+class StageClock:
+    """Wall time per pipeline stage for one file"""
+
+    def __init__(self):
+        self.timings = {}
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = self.timings.get(name, 0.0) + time.perf_counter() - start
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+def summarize(samples):
+    """count/total/p50/p95/max of a list of durations, in seconds"""
+    ordered = sorted(samples)
+    return {
+        'count': len(ordered),
+        'total': round(sum(ordered), 6),
+        'p50': round(percentile(ordered, 0.50), 6),
+        'p95': round(percentile(ordered, 0.95), 6),
+        'max': round(ordered[-1], 6)
+    }
+
+class PipelineProfile:
+    """Collects run-level and per-file stage timings for the organizer report"""
+
+    def __init__(self, slowest=20):
+        self.slowest = slowest
+        self.run_stages = {}
+        self.by_stage = {}
+        self.by_format = {}
+        self._slowest_files = []
+
+    @contextmanager
+    def stage(self, name):
+        """Time a run-level stage such as the directory walk"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.run_stages[name] = self.run_stages.get(name, 0.0) + time.perf_counter() - start
+
+    def record(self, stage, file_type, seconds):
+        """Add one per-file sample for a stage"""
+        self.by_stage.setdefault(stage, []).append(seconds)
+        self.by_format.setdefault(file_type, {}).setdefault(stage, []).append(seconds)
+
+    def record_file(self, file_path, file_type, timings):
+        """Add every stage sample for one file and track it among the slowest"""
+        if not timings:
+            return
+        for stage, seconds in timings.items():
+            self.record(stage, file_type, seconds)
+        entry = (sum(timings.values()), file_path, file_type, timings)
+        if len(self._slowest_files) < self.slowest:
+            heapq.heappush(self._slowest_files, entry)
+        else:
+            heapq.heappushpop(self._slowest_files, entry)
+
+    def report(self):
+        """Machine-readable report of every stage, format and the slowest files"""
+        return {
+            'generated_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'run_stages': {stage: round(seconds, 6) for stage, seconds in self.run_stages.items()},
+            'stages': {stage: summarize(samples) for stage, samples in self.by_stage.items()},
+            'formats': {
+                file_type: {stage: summarize(samples) for stage, samples in stages.items()}
+                for file_type, stages in self.by_format.items()
+            },
+            'slowest_files': [
+                {
+                    'path': file_path,
+                    'file_type': file_type,
+                    'seconds': round(total, 6),
+                    'stages': {stage: round(seconds, 6) for stage, seconds in timings.items()}
+                }
+                for total, file_path, file_type, timings in sorted(self._slowest_files, reverse=True)
+            ]
+        }
+
+    def save(self, report_path):
+        with open(report_path, 'w', encoding='utf-8') as f:
+            json.dump(self.report(), f, indent=2, ensure_ascii=False)
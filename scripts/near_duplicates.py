@@ -0,0 +1,165 @@
+import re
+import base64
+import struct
+import hashlib
+from array import array
+
+# Documents compared as sets of overlapping word 4-grams from their first words,
+# so a PDF export (first pages) and its DOCX (first paragraphs) cover similar text
+SHINGLE_SIZE = 4
+SHINGLE_WORDS = 400
+
+# Texts with fewer shingles than this (blank scans, cover pages) get no signature
+MIN_SHINGLES = 8
+
+# One-permutation MinHash: 64 slots of 32 bits, 256 bytes per document
+SIGNATURE_SLOTS = 64
+SIGNATURE_FORMAT = struct.Struct(f'<{SIGNATURE_SLOTS}I')
+
+# LSH banding: 16 bands of 4 slots. Pairs above ~0.5 similarity almost always share
+# a band; candidates are then checked against the threshold on the full signature.
+LSH_BANDS = 16
+
+# Estimated Jaccard similarity of shingle sets from which documents count as near-duplicates
+NEAR_DUPLICATE_THRESHOLD = 0.8
+
+# Words and numbers: worksheets that differ only in their numbers are different products
+WORD_REGEX = re.compile(r"[^\W_]+")
+
+# Stored signatures carry this prefix; ones without it were shingled differently and are recomputed
+SIGNATURE_PREFIX = 'v2:'
+
+EMPTY_SLOT = 0xFFFFFFFF
+
+# Only results that agree on all of these are compared: editions of one product, never a
+# different grade's or subject's document that happens to share its wording
+CLUSTER_KEY = ['grade', 'subject', 'type']
+
+# Which member of a cluster becomes the product: preferred formats first, then
+# the latest year, then the most pages
+FORMAT_PREFERENCE = ['pdf', 'word', 'powerpoint', 'excel']
+
+def minhash(text):
+    """256-byte MinHash signature of a document's text, or None if it is too short
+
+    Every shingle is hashed once; its low bits pick a slot and the slot keeps
+    the smallest high bits seen. Empty slots borrow from the next filled one,
+    so short texts still compare fairly.
+    """
+    words = WORD_REGEX.findall(text.lower())[:SHINGLE_WORDS]
+    if len(words) - SHINGLE_SIZE + 1 < MIN_SHINGLES:
+        return None
+    slots = [EMPTY_SLOT] * SIGNATURE_SLOTS
+    for i in range(len(words) - SHINGLE_SIZE + 1):
+        shingle = " ".join(words[i:i + SHINGLE_SIZE]).encode('utf-8')
+        value = int.from_bytes(hashlib.blake2b(shingle, digest_size=8).digest(), 'little')
+        slot = value % SIGNATURE_SLOTS
+        value >>= 32
+        if value < slots[slot]:
+            slots[slot] = value
+    if EMPTY_SLOT in slots:
+        original = list(slots)
+        for slot, value in enumerate(original):
+            if value != EMPTY_SLOT:
+                continue
+            distance = 1
+            while original[(slot + distance) % SIGNATURE_SLOTS] == EMPTY_SLOT:
+                distance += 1
+            # Mix in the distance so borrowed slots do not all agree by construction
+            borrowed = original[(slot + distance) % SIGNATURE_SLOTS]
+            slots[slot] = (borrowed ^ (distance * 0x9E3779B1)) & 0xFFFFFFFF
+    return SIGNATURE_FORMAT.pack(*slots)
+
+def encode_signature(signature):
+    """Signature as stored in results (prefixed base64 text), or None"""
+    return SIGNATURE_PREFIX + base64.b64encode(signature).decode('ascii') if signature else None
+
+def decode_signature(encoded):
+    return base64.b64decode(encoded[len(SIGNATURE_PREFIX):])
+
+def current_signature(encoded):
+    """True if a stored signature was made by this version of minhash"""
+    return bool(encoded) and encoded.startswith(SIGNATURE_PREFIX)
+
+def signature_of(text):
+    """Encoded MinHash of a document's text, as stored under 'minhash' in its result"""
+    return encode_signature(minhash(text))
+
+def similarity(a, b):
+    """Estimated Jaccard similarity of two signatures: the share of slots that agree"""
+    return sum(x == y for x, y in zip(SIGNATURE_FORMAT.unpack(a), SIGNATURE_FORMAT.unpack(b))) / SIGNATURE_SLOTS
+
+def find_clusters(signatures, threshold=NEAR_DUPLICATE_THRESHOLD, bands=LSH_BANDS):
+    """Group indexes of signatures that are near-duplicates; returns groups of two or more
+
+    Each band is bucketed in one pass, and a signature is compared with every
+    earlier one in its bucket that is not already in its cluster, so only
+    documents sharing a band are ever compared. Matches are merged with
+    union-find, so a cluster is everything connected by a chain of matches.
+    Only one band's buckets exist at a time.
+    """
+    parent = array('i', range(len(signatures)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    width = SIGNATURE_FORMAT.size // bands
+    for band in range(bands):
+        buckets = {}
+        for i, signature in enumerate(signatures):
+            if signature is None:
+                continue
+            bucket = buckets.setdefault(signature[band * width:(band + 1) * width], [])
+            for j in bucket:
+                root_i, root_j = find(i), find(j)
+                if root_i != root_j and similarity(signature, signatures[j]) >= threshold:
+                    parent[max(root_i, root_j)] = min(root_i, root_j)
+            bucket.append(i)
+
+    groups = {}
+    for i, signature in enumerate(signatures):
+        if signature is not None:
+            groups.setdefault(find(i), []).append(i)
+    return [group for group in groups.values() if len(group) > 1]
+
+def canonical_order(result):
+    file_type = result.get('file_type')
+    preference = FORMAT_PREFERENCE.index(file_type) if file_type in FORMAT_PREFERENCE else len(FORMAT_PREFERENCE)
+    return (preference, -int(result['year']), -(result.get('pages') or 0),
+            len(result['new_filename']), result['new_filename'])
+
+def mark_near_duplicates(results, threshold=NEAR_DUPLICATE_THRESHOLD):
+    """Cluster results by their 'minhash' signatures and record the clusters on them
+
+    The canonical member of each cluster gets 'near_duplicates' (the other
+    members' filenames); the others get 'near_duplicate_of' and their
+    'similarity' to it. Marks from earlier runs are cleared first. Only
+    results with the same grade, subject and type are compared. Aliases,
+    bundles and stale signatures are left out. Returns the clusters,
+    canonical result first.
+    """
+    groups = {}
+    for result in results:
+        for field in ('near_duplicates', 'near_duplicate_of', 'similarity'):
+            result.pop(field, None)
+        if (current_signature(result.get('minhash')) and not result.get('alias_of')
+                and result.get('file_type') != 'archive'):
+            groups.setdefault(tuple(result.get(field) for field in CLUSTER_KEY), []).append(result)
+
+    clusters = []
+    for _, candidates in sorted(groups.items(), key=lambda item: [str(value) for value in item[0]]):
+        signatures = [decode_signature(result['minhash']) for result in candidates]
+        for group in find_clusters(signatures, threshold):
+            clusters.append(sorted((candidates[i] for i in group), key=canonical_order))
+
+    for members in clusters:
+        canonical = members[0]
+        canonical_signature = decode_signature(canonical['minhash'])
+        canonical['near_duplicates'] = [member['new_filename'] for member in members[1:]]
+        for member in members[1:]:
+            member['near_duplicate_of'] = canonical['new_filename']
+            member['similarity'] = round(similarity(canonical_signature, decode_signature(member['minhash'])), 3)
+    return clusters
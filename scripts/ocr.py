@@ -0,0 +1,94 @@
+import os
+import shutil
+import subprocess
+
+from instrumentation import emit
+
+try:
+    import pymupdf
+except ImportError:
+    try:
+        import fitz as pymupdf
+    except ImportError:
+        pymupdf = None
+
+# Pages OCR'd per document, matching the pages read_pdf takes text from
+OCR_MAX_PAGES = 2
+
+# Rendering resolution; Tesseract is most accurate on 300 DPI scans
+OCR_DPI = 300
+
+OCR_LANGUAGES = 'eng'
+
+# Seconds allowed for Tesseract on a single page before giving up on it
+OCR_PAGE_TIMEOUT = 60
+
+def tesseract_path():
+    return shutil.which('tesseract')
+
+def ocr_available():
+    """True if PyMuPDF and a local tesseract binary are both installed"""
+    return pymupdf is not None and tesseract_path() is not None
+
+def ocr_page(png, tesseract=None):
+    """Run Tesseract on one rendered page, passed over stdin; returns its text"""
+    completed = subprocess.run(
+        [tesseract or tesseract_path(), 'stdin', 'stdout', '-l', OCR_LANGUAGES],
+        input=png, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+        timeout=OCR_PAGE_TIMEOUT, check=True
+    )
+    return completed.stdout.decode('utf-8', errors='replace')
+
+def ocr_pdf(pdf_path, max_pages=OCR_MAX_PAGES):
+    """Render the first max_pages of a PDF and OCR them; returns lowercased text"""
+    tesseract = tesseract_path()
+    text = ""
+    with pymupdf.open(pdf_path) as doc:
+        for i in range(min(max_pages, doc.page_count)):
+            pixmap = doc.load_page(i).get_pixmap(dpi=OCR_DPI, colorspace=pymupdf.csGRAY, alpha=False)
+            try:
+                text += ocr_page(pixmap.tobytes('png'), tesseract) + "\n"
+            except (subprocess.SubprocessError, OSError) as e:
+                emit('ocr_error', [f"    ⚠️  OCR failed on page {i + 1}: {e}"], path=pdf_path, error=str(e))
+    return text.lower()
+
+class OcrCache:
+    """OCR text on disk, one file per content hash, so no document is OCR'd twice
+
+    Entries are written atomically, so workers in several processes can share
+    one cache directory.
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, content_hash, max_pages):
+        return os.path.join(self.cache_dir, f"{content_hash}-{max_pages}.txt")
+
+    def get(self, content_hash, max_pages):
+        try:
+            with open(self._path(content_hash, max_pages), 'r', encoding='utf-8') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def put(self, content_hash, max_pages, text):
+        path = self._path(content_hash, max_pages)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+
+def cached_ocr(pdf_path, content_hash, cache_dir, max_pages=OCR_MAX_PAGES):
+    """OCR text for a PDF, from the cache when this content has been OCR'd before
+
+    Returns (text, True if it came from the cache).
+    """
+    cache = OcrCache(cache_dir)
+    text = cache.get(content_hash, max_pages)
+    if text is not None:
+        return text, True
+    text = ocr_pdf(pdf_path, max_pages)
+    cache.put(content_hash, max_pages, text)
+    return text, False
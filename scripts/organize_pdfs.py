@@ -1,8 +1,31 @@
+import io
 import os
-import shutil
 import re
 from pathlib import Path
 import json
+import time
+import uuid
+import hashlib
+import argparse
+import cProfile
+from collections import Counter, deque
+from contextlib import nullcontext
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import chain, islice, repeat
+
+from instrumentation import (
+    OUTPUT_MODES, PipelineProfile, StageClock, announce, configure_output, emit, entry_results, output_mode
+)
+from archives import MEMBER_SEPARATOR, archive_supported, iter_archive_members, member_path
+from extraction_cache import ExtractionCache, shared_cache
+from near_duplicates import NEAR_DUPLICATE_THRESHOLD, current_signature, mark_near_duplicates, signature_of
+from ocr import OCR_MAX_PAGES, OcrCache, cached_ocr, ocr_available
+from pdf_optimizer import MIN_SAVINGS, iter_optimized
+from placement import PLACEMENT_MODES, place_file
+from scanner import scan_files
+from search_index import SearchIndex
+from thumbnails import iter_thumbnailed
+from worker_pool import IsolatedPool, memory_limit_supported
 
 try:
     from PyPDF2 import PdfReader
@@ -29,6 +52,37 @@ RESOURCES_FOLDER = r"C:\caps-resources-website\Website"
 ORGANIZED_FOLDER = r"C:\caps-resources-website\server\storage\pdfs"
 THUMBNAILS_FOLDER = r"C:\caps-resources-website\images\products"
 
+# Incremental runs
+RESULTS_FILENAME = '_organization_results.json'
+STREAM_FILENAME = '_organization_results.jsonl'
+MANIFEST_FILENAME = '_organization_manifest.json'
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# Progress of the current run, appended every CHECKPOINT_INTERVAL files or
+# CHECKPOINT_SECONDS (whichever comes first) and removed when the run completes
+CHECKPOINT_FILENAME = '_organization_checkpoint.jsonl'
+CHECKPOINT_INTERVAL = 500
+CHECKPOINT_SECONDS = 30
+
+# Every destination is noted here before anything is written to it, so copies placed by a
+# run that died before recording them can be found and removed; cleared when a run completes
+PLACEMENTS_FILENAME = '_organization_placements.jsonl'
+
+# Exact-duplicate handling: record as an alias, hardlink to the first copy, or copy again
+DUPLICATE_MODES = ['alias', 'hardlink', 'copy']
+QUICK_HASH_BLOCK = 64 * 1024
+HASH_THREADS = 8
+
+# Stage timings report written after every run
+PROFILE_FILENAME = '_organization_profile.json'
+
+# Files that timed out, ran out of memory or crashed a worker, with the reason
+QUARANTINE_FILENAME = '_organization_quarantine.json'
+
+# Full-text search index of the extracted text, and the excerpt kept on each result
+SEARCH_INDEX_FILENAME = '_search_index.sqlite'
+TEXT_PREVIEW_LENGTH = 300
+
 # Supported file types
 SUPPORTED_EXTENSIONS = {
     'pdf': '.pdf',
@@ -38,6 +92,32 @@ SUPPORTED_EXTENSIONS = {
     'archive': ['.zip', '.rar', '.7z']
 }
 
+# Extensions picked up by the directory scan (one set lookup per entry); documents
+# inside archives are matched against DOCUMENT_SUFFIXES
+DOCUMENT_SUFFIXES = frozenset(['.pdf', '.docx', '.doc', '.xlsx', '.xls', '.pptx', '.ppt'])
+ARCHIVE_SUFFIXES = frozenset(['.zip', '.rar', '.7z'])
+SCAN_SUFFIXES = DOCUMENT_SUFFIXES | ARCHIVE_SUFFIXES
+
+# Threads listing directories ahead of the planner; raise it for network shares
+SCAN_THREADS = 1
+
+# OCR text of scanned PDFs, cached by content hash
+OCR_CACHE_FOLDER = '_ocr_cache'
+
+# Extracted text and page counts, cached by content hash so that re-runs and
+# --reclassify skip parsing; trimmed to EXTRACTION_CACHE_MB after every run.
+# Bump EXTRACTOR_VERSION whenever a reader changes what it extracts.
+EXTRACTION_CACHE_FILENAME = '_extraction_cache.sqlite'
+EXTRACTION_CACHE_MB = 1024
+EXTRACTOR_VERSION = 2
+
+# Clusters of near-identical documents (other editions, other formats) from the last run
+NEAR_DUPLICATES_FILENAME = '_near_duplicates.json'
+
+# process_file's answer for a PDF with no text layer and no grade in its name,
+# when the OCR lane is on
+OCR_PENDING = 'ocr'
+
 # Grade mappings
 GRADE_PATTERNS = {
     'preschool': ['preschool', 'pre-school', 'pre school', 'playgroup', 'creche'],
@@ -85,88 +165,186 @@ TYPE_PATTERNS = {
     'study-guides': ['study guide', 'revision', 'notes', 'studiegids', 'hersiening', 'summary']
 }
 
-def extract_text_from_pdf(pdf_path, max_pages=2):
-    """Extract text from first few pages of PDF"""
+YEAR_PATTERN = r'20\d{2}'
+
+def normalize_for_matching(text):
+    """Lowercase and collapse punctuation, underscores and whitespace to single spaces"""
+    return re.sub(r'[\W_]+', ' ', text.lower()).strip()
+
+def build_classifier():
+    """Compile every grade/subject/type pattern into one word-bounded alternation
+
+    Returns (regex, labels) where labels maps each normalized pattern to the
+    (category, label) pairs it scores for. Longer patterns are tried first so
+    'grade 12' wins over 'grade 1' and 'mathematical literacy' over 'math'.
+    """
+    labels = {}
+    for category, table in (('grade', GRADE_PATTERNS),
+                            ('subject', SUBJECT_PATTERNS),
+                            ('type', TYPE_PATTERNS)):
+        for label, patterns in table.items():
+            for pattern in patterns:
+                owners = labels.setdefault(normalize_for_matching(pattern), [])
+                if (category, label) not in owners:
+                    owners.append((category, label))
+    
+    alternation = '|'.join(re.escape(term) for term in sorted(labels, key=len, reverse=True))
+    # An optional plural 's' lets 'worksheets' count for 'worksheet'
+    regex = re.compile(rf'\b(?:(?P<term>{alternation})s?|(?P<year>{YEAR_PATTERN}))\b')
+    return regex, labels
+
+CLASSIFIER_REGEX, CLASSIFIER_LABELS = build_classifier()
+
+def source_name(source):
+    """Path to report for a document given as a path or as an in-memory stream"""
+    return getattr(source, 'name', source)
+
+def open_source(source):
+    """Open a path for binary reading; streams are used as they are"""
+    if isinstance(source, (str, os.PathLike)):
+        return open(source, 'rb')
+    return nullcontext(source)
+
+def read_pdf(pdf_path, max_pages=2):
+    """Open a PDF once and return (text of first few pages, page count), or None if it cannot be read"""
     if PdfReader is None:
-        return ""
+        return None
     try:
-        reader = PdfReader(pdf_path)
-        text = ""
-        for i in range(min(max_pages, len(reader.pages))):
-            text += reader.pages[i].extract_text() + "\n"
-        return text.lower()
+        with open_source(pdf_path) as stream:
+            reader = PdfReader(stream)
+            pages = len(reader.pages)
+            text = ""
+            for i in range(min(max_pages, pages)):
+                text += (reader.pages[i].extract_text() or "") + "\n"
+        return text.lower(), pages
     except Exception as e:
-        print(f"    ⚠️  Error reading PDF text: {e}")
-        return ""
+        emit('read_error', [f"    ⚠️  Error reading PDF text: {e}"], path=source_name(pdf_path), error=str(e))
+        return None
 
-def extract_text_from_docx(docx_path, max_paragraphs=20):
-    """Extract text from Word document"""
+def read_docx(docx_path, max_paragraphs=20):
+    """Open a Word document once and return (text, paragraph count), or None if it cannot be read"""
     if Document is None:
-        return ""
+        return None
     try:
         doc = Document(docx_path)
+        paragraphs = doc.paragraphs
         text = ""
-        for i, para in enumerate(doc.paragraphs[:max_paragraphs]):
+        for para in paragraphs[:max_paragraphs]:
             if para.text.strip():
                 text += para.text + "\n"
-            if i >= max_paragraphs:
-                break
-        return text.lower()
+        return text.lower(), len(paragraphs)
     except Exception as e:
-        print(f"    ⚠️  Error reading DOCX text: {e}")
-        return ""
+        emit('read_error', [f"    ⚠️  Error reading DOCX text: {e}"], path=source_name(docx_path), error=str(e))
+        return None
 
-def extract_text_from_excel(excel_path, max_cells=100):
-    """Extract text from Excel file"""
+def read_excel(excel_path, max_cells=100):
+    """Open a workbook once in read-only mode and return (text, sheet count), or None if it cannot be read"""
     if load_workbook is None:
-        return ""
+        return None
     try:
-        wb = load_workbook(excel_path)
-        ws = wb.active
-        text = ""
-        count = 0
-        for row in ws.iter_rows(values_only=True):
-            for cell in row:
-                if cell and count < max_cells:
-                    text += str(cell) + " "
-                    count += 1
-            if count >= max_cells:
-                break
-        return text.lower()
+        # read_only streams rows from the archive instead of building every sheet
+        wb = load_workbook(excel_path, read_only=True, data_only=True)
+        try:
+            sheets = len(wb.sheetnames)
+            text = ""
+            count = 0
+            for row in wb.active.iter_rows(values_only=True):
+                for cell in row:
+                    if cell and count < max_cells:
+                        text += str(cell) + " "
+                        count += 1
+                if count >= max_cells:
+                    break
+        finally:
+            wb.close()
+        return text.lower(), sheets
     except Exception as e:
-        print(f"    ⚠️  Error reading Excel text: {e}")
-        return ""
+        emit('read_error', [f"    ⚠️  Error reading Excel text: {e}"], path=source_name(excel_path), error=str(e))
+        return None
 
-def extract_text_from_pptx(pptx_path, max_slides=3):
-    """Extract text from PowerPoint"""
+def read_pptx(pptx_path, max_slides=3):
+    """Open a presentation once and return (text of first few slides, slide count), or None if it cannot be read"""
     if Presentation is None:
-        return ""
+        return None
     try:
         prs = Presentation(pptx_path)
+        slides = prs.slides
         text = ""
-        for i, slide in enumerate(prs.slides[:max_slides]):
+        for slide in islice(slides, max_slides):
             for shape in slide.shapes:
                 if hasattr(shape, "text"):
                     text += shape.text + "\n"
-        return text.lower()
+        return text.lower(), len(slides)
     except Exception as e:
-        print(f"    ⚠️  Error reading PPTX text: {e}")
-        return ""
+        emit('read_error', [f"    ⚠️  Error reading PPTX text: {e}"], path=source_name(pptx_path), error=str(e))
+        return None
+
+# What a document no reader can open contributes: no text and one page
+UNREADABLE = ("", 1)
+
+# One reader per file type; each opens the document exactly once
+DOCUMENT_READERS = {
+    'pdf': read_pdf,
+    'word': read_docx,
+    'excel': read_excel,
+    'powerpoint': read_pptx
+}
+
+def extract_document(file_path, size=None, stream=None):
+    """Open a document once and return its text, page count and size together
+
+    stream, if given, is a file object with the document's contents (e.g. an
+    archive member); file_path then only determines the document type.
+    'read' is False when the document could not be parsed.
+    """
+    reader = DOCUMENT_READERS.get(get_file_type(file_path))
+    read = reader(stream if stream is not None else file_path) if reader else None
+    text, pages = read or UNREADABLE
+    return {
+        'text': text,
+        'pages': pages,
+        'size': size if size is not None else os.path.getsize(file_path),
+        'read': read is not None
+    }
+
+def cached_extract(file_path, size=None, stream=None, cache=None, content_hash=None):
+    """extract_document, answered from the extraction cache when this content was seen before
+
+    Only successful reads are cached, so a document that failed to parse
+    (or whose library was missing) is parsed again next time.
+    """
+    cached = cache.get(content_hash) if cache and content_hash else None
+    if cached is not None:
+        return {
+            'text': cached['text'],
+            'pages': cached['pages'],
+            'size': size if size is not None else os.path.getsize(file_path),
+            'read': True
+        }
+    document = extract_document(file_path, size, stream)
+    if cache and content_hash and document['read']:
+        cache.put(content_hash, document['text'], document['pages'])
+    return document
+
+def extract_text_from_pdf(pdf_path, max_pages=2):
+    """Extract text from first few pages of PDF"""
+    return (read_pdf(pdf_path, max_pages) or UNREADABLE)[0]
+
+def extract_text_from_docx(docx_path, max_paragraphs=20):
+    """Extract text from Word document"""
+    return (read_docx(docx_path, max_paragraphs) or UNREADABLE)[0]
+
+def extract_text_from_excel(excel_path, max_cells=100):
+    """Extract text from Excel file"""
+    return (read_excel(excel_path, max_cells) or UNREADABLE)[0]
+
+def extract_text_from_pptx(pptx_path, max_slides=3):
+    """Extract text from PowerPoint"""
+    return (read_pptx(pptx_path, max_slides) or UNREADABLE)[0]
 
 def extract_text_from_file(file_path):
     """Extract text based on file type"""
-    ext = os.path.splitext(file_path)[1].lower()
-    
-    if ext == '.pdf':
-        return extract_text_from_pdf(file_path)
-    elif ext in ['.docx', '.doc']:
-        return extract_text_from_docx(file_path)
-    elif ext in ['.xlsx', '.xls']:
-        return extract_text_from_excel(file_path)
-    elif ext in ['.pptx', '.ppt']:
-        return extract_text_from_pptx(file_path)
-    else:
-        return ""
+    return extract_document(file_path)['text']
 
 def get_file_type(file_path):
     """Determine the file type category"""
@@ -185,59 +363,48 @@ def get_file_type(file_path):
     else:
         return 'other'
 
+def classify(text, filename):
+    """Score grade, subject, type and year in one pass over text and filename"""
+    combined = normalize_for_matching(text + " " + filename)
+    scores = {'grade': {}, 'subject': {}, 'type': {}}
+    year = None
+    
+    for match in CLASSIFIER_REGEX.finditer(combined):
+        term = match.group('term')
+        if term is None:
+            year = year or match.group('year')
+            continue
+        for category, label in CLASSIFIER_LABELS[term]:
+            scores[category][label] = scores[category].get(label, 0) + 1
+    
+    def best(category, patterns):
+        # Highest score wins; ties go to the label listed first in the patterns table
+        found = scores[category]
+        return max((label for label in patterns if label in found), key=found.get, default=None)
+    
+    return {
+        'grade': best('grade', GRADE_PATTERNS),
+        'subject': best('subject', SUBJECT_PATTERNS) or "General",
+        'type': best('type', TYPE_PATTERNS) or "worksheets",
+        'year': year or "2024",
+        'scores': scores
+    }
+
 def extract_grade(text, filename):
     """Extract grade from text and filename"""
-    combined = text + " " + filename.lower()
-    for grade, patterns in GRADE_PATTERNS.items():
-        for pattern in patterns:
-            if pattern.lower() in combined:
-                return grade
-    return None
+    return classify(text, filename)['grade']
 
 def extract_subject(text, filename):
     """Extract subject from text and filename"""
-    combined = text + " " + filename.lower()
-    
-    # Score each subject based on pattern matches
-    subject_scores = {}
-    for subject, patterns in SUBJECT_PATTERNS.items():
-        score = 0
-        for pattern in patterns:
-            # Count how many times the pattern appears
-            score += combined.count(pattern.lower())
-        if score > 0:
-            subject_scores[subject] = score
-    
-    # Return subject with highest score
-    if subject_scores:
-        return max(subject_scores, key=subject_scores.get)
-    return "General"
+    return classify(text, filename)['subject']
 
 def extract_type(text, filename):
     """Extract resource type from text and filename"""
-    combined = text + " " + filename.lower()
-    
-    # Score each type
-    type_scores = {}
-    for resource_type, patterns in TYPE_PATTERNS.items():
-        score = 0
-        for pattern in patterns:
-            score += combined.count(pattern.lower())
-        if score > 0:
-            type_scores[resource_type] = score
-    
-    if type_scores:
-        return max(type_scores, key=type_scores.get)
-    return "worksheets"
+    return classify(text, filename)['type']
 
 def extract_year(text, filename):
     """Extract year from text and filename"""
-    combined = text + " " + filename
-    year_pattern = r'\b(20\d{2})\b'
-    matches = re.findall(year_pattern, combined)
-    if matches:
-        return matches[0]
-    return "2024"
+    return classify(text, filename)['year']
 
 def clean_text_for_filename(text):
     """Clean text to be filename-safe"""
@@ -249,58 +416,174 @@ def clean_text_for_filename(text):
     text = re.sub(r'-+', '-', text)
     return text.strip('-').lower()
 
-def get_file_size_readable(file_path):
-    """Get file size in readable format"""
-    size_bytes = os.path.getsize(file_path)
+def make_text_preview(text, length=TEXT_PREVIEW_LENGTH):
+    """The start of the extracted text with whitespace collapsed, cut at a word boundary"""
+    preview = " ".join(text.split())
+    if len(preview) <= length:
+        return preview
+    return preview[:length].rsplit(" ", 1)[0]
+
+def format_file_size(size_bytes):
+    """Format a byte count in readable units"""
     for unit in ['B', 'KB', 'MB', 'GB']:
         if size_bytes < 1024.0:
             return f"{size_bytes:.1f} {unit}"
         size_bytes /= 1024.0
     return f"{size_bytes:.1f} TB"
 
+def get_file_size_readable(file_path):
+    """Get file size in readable format"""
+    return format_file_size(os.path.getsize(file_path))
+
 def get_page_count(file_path):
     """Get page/sheet count based on file type"""
-    file_type = get_file_type(file_path)
-    try:
-        if file_type == 'pdf' and PdfReader:
-            reader = PdfReader(file_path)
-            return len(reader.pages)
-        elif file_type == 'word' and Document:
-            doc = Document(file_path)
-            return len(doc.paragraphs)
-        elif file_type == 'excel' and load_workbook:
-            wb = load_workbook(file_path)
-            return len(wb.sheetnames)
-        elif file_type == 'powerpoint' and Presentation:
-            prs = Presentation(file_path)
-            return len(prs.slides)
-    except:
-        pass
-    return 1
-
-def process_file(file_path, output_base_dir):
-    """Process a single file"""
+    return extract_document(file_path)['pages']
+
+def hash_file(file_path, chunk_size=HASH_CHUNK_SIZE):
+    """SHA-256 of a file, streamed in fixed-size chunks"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def quick_hash(file_path, size, block_size=QUICK_HASH_BLOCK):
+    """Cheap duplicate pre-filter: SHA-256 of the first and last block only"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        digest.update(f.read(block_size))
+        if size > block_size:
+            f.seek(max(block_size, size - block_size))
+            digest.update(f.read(block_size))
+    return digest.hexdigest()
+
+def reserve_output_path(output_dir, base_name, ext):
+    """Atomically claim a free destination path, adding -1, -2... on collision.
+
+    The empty placeholder is created with O_EXCL so two workers targeting the
+    same {grade}-{subject}-{type}-{year} name can never both win it.
+    """
+    counter = 0
+    while True:
+        new_filename = f"{base_name}{ext}" if counter == 0 else f"{base_name}-{counter}{ext}"
+        output_path = os.path.join(output_dir, new_filename)
+        try:
+            fd = os.open(output_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            counter += 1
+            continue
+        os.close(fd)
+        return output_path, new_filename
+
+def journal_placement(output_base_dir, output_path, source):
+    """Note a claimed destination and the source it is for, before the copy is made"""
+    with open(os.path.join(output_base_dir, PLACEMENTS_FILENAME), 'a', encoding='utf-8') as f:
+        f.write(json.dumps({'path': output_path, 'source': source}, ensure_ascii=False) + "\n")
+
+def remove_orphans(output_base_dir, manifest):
+    """Delete journaled copies that no manifest result refers to, then clear the journal
+
+    Such copies were placed by a run that died (or a worker that was killed)
+    before the result was recorded; their source is processed again, so
+    keeping them would leave a second -1 copy. A copy whose source is gone
+    (a 'move' placement) is the only one left and is kept. Returns
+    (removed, kept).
+    """
+    journal_path = os.path.join(output_base_dir, PLACEMENTS_FILENAME)
+    if not os.path.exists(journal_path):
+        return 0, 0
+    referenced = {result['new_path'] for entry in manifest.values() for result in entry_results(entry)}
+    removed = kept = 0
+    with open(journal_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                placement = json.loads(line)
+            except ValueError:
+                # The line being written when the run died
+                continue
+            path = placement['path']
+            if path in referenced or not os.path.exists(path):
+                continue
+            if os.path.exists(placement['source'].split(MEMBER_SEPARATOR)[0]):
+                os.remove(path)
+                removed += 1
+            else:
+                kept += 1
+            referenced.add(path)
+    os.remove(journal_path)
+    return removed, kept
+
+def release_outputs(stale, manifest):
+    """Delete the organized copies of sources whose content changed, so the new copies take their names
+
+    stale maps each changed source to its previous manifest entry. A copy
+    that another entry still refers to (the canonical file of an alias) is
+    kept, and so is one placed with 'move', the only copy of the old
+    content. Returns the number of copies removed.
+    """
+    in_use = {result['new_path'] for file_path, entry in manifest.items() if file_path not in stale
+              for result in entry_results(entry)}
+    removed = 0
+    for entry in stale.values():
+        for result in entry_results(entry):
+            if result.get('placement') == 'move' or result['new_path'] in in_use:
+                continue
+            try:
+                os.remove(result['new_path'])
+                removed += 1
+            except OSError:
+                continue
+    return removed
+
+def write_member(data, output_path):
+    """Write an archive member's contents over its reserved output path"""
+    with open(output_path, 'wb') as f:
+        f.write(data)
+
+def process_file(file_path, output_base_dir, placement='copy', clock=None, size=None, data=None,
+                 ocr=False, ocr_text=None, cache=None, content_hash=None):
+    """Process a single file (or, with data, an archive member at a display path)
+
+    With ocr, a PDF without a text layer whose grade cannot be found is not
+    skipped but returned as OCR_PENDING; ocr_text replaces the extracted text.
+    With an extraction cache and the content hash, parsing is skipped for
+    content extracted before.
+    """
+    clock = clock or StageClock()
     try:
         filename = os.path.basename(file_path)
-        print(f"\nProcessing: {filename}")
+        emit('processing', [f"\nProcessing: {filename}"], path=file_path)
         
-        # Extract text from file
-        text = extract_text_from_file(file_path)
+        # Open the document once for text, page count and size
+        with clock.stage('extract'):
+            stream = None
+            if data is not None:
+                stream = io.BytesIO(data)
+                stream.name = file_path
+            document = cached_extract(file_path, size, stream, cache, content_hash)
+        text = document['text'] if ocr_text is None else ocr_text
         file_type = get_file_type(file_path)
         
         # Extract metadata
-        grade = extract_grade(text, filename)
-        subject = extract_subject(text, filename)
-        resource_type = extract_type(text, filename)
-        year = extract_year(text, filename)
+        with clock.stage('classify'):
+            metadata = classify(text, filename)
+            signature = signature_of(text)
+        grade = metadata['grade']
+        subject = metadata['subject']
+        resource_type = metadata['type']
+        year = metadata['year']
         
         if not grade:
-            print(f"  ⚠️  Could not determine grade, skipping...")
+            if ocr and file_type == 'pdf' and not text.strip():
+                emit('ocr_queued', [f"  🔍 No text layer, queued for OCR..."], path=file_path)
+                return OCR_PENDING
+            emit('skipped', [f"  ⚠️  Could not determine grade, skipping..."],
+                 path=file_path, reason='grade not found')
             return None
         
         # Get file info
-        pages = get_page_count(file_path)
-        file_size = get_file_size_readable(file_path)
+        pages = document['pages']
+        file_size = format_file_size(document['size'])
         ext = os.path.splitext(filename)[1]
         
         # Create new filename
@@ -310,24 +593,30 @@ def process_file(file_path, output_base_dir):
         output_dir = os.path.join(output_base_dir, grade, subject.replace(' ', '-'))
         os.makedirs(output_dir, exist_ok=True)
         
-        # Full output path
-        output_path = os.path.join(output_dir, new_filename)
-        
-        # Handle duplicates
-        counter = 1
-        base_name = new_filename[:-len(ext)]
-        while os.path.exists(output_path):
-            new_filename = f"{base_name}-{counter}{ext}"
-            output_path = os.path.join(output_dir, new_filename)
-            counter += 1
-        
-        # Copy file
-        shutil.copy2(file_path, output_path)
+        with clock.stage('place'):
+            # Claim a unique output path (safe across concurrent workers)
+            base_name = new_filename[:-len(ext)]
+            output_path, new_filename = reserve_output_path(output_dir, base_name, ext)
+            journal_placement(output_base_dir, output_path, file_path)
+            
+            # Copy/link/move the file (or write the member) over the reserved placeholder
+            try:
+                if data is not None:
+                    write_member(data, output_path)
+                    placed = 'extract'
+                else:
+                    placed = place_file(file_path, output_path, placement)
+            except Exception:
+                os.remove(output_path)
+                raise
         
-        print(f"  ✅ Organized as: {new_filename}")
-        print(f"  📁 Type: {file_type.upper()} | Location: {output_dir}")
-        print(f"  📊 Grade: {grade} | Subject: {subject} | Type: {resource_type}")
-        print(f"  📄 Size: {file_size} | Pages: {pages}")
+        emit('organized', [
+            f"  ✅ Organized as: {new_filename} ({placed})",
+            f"  📁 Type: {file_type.upper()} | Location: {output_dir}",
+            f"  📊 Grade: {grade} | Subject: {subject} | Type: {resource_type}",
+            f"  📄 Size: {file_size} | Pages: {pages}"
+        ], path=file_path, new_path=output_path, grade=grade, subject=subject,
+             type=resource_type, year=year, pages=pages, size_bytes=document['size'])
         
         return {
             'original_path': file_path,
@@ -340,94 +629,1305 @@ def process_file(file_path, output_base_dir):
             'year': year,
             'pages': pages,
             'file_size': file_size,
-            'extension': ext
+            'size_bytes': document['size'],
+            'extension': ext,
+            'placement': placed,
+            'text_preview': make_text_preview(text),
+            'minhash': signature,
+            # Handed to the search index by the main process, never stored in results
+            '_text': text
         }
         
+    except MemoryError:
+        # Let an isolated worker report it, so the file is quarantined rather than failed
+        raise
+    except Exception as e:
+        emit('error', [f"  ❌ Error processing {filename}: {e}"], path=file_path, error=str(e))
+        return None
+
+def fingerprint(file_path, content_hash=None, clock=None):
+    """Return (stat, content hash, quick hash) for a source file"""
+    clock = clock or StageClock()
+    stat = os.stat(file_path)
+    with clock.stage('hash'):
+        content_hash = content_hash or hash_file(file_path)
+        quick = quick_hash(file_path, stat.st_size)
+    return stat, content_hash, quick
+
+def process_and_hash(file_path, output_base_dir, content_hash=None, placement='copy', ocr=False,
+                     cache_path=None):
+    """Stat, hash and process one file; returns its manifest entry
+
+    The source is fingerprinted before processing because a 'move' placement
+    takes it away. Stage timings travel back under '_timings' for the profile,
+    and the extracted text under '_text' for the search index. A scanned PDF
+    left for the OCR lane has no result and '_ocr' set.
+    """
+    clock = StageClock()
+    try:
+        stat, content_hash, quick = fingerprint(file_path, content_hash, clock)
+    except OSError as e:
+        emit('error', [f"  ❌ Error reading {file_path}: {e}"], path=file_path, error=str(e))
+        return manifest_entry(None, None, None)
+    result = process_file(file_path, output_base_dir, placement, clock, stat.st_size, ocr=ocr,
+                          cache=shared_cache(cache_path, EXTRACTOR_VERSION), content_hash=content_hash)
+    needs_ocr = result == OCR_PENDING
+    if needs_ocr:
+        result = None
+    text = None
+    if result:
+        result['content_hash'] = content_hash
+        text = result.pop('_text')
+    entry = manifest_entry(stat, content_hash, result, quick)
+    entry['_timings'] = clock.timings
+    entry['_text'] = text
+    if needs_ocr:
+        entry['_ocr'] = True
+    return entry
+
+def process_scanned(file_path, output_base_dir, content_hash, placement='copy', cache_dir=None,
+                    max_pages=OCR_MAX_PAGES):
+    """OCR a PDF without a text layer and process it with the recognised text
+
+    Returns (result, text, timings) like process_member.
+    """
+    clock = StageClock()
+    try:
+        with clock.stage('ocr'):
+            text, cached = cached_ocr(file_path, content_hash, cache_dir, max_pages)
+    except Exception as e:
+        emit('error', [f"  ❌ Error running OCR on {os.path.basename(file_path)}: {e}"],
+             path=file_path, error=str(e))
+        return None, None, clock.timings
+    emit('ocr', [f"\n🔍 OCR{' (cached)' if cached else ''}: {os.path.basename(file_path)}"],
+         path=file_path, cached=cached, characters=len(text))
+    result = process_file(file_path, output_base_dir, placement, clock, ocr_text=text)
+    if result:
+        result['content_hash'] = content_hash
+        result['ocr'] = True
+        text = result.pop('_text')
+    return result, text, clock.timings
+
+def iter_ocr_lane(records, output_base_dir, workers=1, placement='copy', cache_dir=None,
+                  max_pages=OCR_MAX_PAGES):
+    """Pass (path, manifest entry) records through, finishing '_ocr' entries in their own pool
+
+    OCR is slow, so it gets a separate pool of workers with a bounded backlog:
+    ordinary records flow on while scans are recognised, and OCR'd records
+    are yielded as they complete (so not in input order).
+    """
+    pending = deque()
+    
+    def finish():
+        file_path, entry, future = pending.popleft()
+        result, text, timings = future.result()
+        entry['result'] = result
+        entry['_text'] = text
+        for stage, seconds in timings.items():
+            entry['_timings'][stage] = entry['_timings'].get(stage, 0) + seconds
+        return file_path, entry
+    
+    with ProcessPoolExecutor(max_workers=workers, initializer=configure_output,
+                             initargs=(output_mode(),)) as executor:
+        for file_path, entry in records:
+            if entry.pop('_ocr', False):
+                pending.append((file_path, entry, executor.submit(
+                    process_scanned, file_path, output_base_dir, entry['hash'], placement,
+                    cache_dir, max_pages)))
+            else:
+                yield file_path, entry
+            while pending and (pending[0][2].done() or len(pending) > workers * 4):
+                yield finish()
+        while pending:
+            yield finish()
+
+def iter_processed(files_to_process, output_base_dir, workers=1, hashes=None, placement='copy',
+                   timeout=None, memory_mb=None, ocr=False, cache_path=None, executor=None):
+    """Yield manifest entries in input order, optionally across a process pool
+
+    executor, if given, is a pool of workers processes shared with the later
+    stages. With a timeout or memory budget every file instead runs in an
+    isolated worker that is killed and replaced if it overruns; the entry for
+    such a file has no result and carries the reason under '_quarantine'.
+    """
+    known_hashes = [(hashes or {}).get(file_path) for file_path in files_to_process]
+    if timeout or memory_mb:
+        pool = IsolatedPool(workers, timeout, memory_mb, initializer=configure_output,
+                            initargs=(output_mode(),))
+        tasks = ((file_path, output_base_dir, content_hash, placement, ocr, cache_path)
+                 for file_path, content_hash in zip(files_to_process, known_hashes))
+        for file_path, (status, value) in zip(files_to_process, pool.imap(process_and_hash, tasks)):
+            if status == 'ok':
+                yield value
+                continue
+            emit('quarantined', [f"  🚧 Quarantined {os.path.basename(file_path)}: {value}"],
+                 path=file_path, kind=status, reason=value)
+            entry = manifest_entry(None, None, None)
+            entry['_quarantine'] = {'kind': status, 'reason': value}
+            yield entry
+        return
+    
+    if workers <= 1:
+        for file_path, content_hash in zip(files_to_process, known_hashes):
+            yield process_and_hash(file_path, output_base_dir, content_hash, placement, ocr, cache_path)
+        return
+    
+    with nullcontext(executor) if executor else ProcessPoolExecutor(
+            max_workers=workers, initializer=configure_output, initargs=(output_mode(),)) as executor:
+        # At most workers * 2 files are submitted ahead of the one being yielded, so a crash
+        # leaves few placed but unrecorded copies; yielding in submission order keeps
+        # merged results deterministic
+        pending = deque()
+        for file_path, content_hash in zip(files_to_process, known_hashes):
+            pending.append(executor.submit(process_and_hash, file_path, output_base_dir, content_hash,
+                                           placement, ocr, cache_path))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+def process_member(archive_path, member_name, data, output_base_dir, cache_path=None):
+    """Classify and organize one document read from an archive
+
+    Returns (result, text, timings); the member is written straight from memory.
+    """
+    clock = StageClock()
+    display_path = member_path(archive_path, member_name)
+    content_hash = hashlib.sha256(data).hexdigest()
+    result = process_file(display_path, output_base_dir, clock=clock, size=len(data), data=data,
+                          cache=shared_cache(cache_path, EXTRACTOR_VERSION), content_hash=content_hash)
+    text = None
+    if result:
+        result['content_hash'] = content_hash
+        result['archive_member'] = member_name
+        text = result.pop('_text')
+    return result, text, clock.timings
+
+def iter_member_results(archive_path, output_base_dir, executor=None, workers=1, cache_path=None):
+    """Yield process_member output for each document in an archive, in archive order
+
+    Members are read one at a time in this process and handed to the pool
+    with a bounded number in flight, so at most a few are held in memory.
+    """
+    members = iter_archive_members(archive_path, DOCUMENT_SUFFIXES)
+    if executor is None:
+        for name, data in members:
+            yield process_member(archive_path, name, data, output_base_dir, cache_path)
+        return
+    
+    pending = deque()
+    for name, data in members:
+        pending.append(executor.submit(process_member, archive_path, name, data, output_base_dir, cache_path))
+        while len(pending) > workers * 2:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+def dominant(values):
+    """Most common value, ties going to the one seen first"""
+    return Counter(values).most_common(1)[0][0]
+
+def bundle_result(archive_path, members, skipped, output_base_dir, placement='copy'):
+    """Place an archive under its members' dominant grade/subject as a bundle product"""
+    grade = dominant(m['grade'] for m in members)
+    subject = dominant(m['subject'] for m in members)
+    resource_type = dominant(m['type'] for m in members)
+    year = dominant(m['year'] for m in members)
+    size = os.path.getsize(archive_path)
+    ext = os.path.splitext(archive_path)[1]
+    
+    output_dir = os.path.join(output_base_dir, grade, subject.replace(' ', '-'))
+    os.makedirs(output_dir, exist_ok=True)
+    base_name = f"{grade}-{clean_text_for_filename(subject)}-{resource_type}-{year}-bundle"
+    output_path, new_filename = reserve_output_path(output_dir, base_name, ext)
+    journal_placement(output_base_dir, output_path, archive_path)
+    try:
+        placed = place_file(archive_path, output_path, placement)
+    except Exception:
+        os.remove(output_path)
+        raise
+    
+    member_files = [m['new_filename'] for m in members]
+    emit('organized', [
+        f"  📦 Bundle organized as: {new_filename} ({placed})",
+        f"  📊 Grade: {grade} | Subject: {subject} | Members: {len(members)} ({skipped} skipped)"
+    ], path=archive_path, new_path=output_path, grade=grade, subject=subject,
+         type=resource_type, year=year, members=len(members), size_bytes=size)
+    
+    return {
+        'original_path': archive_path,
+        'new_path': output_path,
+        'new_filename': new_filename,
+        'file_type': 'archive',
+        'grade': grade,
+        'subject': subject,
+        'type': resource_type,
+        'year': year,
+        'pages': sum(m['pages'] for m in members),
+        'file_size': format_file_size(size),
+        'size_bytes': size,
+        'extension': ext,
+        'placement': placed,
+        'text_preview': make_text_preview("Contains: " + ", ".join(member_files)),
+        'member_count': len(members),
+        'member_files': member_files,
+        'member_types': dict(Counter(m['file_type'] for m in members)),
+        'members_skipped': skipped
+    }
+
+def process_archive(archive_path, output_base_dir, executor=None, workers=1, content_hash=None,
+                    placement='copy', cache_path=None):
+    """Organize every document inside an archive, then the archive itself as a bundle
+
+    Returns a manifest entry whose result is the bundle and whose 'members'
+    holds one result per organized document. Member texts and timings travel
+    back under '_member_texts' and '_member_timings'.
+    """
+    clock = StageClock()
+    try:
+        stat, content_hash, quick = fingerprint(archive_path, content_hash, clock)
+    except OSError as e:
+        emit('error', [f"  ❌ Error reading {archive_path}: {e}"], path=archive_path, error=str(e))
+        return manifest_entry(None, None, None)
+    
+    emit('processing', [f"\nProcessing bundle: {os.path.basename(archive_path)}"], path=archive_path)
+    members = []
+    texts = []
+    timings = []
+    skipped = 0
+    try:
+        for result, text, member_timings in iter_member_results(archive_path, output_base_dir,
+                                                                executor, workers, cache_path):
+            if result is None:
+                skipped += 1
+                continue
+            members.append(result)
+            texts.append(text)
+            timings.append(member_timings)
     except Exception as e:
-        print(f"  ❌ Error processing {filename}: {e}")
+        # A corrupt archive keeps whatever members were organized before the damage
+        emit('error', [f"  ❌ Error reading bundle {os.path.basename(archive_path)}: {e}"],
+             path=archive_path, error=str(e))
+    
+    bundle = None
+    if members:
+        try:
+            with clock.stage('place'):
+                bundle = bundle_result(archive_path, members, skipped, output_base_dir, placement)
+            bundle['content_hash'] = content_hash
+        except Exception as e:
+            emit('error', [f"  ❌ Error placing bundle {os.path.basename(archive_path)}: {e}"],
+                 path=archive_path, error=str(e))
+    else:
+        emit('skipped', [f"  ⚠️  No classifiable documents in bundle, skipping..."],
+             path=archive_path, reason='empty bundle')
+    for member in members:
+        member['bundle'] = bundle['new_filename'] if bundle else None
+    
+    entry = manifest_entry(stat, content_hash, bundle, quick, members)
+    entry['_timings'] = clock.timings
+    entry['_member_texts'] = texts
+    entry['_member_timings'] = timings
+    return entry
+
+def iter_archives(archives, output_base_dir, workers=1, hashes=None, placement='copy', cache_path=None,
+                  executor=None):
+    """Yield a manifest entry per archive in order, sharing one pool (executor, or its own) for all members"""
+    own = None
+    if executor is None and workers > 1 and archives:
+        executor = own = ProcessPoolExecutor(max_workers=workers, initializer=configure_output,
+                                             initargs=(output_mode(),))
+    try:
+        for archive_path in archives:
+            yield process_archive(archive_path, output_base_dir, executor, workers,
+                                  (hashes or {}).get(archive_path), placement, cache_path)
+    finally:
+        if own:
+            own.shutdown()
+
+def load_manifest(manifest_path):
+    """Load the per-file manifest from a previous run (empty if missing or unreadable)"""
+    if not os.path.exists(manifest_path):
+        return {}
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            return json.load(f).get('files', {})
+    except (OSError, ValueError) as e:
+        announce(f"⚠️  Ignoring unreadable manifest {manifest_path}: {e}")
+        return {}
+
+def save_manifest(manifest_path, files):
+    """Atomically replace the manifest so a crash never leaves it half-written"""
+    tmp_path = manifest_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'version': 1, 'files': files}, f, ensure_ascii=False)
+    os.replace(tmp_path, manifest_path)
+
+def append_checkpoint(checkpoint_path, files, quarantined=()):
+    """Append (path, manifest entry) and (path, quarantine entry) pairs to the checkpoint
+
+    Only what changed since the last checkpoint is written, one JSON line per
+    file, so checkpointing costs the same however far the run has got.
+    """
+    with open(checkpoint_path, 'a', encoding='utf-8') as f:
+        for file_path, entry in files:
+            f.write(json.dumps({'path': file_path, 'entry': entry}, ensure_ascii=False) + "\n")
+        for file_path, held in quarantined:
+            f.write(json.dumps({'path': file_path, 'quarantine': held}, ensure_ascii=False) + "\n")
+
+def load_checkpoint(checkpoint_path):
+    """Return (files, quarantine) from an interrupted run's checkpoint (empty if none)
+
+    Later lines win: a file organized after it was quarantined leaves the
+    quarantine list. The line being written when the run died is skipped.
+    """
+    files = {}
+    quarantine = {}
+    if not os.path.exists(checkpoint_path):
+        return files, quarantine
+    try:
+        with open(checkpoint_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if 'quarantine' in record:
+                    quarantine[record['path']] = record['quarantine']
+                else:
+                    files[record['path']] = record['entry']
+                    quarantine.pop(record['path'], None)
+    except OSError as e:
+        announce(f"⚠️  Ignoring unreadable checkpoint {checkpoint_path}: {e}")
+    return files, quarantine
+
+def recover_streamed(stream_path, known):
+    """Manifest entries for files an interrupted run organized after its last checkpoint
+
+    Every result is streamed as soon as it is recorded, so the stream of the
+    interrupted run names the organized copies the checkpoint does not know
+    about. A result is taken over if its copy is still on disk and its source
+    still hashes to the same content; archives and their members are left to
+    be processed again.
+    """
+    recovered = {}
+    if not os.path.exists(stream_path):
+        return recovered
+    with open(stream_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except ValueError:
+                # The line being written when the run died
+                continue
+            file_path = result.get('original_path')
+            if ('_event' in result or file_path in known or file_path in recovered
+                    or MEMBER_SEPARATOR in file_path or result.get('file_type') == 'archive'
+                    or not result.get('content_hash') or not os.path.exists(result['new_path'])):
+                continue
+            try:
+                stat, content_hash, quick = fingerprint(file_path)
+            except OSError:
+                continue
+            if content_hash == result['content_hash']:
+                recovered[file_path] = manifest_entry(stat, content_hash, result, quick)
+    return recovered
+
+def load_quarantine(quarantine_path):
+    """Load the quarantine list from previous runs (empty if missing or unreadable)"""
+    if not os.path.exists(quarantine_path):
+        return {}
+    try:
+        with open(quarantine_path, 'r', encoding='utf-8') as f:
+            return json.load(f).get('files', {})
+    except (OSError, ValueError) as e:
+        announce(f"⚠️  Ignoring unreadable quarantine list {quarantine_path}: {e}")
+        return {}
+
+def save_quarantine(quarantine_path, files):
+    """Atomically replace the quarantine list"""
+    tmp_path = quarantine_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'version': 1, 'files': files}, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, quarantine_path)
+
+def still_quarantined(file_path, stat, quarantine):
+    """True if a file was quarantined and has not changed since"""
+    entry = quarantine.get(file_path)
+    return entry is not None and entry['mtime'] == stat.st_mtime_ns and entry['size'] == stat.st_size
+
+def manifest_entry(stat, content_hash, result, quick=None, members=None):
+    """Build the manifest record for one source file (stat is None if unreadable)
+
+    members lists the results of the documents organized out of an archive.
+    """
+    entry = {
+        'mtime': stat.st_mtime_ns if stat else None,
+        'size': stat.st_size if stat else None,
+        'hash': content_hash,
+        'quick': quick,
+        'result': result
+    }
+    if members is not None:
+        entry['members'] = members
+    return entry
+
+def output_intact(entry):
+    """True if the organized copies recorded in a manifest entry are still on disk"""
+    return all(os.path.exists(result['new_path']) for result in entry_results(entry))
+
+def moved_members(members, archive_path):
+    """Member results of an archive that now lives at archive_path"""
+    if members is None:
+        return None
+    return [dict(m, original_path=member_path(archive_path, m['archive_member'])) for m in members]
+
+def plan_incremental(scanned, manifest):
+    """Split files into reusable manifest entries and files that need processing
+
+    scanned yields (path, stat) pairs and is consumed lazily, so unchanged files
+    are matched while the directory walk is still running. Files whose path,
+    mtime and size match the manifest are reused without being opened. Files
+    that look changed, or that have the same size as an entry whose path has
+    disappeared, are hashed once the walk is complete: a matching hash means
+    the content is unchanged (or was renamed/moved) and the previous result is
+    reused. Returns (reused, renamed, pending) where reused maps
+    path -> manifest entry in scan order.
+    """
+    order = []
+    reused = {}
+    deferred = []
+    for file_path, stat in scanned:
+        order.append(file_path)
+        entry = manifest.get(file_path)
+        if entry and not output_intact(entry):
+            entry = None
+        
+        if entry and entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime_ns:
+            reused[file_path] = entry
+            continue
+        deferred.append((file_path, stat, entry))
+    
+    current = set(order)
+    # Entries whose source path vanished are rename/move candidates, indexed by size
+    vanished_by_size = {}
+    for path, entry in manifest.items():
+        if path not in current and entry.get('hash') and output_intact(entry):
+            vanished_by_size.setdefault(entry['size'], []).append(entry)
+    
+    renamed = 0
+    pending = []
+    for file_path, stat, entry in deferred:
+        candidates = vanished_by_size.get(stat.st_size, [])
+        if not (entry and entry['size'] == stat.st_size) and not candidates:
+            pending.append(file_path)
+            continue
+        
+        content_hash = hash_file(file_path)
+        if entry and entry['hash'] == content_hash:
+            # Touched but not modified
+            reused[file_path] = manifest_entry(stat, content_hash, entry['result'], entry.get('quick'),
+                                               entry.get('members'))
+            continue
+        
+        match = next((c for c in candidates if c['hash'] == content_hash), None)
+        if match:
+            candidates.remove(match)
+            result = match['result']
+            if result:
+                result = dict(result, original_path=file_path)
+            reused[file_path] = manifest_entry(stat, content_hash, result, match.get('quick'),
+                                               moved_members(match.get('members'), file_path))
+            renamed += 1
+            continue
+        
+        pending.append(file_path)
+    
+    reused = {file_path: reused[file_path] for file_path in order if file_path in reused}
+    return reused, renamed, pending
+
+def plan_dedup(pending, known_entries, sizes=None):
+    """Find exact duplicates among pending files and previously organized ones
+
+    Only files that share a size with another file are read, and only files
+    that also share a quick (first/last block) hash are fully hashed, so unique
+    files are never read here. Returns (unique, hashes, aliases): the files
+    that still need processing, the full hashes computed along the way, and a
+    map of duplicate path -> canonical (a previous result, or a pending path).
+    sizes may map each pending path to its size from the directory scan.
+    """
+    known = {}
+    known_keys = Counter()
+    for entry in known_entries:
+        result = entry.get('result')
+        if result and entry.get('hash') and not result.get('alias_of'):
+            known.setdefault(entry['hash'], result)
+            known_keys[(entry['size'], entry.get('quick'))] += 1
+    known_sizes = {size for size, _ in known_keys}
+    
+    if sizes is None:
+        sizes = {file_path: os.path.getsize(file_path) for file_path in pending}
+    size_counts = Counter(sizes.values())
+    candidates = [f for f in pending if size_counts[sizes[f]] > 1 or sizes[f] in known_sizes]
+    
+    with ThreadPoolExecutor(max_workers=HASH_THREADS) as executor:
+        quick = dict(zip(candidates, executor.map(lambda f: quick_hash(f, sizes[f]), candidates)))
+        quick_counts = Counter((sizes[f], q) for f, q in quick.items())
+        
+        def collides(file_path):
+            key = (sizes[file_path], quick[file_path])
+            # Manifests from older runs have no quick hash, so match those on size alone
+            return quick_counts[key] > 1 or known_keys[key] or known_keys[(sizes[file_path], None)]
+        
+        suspects = [f for f in candidates if collides(f)]
+        hashes = dict(zip(suspects, executor.map(hash_file, suspects)))
+    
+    unique = []
+    aliases = {}
+    first_seen = {}
+    for file_path in pending:
+        content_hash = hashes.get(file_path)
+        if content_hash in known:
+            aliases[file_path] = known[content_hash]
+        elif content_hash in first_seen:
+            aliases[file_path] = first_seen[content_hash]
+        else:
+            if content_hash:
+                first_seen[content_hash] = file_path
+            unique.append(file_path)
+    
+    return unique, hashes, aliases
+
+def _extract_text(file_path, content_hash=None, cache_path=None):
+    cache = shared_cache(cache_path, EXTRACTOR_VERSION)
+    return cached_extract(file_path, cache=cache, content_hash=content_hash)['text']
+
+def backfill_search_index(search_index, results, workers=1, cache_path=None):
+    """Index results reused from a manifest written before the search index existed
+
+    Text comes from the extraction cache or is extracted again from the
+    organized copies (the sources are not needed), and each result gains the
+    text_preview it was missing.
+    """
+    paths = [result['new_path'] for result in results]
+    hashes = [result.get('content_hash') for result in results]
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        if executor:
+            texts = executor.map(_extract_text, paths, hashes, repeat(cache_path),
+                                 chunksize=max(1, len(paths) // (workers * 8)))
+        else:
+            texts = map(_extract_text, paths, hashes, repeat(cache_path))
+        for result, text in zip(results, texts):
+            result['text_preview'] = make_text_preview(text)
+            search_index.upsert(result, text)
+    finally:
+        if executor:
+            executor.shutdown()
+
+def link_duplicate(canonical, file_path):
+    """Hardlink the duplicate file_path next to its canonical copy, falling back to a copy"""
+    base_name, ext = os.path.splitext(canonical['new_filename'])
+    output_path, new_filename = reserve_output_path(os.path.dirname(canonical['new_path']), base_name, ext)
+    journal_placement(ORGANIZED_FOLDER, output_path, file_path)
+    place_file(canonical['new_path'], output_path, 'hardlink')
+    return output_path, new_filename
+
+def alias_result(file_path, canonical, duplicates):
+    """Result record for an exact duplicate of an already organized file"""
+    if canonical is None:
         return None
+    result = dict(canonical, original_path=file_path, alias_of=canonical['new_filename'])
+    result.pop('thumbnails', None)
+    if duplicates == 'hardlink':
+        result['new_path'], result['new_filename'] = link_duplicate(canonical, file_path)
+    emit('duplicate', [f"  🔗 Duplicate of {canonical['new_filename']}: {os.path.basename(file_path)}"],
+         path=file_path, alias_of=canonical['new_filename'])
+    return result
+
+def new_summary():
+    """Running counts for the end-of-run summary, kept without holding results"""
+    return {'successful': 0, 'failed': 0, 'duplicates': 0, 'quarantined': 0, 'ocr': 0, 'bytes_saved': 0,
+            'optimized': 0, 'optimized_bytes_saved': 0, 'by_grade': {}, 'by_type': {}}
+
+def write_stream_event(stream, event, **fields):
+    """Append a control record (e.g. end of run) to the results stream"""
+    stream.write(json.dumps({'_event': event, **fields}) + "\n")
+    stream.flush()
+
+def start_stream(stream):
+    """Begin a results stream with a start event carrying a new run id
+
+    A follower that finds a completed stream waits for a new run id, so it
+    never mistakes an earlier run's results for the run it was started for.
+    """
+    write_stream_event(stream, 'start', run=uuid.uuid4().hex)
+
+def record_result(stream, summary, result):
+    """Append one result to the JSONL stream and update the summary counts"""
+    if not result:
+        summary['failed'] += 1
+        return
+    if result.get('alias_of'):
+        summary['duplicates'] += 1
+        summary['bytes_saved'] += result.get('size_bytes', 0)
+        stream.write(json.dumps(result, ensure_ascii=False) + "\n")
+        stream.flush()
+        return
+    summary['successful'] += 1
+    if result.get('ocr'):
+        summary['ocr'] += 1
+    if result.get('optimized'):
+        summary['optimized'] += 1
+        summary['optimized_bytes_saved'] += result['original_size_bytes'] - result['optimized_size_bytes']
+    subjects = summary['by_grade'].setdefault(result['grade'], {})
+    subjects[result['subject']] = subjects.get(result['subject'], 0) + 1
+    ftype = result['file_type'].upper()
+    summary['by_type'][ftype] = summary['by_type'].get(ftype, 0) + 1
+    
+    # One line per record, flushed so a crash keeps everything written so far
+    stream.write(json.dumps(result, ensure_ascii=False) + "\n")
+    stream.flush()
+
+def iter_stream_records(stream_path):
+    """Yield result records from a JSONL stream, skipping control events"""
+    with open(stream_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if '_event' not in record:
+                yield record
+
+def write_results_json(stream_path, results_file):
+    """Convert the JSONL stream into the JSON array report, one record at a time
+
+    A file can be streamed more than once (its near-duplicate marks are
+    appended once known); the report keeps only its last record.
+    """
+    last = {}
+    for i, record in enumerate(iter_stream_records(stream_path)):
+        last[record['original_path']] = i
+    keep = set(last.values())
+    tmp_path = results_file + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write("[")
+        written = 0
+        for i, record in enumerate(iter_stream_records(stream_path)):
+            if i not in keep:
+                continue
+            f.write(",\n" if written else "\n")
+            f.write(json.dumps(record, indent=2, ensure_ascii=False))
+            written += 1
+        f.write("\n]\n")
+    os.replace(tmp_path, results_file)
+
+def write_results(manifest, stream_path, results_file):
+    """Rewrite the results stream and JSON report from a manifest; returns the summary counts
+
+    The new stream is written beside the old one and renamed over it, so a
+    reader never sees it half-written.
+    """
+    summary = new_summary()
+    tmp_path = stream_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as stream:
+        start_stream(stream)
+        for entry in manifest.values():
+            record_result(stream, summary, entry['result'])
+            for member in entry.get('members', ()):
+                record_result(stream, summary, member)
+        write_stream_event(stream, 'end', successful=summary['successful'], failed=summary['failed'],
+                           duplicates=summary['duplicates'])
+    os.replace(tmp_path, stream_path)
+    write_results_json(stream_path, results_file)
+    return summary
+
+def near_duplicate_marks(result):
+    return tuple(result.get(field) for field in ('near_duplicates', 'near_duplicate_of', 'similarity'))
 
-def scan_and_organize():
+def find_near_duplicates(manifest, report_path, threshold=NEAR_DUPLICATE_THRESHOLD, cache_path=None):
+    """Cluster the manifest's documents by text similarity, mark them and save the clusters
+
+    Results organized without a signature, or with one from an older
+    version of minhash, get a new one from the extraction cache, when their
+    text is still there. Returns the clusters, canonical result first.
+    """
+    results = [result for entry in manifest.values() for result in entry_results(entry)]
+    unsigned = [result for result in results
+                if ('minhash' not in result or (result['minhash'] and not current_signature(result['minhash'])))
+                and result.get('content_hash')
+                and not result.get('alias_of') and result['file_type'] != 'archive']
+    if unsigned and cache_path:
+        with ExtractionCache(cache_path, EXTRACTOR_VERSION) as cache:
+            for result in unsigned:
+                cached = cache.get(result['content_hash'])
+                if cached is not None:
+                    result['minhash'] = signature_of(cached['text'])
+    
+    clusters = mark_near_duplicates(results, threshold)
+    report = {
+        'threshold': threshold,
+        'clusters': [{
+            'canonical': cluster[0]['new_filename'],
+            'members': [{'filename': member['new_filename'], 'original_path': member['original_path'],
+                         'similarity': member['similarity']} for member in cluster[1:]]
+        } for cluster in clusters]
+    }
+    tmp_path = report_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, report_path)
+    return clusters
+
+def scan_and_organize(workers=1, full=False, thumbnails=True, duplicates='alias', placement='copy',
+                      profile_report=None, slowest=20, timeout=None, memory_mb=None,
+                      retry_quarantined=False, scan_threads=SCAN_THREADS, index=True, ocr=False,
+                      ocr_workers=1, ocr_pages=OCR_MAX_PAGES, resume=False, cache_mb=EXTRACTION_CACHE_MB,
+                      near_duplicates=NEAR_DUPLICATE_THRESHOLD, optimize=False, min_savings=MIN_SAVINGS):
     """Main function to scan and organize all files"""
-    print("=" * 80)
-    print("CAPS RESOURCES DOCUMENT ORGANIZER")
-    print("=" * 80)
+    profile = PipelineProfile(slowest)
+    run_start = time.perf_counter()
+    announce("=" * 80)
+    announce("CAPS RESOURCES DOCUMENT ORGANIZER")
+    announce("=" * 80)
     
     # Create output directories
     os.makedirs(ORGANIZED_FOLDER, exist_ok=True)
     os.makedirs(THUMBNAILS_FOLDER, exist_ok=True)
     
-    # Find all supported files
-    supported_extensions = ['.pdf', '.docx', '.doc', '.xlsx', '.xls', '.pptx', '.ppt']
-    files_to_process = []
-    
-    if os.path.exists(RESOURCES_FOLDER):
-        for root, dirs, files in os.walk(RESOURCES_FOLDER):
-            for file in files:
-                if any(file.lower().endswith(ext) for ext in supported_extensions):
-                    files_to_process.append(os.path.join(root, file))
-    else:
-        print(f"❌ Resources folder not found: {RESOURCES_FOLDER}")
+    if not os.path.exists(RESOURCES_FOLDER):
+        announce(f"❌ Resources folder not found: {RESOURCES_FOLDER}")
         return
     
-    print(f"\n📂 Found {len(files_to_process)} supported files")
-    print(f"📤 Output directory: {ORGANIZED_FOLDER}\n")
+    # Find all supported files, matching unchanged ones against the manifest as they are found
+    manifest_path = os.path.join(ORGANIZED_FOLDER, MANIFEST_FILENAME)
+    manifest = {} if full else load_manifest(manifest_path)
     
-    # Process each file
-    results = []
-    successful = 0
-    failed = 0
+    # An interrupted run's checkpoint and results stream say what it already organized
+    checkpoint_path = os.path.join(ORGANIZED_FOLDER, CHECKPOINT_FILENAME)
+    stream_path = os.path.join(ORGANIZED_FOLDER, STREAM_FILENAME)
+    resumed_quarantine = {}
+    if resume:
+        checkpointed, resumed_quarantine = load_checkpoint(checkpoint_path)
+        recovered = recover_streamed(stream_path, checkpointed)
+        manifest = {**manifest, **checkpointed, **recovered}
+        announce(f"⏯️  Resuming: {len(checkpointed)} files from the checkpoint, "
+                 f"{len(recovered)} recovered from the results stream")
+        # The stream is started over below, so what it recovered is checkpointed first
+        append_checkpoint(checkpoint_path, recovered.items())
+    elif os.path.exists(checkpoint_path):
+        announce("⚠️  The previous run did not finish; pass --resume to continue it instead of starting over")
+        os.remove(checkpoint_path)
     
-    for file_path in files_to_process:
-        result = process_file(file_path, ORGANIZED_FOLDER)
-        if result:
-            results.append(result)
-            successful += 1
-        else:
-            failed += 1
+    # Start the new stream before the (long) scan, so a --follow import waits for this run
+    with open(stream_path, 'w', encoding='utf-8') as stream:
+        start_stream(stream)
+    
+    # Copies an interrupted run placed but never recorded are made again below
+    removed, kept = remove_orphans(ORGANIZED_FOLDER, manifest)
+    if removed or kept:
+        announce(f"🧹 Removed {removed} organized copies an interrupted run never recorded"
+                 + (f" ({kept} kept, their source is gone)" if kept else ""))
+    stats = {}
+    
+    def scanned():
+        for file_path, stat in scan_files(RESOURCES_FOLDER, SCAN_SUFFIXES, scan_threads):
+            stats[file_path] = stat
+            yield file_path, stat
+    
+    with profile.stage('scan'):
+        reused, renamed, pending = plan_incremental(scanned(), manifest)
+    
+    # A source placed with 'move' is no longer scanned; its organized copy is the document now
+    claimed = {result['new_path'] for entry in reused.values() for result in entry_results(entry)}
+    moved = {file_path: entry for file_path, entry in manifest.items()
+             if file_path not in stats and (entry['result'] or {}).get('placement') == 'move'
+             and output_intact(entry) and entry['result']['new_path'] not in claimed}
+    reused.update(moved)
+    
+    announce(f"\n📂 Found {len(stats)} supported files")
+    announce(f"📤 Output directory: {ORGANIZED_FOLDER}")
+    announce(f"⚙️  Workers: {workers} | Placement: {placement}")
+    if memory_mb and not memory_limit_supported():
+        announce("⚠️  --memory-limit needs psutil or /proc to measure workers, continuing without it")
+        memory_mb = None
+    if ocr and not ocr_available():
+        announce("⚠️  OCR needs PyMuPDF and a tesseract binary on PATH, continuing without OCR")
+        ocr = False
+    if ocr:
+        announce(f"🔍 OCR lane: {ocr_workers} workers, first {ocr_pages} pages of PDFs without text")
+    if optimize:
+        announce(f"🗜️  PDF optimization: kept when at least {min_savings:.0%} smaller")
+    announce(f"♻️  Unchanged: {len(reused) - renamed - len(moved)} | Renamed/moved: {renamed} | "
+             f"To process: {len(pending)}")
+    if moved:
+        announce(f"📦 Kept from earlier runs that moved their source: {len(moved)}")
+    
+    # Quarantined files are left alone until they change, or until asked to retry them
+    quarantine_path = os.path.join(ORGANIZED_FOLDER, QUARANTINE_FILENAME)
+    quarantine = {file_path: entry
+                  for file_path, entry in {**load_quarantine(quarantine_path), **resumed_quarantine}.items()
+                  if file_path in stats}
+    if retry_quarantined:
+        pending = [file_path for file_path in pending if file_path in quarantine]
+        announce(f"🚧 Retrying {len(pending)} quarantined files only")
+    elif quarantine:
+        held = [file_path for file_path in pending if still_quarantined(file_path, stats[file_path], quarantine)]
+        if held:
+            held = set(held)
+            pending = [file_path for file_path in pending if file_path not in held]
+            announce(f"🚧 Quarantined (unchanged, skipped): {len(held)}")
+    
+    # A changed file is organized again under its old name rather than next to its old copy
+    stale = {file_path: manifest[file_path] for file_path in pending if file_path in manifest}
+    if stale:
+        removed = release_outputs(stale, manifest)
+        announce(f"✏️  Changed since the last run: {len(stale)} ({removed} old copies replaced)")
+    
+    # Exact duplicates of files already organized (this run or before) are not copied again
+    hashes = {}
+    aliases = {}
+    if duplicates != 'copy':
+        known_entries = chain(reused.values(), (e for e in manifest.values() if output_intact(e)))
+        with profile.stage('dedup'):
+            pending, hashes, aliases = plan_dedup(pending, known_entries,
+                                                  {f: stats[f].st_size for f in pending})
+        announce(f"🔗 Exact duplicates: {len(aliases)} ({duplicates})")
+    
+    # Archives are opened in this process and their members fanned out to the workers
+    archives = [file_path for file_path in pending if get_file_type(file_path) == 'archive']
+    if archives:
+        pending = [file_path for file_path in pending if get_file_type(file_path) != 'archive']
+        unsupported = [file_path for file_path in archives if not archive_supported(file_path)]
+        for file_path in unsupported:
+            emit('skipped', [f"⚠️  No library installed for {os.path.basename(file_path)}, skipping..."],
+                 path=file_path, reason='archive format not supported')
+        archives = [file_path for file_path in archives if archive_supported(file_path)]
+        announce(f"📦 Bundles: {len(archives)}" + (f" ({len(unsupported)} unsupported)" if unsupported else ""))
+    
+    # Workers share the extraction cache; the main process creates it first
+    cache_path = os.path.join(ORGANIZED_FOLDER, EXTRACTION_CACHE_FILENAME) if cache_mb else None
+    if cache_path:
+        ExtractionCache(cache_path, EXTRACTOR_VERSION).close()
+    
+    # Index the text of every organized document; reused results from older runs are caught up here
+    search_index_path = os.path.join(ORGANIZED_FOLDER, SEARCH_INDEX_FILENAME)
+    search_index = SearchIndex(search_index_path) if index else None
+    if search_index:
+        indexed = search_index.filenames()
+        missing = [result for entry in reused.values() for result in entry_results(entry)
+                   if not result.get('alias_of') and result['file_type'] != 'archive'
+                   and (result['new_filename'] not in indexed or 'text_preview' not in result)]
+        if missing:
+            with profile.stage('index'):
+                backfill_search_index(search_index, missing, workers, cache_path)
+            announce(f"🔎 Added {len(missing)} previously organized documents to the search index")
+    announce("")
+    
+    # Process each file, streaming one record per result as it completes
+    summary = new_summary()
+    new_manifest = {}
+    
+    # Files, bundle members, PDF optimization and thumbnails share one pool of workers
+    # processes; only isolated workers and the OCR lane run beside it
+    executor = None
+    if workers > 1:
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=configure_output,
+                                       initargs=(output_mode(),))
+    
+    def processed():
+        canonical_paths = {c for c in aliases.values() if isinstance(c, str)}
+        canonical_results = {}
+        fast = zip(pending, iter_processed(pending, ORGANIZED_FOLDER, workers, hashes, placement,
+                                           timeout, memory_mb, ocr, cache_path, executor))
+        if ocr:
+            fast = iter_ocr_lane(fast, ORGANIZED_FOLDER, ocr_workers, placement,
+                                 os.path.join(ORGANIZED_FOLDER, OCR_CACHE_FOLDER), ocr_pages)
+        for file_path, entry in fast:
+            quarantined = entry.pop('_quarantine', None)
+            if quarantined:
+                stat = stats[file_path]
+                quarantine[file_path] = dict(quarantined, mtime=stat.st_mtime_ns, size=stat.st_size,
+                                             quarantined_at=time.strftime('%Y-%m-%dT%H:%M:%S'))
+                summary['quarantined'] += 1
+                continue
+            quarantine.pop(file_path, None)
+            profile.record_file(file_path, get_file_type(file_path), entry.pop('_timings', None))
+            text = entry.pop('_text', None)
+            if search_index and text is not None:
+                search_index.upsert(entry['result'], text)
+            if file_path in canonical_paths:
+                canonical_results[file_path] = entry['result']
+            yield file_path, entry
+        
+        for file_path, entry in zip(archives, iter_archives(archives, ORGANIZED_FOLDER, workers, hashes,
+                                                            placement, cache_path, executor)):
+            profile.record_file(file_path, 'archive', entry.pop('_timings'))
+            texts = entry.pop('_member_texts')
+            for member, text, timings in zip(entry['members'], texts, entry.pop('_member_timings')):
+                profile.record_file(member['original_path'], member['file_type'], timings)
+                if search_index:
+                    search_index.upsert(member, text)
+            if search_index and entry['result']:
+                search_index.upsert(entry['result'], " ".join(texts))
+            if file_path in canonical_paths:
+                canonical_results[file_path] = entry['result']
+            yield file_path, entry
+        
+        for file_path, canonical in aliases.items():
+            if isinstance(canonical, str):
+                canonical = canonical_results.get(canonical)
+            result = alias_result(file_path, canonical, duplicates)
+            yield file_path, manifest_entry(stats[file_path], hashes[file_path], result)
+    
+    records = chain(reused.items(), processed())
+    if optimize:
+        records = iter_optimized(records, format_file_size, min_savings, workers, profile, executor)
+    if thumbnails:
+        records = iter_thumbnailed(records, THUMBNAILS_FOLDER, workers, profile, executor)
+    
+    with profile.stage('process'), open(stream_path, 'a', encoding='utf-8') as stream, executor or nullcontext():
+        unsaved = []
+        checkpointed_quarantine = set(resumed_quarantine)
+        last_checkpoint = time.perf_counter()
+        for file_path, entry in records:
+            new_manifest[file_path] = entry
+            record_result(stream, summary, entry['result'])
+            for member in entry.get('members', ()):
+                record_result(stream, summary, member)
+            
+            # Reused entries are already in the manifest, so only new work goes into a checkpoint
+            if file_path not in reused:
+                unsaved.append((file_path, entry))
+            if (len(unsaved) >= CHECKPOINT_INTERVAL
+                    or time.perf_counter() - last_checkpoint >= CHECKPOINT_SECONDS):
+                held = [(path, quarantine[path]) for path in quarantine if path not in checkpointed_quarantine]
+                append_checkpoint(checkpoint_path, unsaved, held)
+                checkpointed_quarantine.update(path for path, _ in held)
+                unsaved = []
+                last_checkpoint = time.perf_counter()
+        
+        # Near-duplicates are found across every result, so only once all are in. Results
+        # whose marks changed are streamed again before the end event, so a --follow
+        # import folds them into their product before it stops reading.
+        near_duplicates_path = os.path.join(ORGANIZED_FOLDER, NEAR_DUPLICATES_FILENAME)
+        clusters = []
+        if near_duplicates:
+            results = [result for entry in new_manifest.values() for result in entry_results(entry)]
+            streamed = [near_duplicate_marks(result) for result in results]
+            with profile.stage('similarity'):
+                clusters = find_near_duplicates(new_manifest, near_duplicates_path, near_duplicates, cache_path)
+            for result, marks in zip(results, streamed):
+                if near_duplicate_marks(result) != marks:
+                    stream.write(json.dumps(result, ensure_ascii=False) + "\n")
+            stream.flush()
+        
+        write_stream_event(stream, 'end', successful=summary['successful'], failed=summary['failed'],
+                           duplicates=summary['duplicates'])
     
     # Summary
-    print("\n" + "=" * 80)
-    print("SUMMARY")
-    print("=" * 80)
-    print(f"✅ Successfully organized: {successful}")
-    print(f"❌ Failed: {failed}")
-    print(f"📊 Total processed: {len(files_to_process)}")
+    announce("\n" + "=" * 80)
+    announce("SUMMARY")
+    announce("=" * 80)
+    announce(f"✅ Successfully organized: {summary['successful']}")
+    announce(f"❌ Failed: {summary['failed']}")
+    announce(f"🔗 Duplicates: {summary['duplicates']} ({format_file_size(summary['bytes_saved'])} saved)")
+    announce(f"🚧 Quarantined this run: {summary['quarantined']} ({len(quarantine)} on the list)")
+    if ocr:
+        announce(f"🔍 Organized from OCR text: {summary['ocr']}")
+    if optimize:
+        announce(f"🗜️  Optimized PDFs: {summary['optimized']} "
+                 f"({format_file_size(summary['optimized_bytes_saved'])} smaller)")
+    if near_duplicates:
+        announce(f"🪞 Near-duplicates: {sum(len(c) - 1 for c in clusters)} documents in {len(clusters)} clusters")
+    announce(f"📊 Total processed: {len(stats)}")
     
     # Generate summary by grade and subject
-    print("\n📚 Resources by Grade:")
-    by_grade = {}
-    for result in results:
-        grade = result['grade']
-        if grade not in by_grade:
-            by_grade[grade] = []
-        by_grade[grade].append(result)
-    
+    announce("\n📚 Resources by Grade:")
+    by_grade = summary['by_grade']
     for grade in sorted(by_grade.keys()):
-        print(f"\n  {grade.upper()}: {len(by_grade[grade])} resources")
-        subjects = {}
-        for item in by_grade[grade]:
-            subject = item['subject']
-            subjects[subject] = subjects.get(subject, 0) + 1
-        for subject, count in sorted(subjects.items()):
-            print(f"    - {subject}: {count}")
+        announce(f"\n  {grade.upper()}: {sum(by_grade[grade].values())} resources")
+        for subject, count in sorted(by_grade[grade].items()):
+            announce(f"    - {subject}: {count}")
     
     # File type breakdown
-    print("\n📋 Resources by File Type:")
-    by_type = {}
-    for result in results:
-        ftype = result['file_type'].upper()
-        by_type[ftype] = by_type.get(ftype, 0) + 1
-    for ftype, count in sorted(by_type.items()):
-        print(f"  - {ftype}: {count}")
+    announce("\n📋 Resources by File Type:")
+    for ftype, count in sorted(summary['by_type'].items()):
+        announce(f"  - {ftype}: {count}")
     
     # Save results
-    results_file = os.path.join(ORGANIZED_FOLDER, '_organization_results.json')
-    with open(results_file, 'w', encoding='utf-8') as f:
-        json.dump(results, f, indent=2, ensure_ascii=False)
+    results_file = os.path.join(ORGANIZED_FOLDER, RESULTS_FILENAME)
+    with profile.stage('save'):
+        write_results_json(stream_path, results_file)
+        save_manifest(manifest_path, new_manifest)
+        save_quarantine(quarantine_path, quarantine)
+        # Left by workers killed after placing a file, e.g. quarantined ones
+        remove_orphans(ORGANIZED_FOLDER, new_manifest)
+        if os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+        if search_index:
+            # The index mirrors the results: documents no longer organized are dropped
+            search_index.retain(result['new_filename'] for entry in new_manifest.values()
+                                for result in entry_results(entry) if not result.get('alias_of'))
+            search_index.close()
+        if cache_path:
+            with ExtractionCache(cache_path, EXTRACTOR_VERSION) as cache:
+                evicted = cache.evict(cache_mb * 1024 * 1024)
+                cached_entries, cached_bytes = cache.size()
+    
+    profile.run_stages['total'] = time.perf_counter() - run_start
+    profile_report = profile_report or os.path.join(ORGANIZED_FOLDER, PROFILE_FILENAME)
+    profile.save(profile_report)
+    
+    announce(f"\n💾 Results streamed to: {stream_path}")
+    announce(f"💾 Results saved to: {results_file}")
+    announce(f"🗂️  Manifest saved to: {manifest_path}")
+    announce(f"🚧 Quarantine list saved to: {quarantine_path}")
+    if near_duplicates:
+        announce(f"🪞 Near-duplicate clusters saved to: {near_duplicates_path}")
+    if search_index:
+        announce(f"🔎 Search index saved to: {search_index_path}")
+    if cache_path:
+        announce(f"🧊 Extraction cache: {cached_entries} documents, {format_file_size(cached_bytes)} "
+                 f"({evicted} evicted) in {cache_path}")
+    announce(f"⏱️  Timings saved to: {profile_report}")
+    announce("\n✨ Organization complete!")
+    emit('summary', total=len(stats), successful=summary['successful'],
+         failed=summary['failed'], duplicates=summary['duplicates'], quarantined=summary['quarantined'],
+         ocr=summary['ocr'], bytes_saved=summary['bytes_saved'], optimized=summary['optimized'],
+         optimized_bytes_saved=summary['optimized_bytes_saved'],
+         near_duplicates=sum(len(c) - 1 for c in clusters),
+         by_grade=summary['by_grade'], by_type=summary['by_type'], results=results_file,
+         profile=profile_report, seconds=round(profile.run_stages['total'], 3))
+
+LABEL_FIELDS = ['grade', 'subject', 'type', 'year']
+
+def relabel(result, labels, output_base_dir, suffix=''):
+    """Rename an organized file to the name and folder its new labels call for
+
+    The file is renamed within the output folder, never copied. Returns True
+    if the labels changed.
+    """
+    if all(result[field] == labels[field] for field in LABEL_FIELDS):
+        return False
+    output_dir = os.path.join(output_base_dir, labels['grade'], labels['subject'].replace(' ', '-'))
+    os.makedirs(output_dir, exist_ok=True)
+    base_name = (f"{labels['grade']}-{clean_text_for_filename(labels['subject'])}-"
+                 f"{labels['type']}-{labels['year']}{suffix}")
+    output_path, new_filename = reserve_output_path(output_dir, base_name, result['extension'])
+    os.replace(result['new_path'], output_path)
+    result.update({field: labels[field] for field in LABEL_FIELDS},
+                  new_path=output_path, new_filename=new_filename)
+    return True
+
+def cached_text(result, cache, ocr_cache):
+    """Text a result was classified from, if it is still cached (None otherwise)"""
+    if result.get('ocr'):
+        return ocr_cache.get(result['content_hash'], OCR_MAX_PAGES) if ocr_cache else None
+    cached = cache.get(result['content_hash']) if result.get('content_hash') else None
+    return cached['text'] if cached else None
+
+def reclassify(index=True, placement='copy', near_duplicates=NEAR_DUPLICATE_THRESHOLD):
+    """Re-run classification over cached text and rename organized files to match
+
+    Meant for after a change to the grade/subject/type patterns: no document
+    is parsed, the text comes from the extraction cache (or the OCR cache for
+    scanned PDFs). Files whose labels change are renamed in place, and files
+    skipped earlier for want of a grade are organized if their text now
+    yields one. Documents without cached text, or that would lose their
+    grade, keep their current labels. Near-duplicate clusters are marked
+    again under the new names.
+    """
+    start = time.perf_counter()
+    announce("=" * 80)
+    announce("CAPS RESOURCES RECLASSIFICATION")
+    announce("=" * 80)
+    
+    manifest_path = os.path.join(ORGANIZED_FOLDER, MANIFEST_FILENAME)
+    manifest = load_manifest(manifest_path)
+    if not manifest:
+        announce(f"❌ No manifest in {ORGANIZED_FOLDER}; run the organizer first")
+        return
+    cache = ExtractionCache(os.path.join(ORGANIZED_FOLDER, EXTRACTION_CACHE_FILENAME), EXTRACTOR_VERSION)
+    ocr_cache_dir = os.path.join(ORGANIZED_FOLDER, OCR_CACHE_FOLDER)
+    ocr_cache = OcrCache(ocr_cache_dir) if os.path.isdir(ocr_cache_dir) else None
+    search_index_path = os.path.join(ORGANIZED_FOLDER, SEARCH_INDEX_FILENAME)
+    search_index = SearchIndex(search_index_path) if index else None
+    counts = Counter()
+    renamed = {}
     
-    print(f"\n💾 Results saved to: {results_file}")
-    print("\n✨ Organization complete!")
+    def update(result, labels=None, text=None, suffix=''):
+        if labels is None:
+            text = cached_text(result, cache, ocr_cache)
+            if text is None:
+                counts['uncached'] += 1
+                return None
+            labels = classify(text, os.path.basename(result['original_path']))
+            if not labels['grade']:
+                counts['kept'] += 1
+                return text
+        old = (result['new_path'], result['new_filename'])
+        if relabel(result, labels, ORGANIZED_FOLDER, suffix):
+            counts['relabelled'] += 1
+            renamed[old[1]] = (old[0], result)
+            emit('relabelled', [f"  🏷️  {old[1]} -> {result['new_filename']}"],
+                 path=result['original_path'], old_name=old[1], new_name=result['new_filename'])
+            if search_index and text is not None:
+                search_index.upsert(result, text)
+        else:
+            counts['unchanged'] += 1
+        return text
+    
+    for file_path, entry in manifest.items():
+        result = entry['result']
+        members = entry.get('members')
+        if members is not None:
+            texts = [update(member) for member in members]
+            if result and members:
+                labels = {field: dominant(m[field] for m in members) for field in LABEL_FIELDS}
+                update(result, labels, " ".join(t for t in texts if t), '-bundle')
+                for member in members:
+                    member['bundle'] = result['new_filename']
+        elif result is None:
+            # Skipped before; organize it if its cached text now names a grade
+            cached = cache.get(entry['hash']) if entry.get('hash') else None
+            if cached is None or not classify(cached['text'], os.path.basename(file_path))['grade']:
+                continue
+            try:
+                stat = os.stat(file_path)
+            except OSError:
+                continue
+            if stat.st_mtime_ns != entry['mtime'] or stat.st_size != entry['size']:
+                continue
+            result = process_file(file_path, ORGANIZED_FOLDER, placement, size=stat.st_size,
+                                  cache=cache, content_hash=entry['hash'])
+            if result:
+                result['content_hash'] = entry['hash']
+                text = result.pop('_text')
+                entry['result'] = result
+                counts['organized'] += 1
+                if search_index:
+                    search_index.upsert(result, text)
+        elif not result.get('alias_of'):
+            update(result)
+    
+    # Aliases follow the file they duplicate
+    for entry in manifest.values():
+        result = entry['result']
+        if not (result and result.get('alias_of') in renamed):
+            continue
+        old_path, canonical = renamed[result['alias_of']]
+        if result['new_path'] == old_path:
+            result.update({field: canonical[field] for field in LABEL_FIELDS},
+                          new_path=canonical['new_path'], new_filename=canonical['new_filename'])
+        else:
+            relabel(result, canonical, ORGANIZED_FOLDER)
+        result['alias_of'] = canonical['new_filename']
+    
+    if near_duplicates:
+        find_near_duplicates(manifest, os.path.join(ORGANIZED_FOLDER, NEAR_DUPLICATES_FILENAME),
+                             near_duplicates, cache.path)
+    results_file = os.path.join(ORGANIZED_FOLDER, RESULTS_FILENAME)
+    write_results(manifest, os.path.join(ORGANIZED_FOLDER, STREAM_FILENAME), results_file)
+    save_manifest(manifest_path, manifest)
+    remove_orphans(ORGANIZED_FOLDER, manifest)
+    if search_index:
+        search_index.retain(result['new_filename'] for entry in manifest.values()
+                            for result in entry_results(entry) if not result.get('alias_of'))
+        search_index.close()
+    cache.close()
+    
+    seconds = time.perf_counter() - start
+    announce("\n" + "=" * 80)
+    announce("SUMMARY")
+    announce("=" * 80)
+    announce(f"🏷️  Relabelled and renamed: {counts['relabelled']}")
+    announce(f"✅ Labels unchanged: {counts['unchanged']}")
+    announce(f"📥 Newly organized: {counts['organized']}")
+    announce(f"🧊 Not in the cache (labels kept): {counts['uncached']}")
+    announce(f"⚠️  No grade with the current patterns (labels kept): {counts['kept']}")
+    announce(f"⏱️  {seconds:.1f}s")
+    emit('summary', relabelled=counts['relabelled'], unchanged=counts['unchanged'],
+         organized=counts['organized'], uncached=counts['uncached'], kept=counts['kept'],
+         results=results_file, seconds=round(seconds, 3))
+
+def parse_args(argv=None):
+    """Parse command-line options"""
+    parser = argparse.ArgumentParser(description="Organize CAPS resource documents")
+    parser.add_argument('--resources', default=RESOURCES_FOLDER,
+                        help=f"folder to scan (default: {RESOURCES_FOLDER})")
+    parser.add_argument('--organized', default=ORGANIZED_FOLDER,
+                        help=f"where organized files and reports go (default: {ORGANIZED_FOLDER})")
+    parser.add_argument('--thumbnails-dir', default=THUMBNAILS_FOLDER,
+                        help=f"where thumbnails go (default: {THUMBNAILS_FOLDER})")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="number of worker processes (default: 1, no pool)")
+    parser.add_argument('--full', action='store_true',
+                        help="ignore the manifest and reprocess every file")
+    parser.add_argument('--resume', action='store_true',
+                        help="continue an interrupted run from its last checkpoint")
+    parser.add_argument('--reclassify', action='store_true',
+                        help="re-run classification over cached text only and rename organized files")
+    parser.add_argument('--cache-size', type=int, default=EXTRACTION_CACHE_MB, metavar='MB',
+                        help=f"extraction cache budget, 0 to disable (default: {EXTRACTION_CACHE_MB})")
+    parser.add_argument('--near-duplicates', type=float, default=NEAR_DUPLICATE_THRESHOLD, metavar='SIMILARITY',
+                        help=f"text similarity from which documents are clustered as near-duplicates, "
+                             f"0 to disable (default: {NEAR_DUPLICATE_THRESHOLD})")
+    parser.add_argument('--duplicates', choices=DUPLICATE_MODES, default='alias',
+                        help="exact duplicates: record as alias (default), hardlink, or copy again")
+    parser.add_argument('--placement', choices=PLACEMENT_MODES, default='copy',
+                        help="how organized files are created (default: copy); "
+                             "link modes fall back to copy across filesystems")
+    parser.add_argument('--output', choices=OUTPUT_MODES, default='text',
+                        help="per-file output: text (default), json lines, or quiet")
+    parser.add_argument('--profile-report',
+                        help=f"where to write the stage timings JSON (default: {PROFILE_FILENAME} in the output folder)")
+    parser.add_argument('--slowest', type=int, default=20,
+                        help="number of slowest files listed in the timings report")
+    parser.add_argument('--cprofile', metavar='PATH',
+                        help="also write a cProfile dump of the main process (use --workers 1 to cover everything)")
+    parser.add_argument('--timeout', type=float,
+                        help="seconds allowed per file; overruns are killed and quarantined (default: no limit)")
+    parser.add_argument('--memory-limit', type=int, metavar='MB',
+                        help="resident memory allowed per worker; overruns are killed and quarantined")
+    parser.add_argument('--retry-quarantined', action='store_true',
+                        help="process only the files on the quarantine list")
+    parser.add_argument('--scan-threads', type=int, default=SCAN_THREADS,
+                        help="threads listing directories during the scan (default: 1; try 8 on network shares)")
+    parser.add_argument('--no-index', dest='index', action='store_false',
+                        help="skip the full-text search index")
+    parser.add_argument('--ocr', action='store_true',
+                        help="OCR PDFs that have no text layer (needs a local tesseract)")
+    parser.add_argument('--ocr-workers', type=int, default=1,
+                        help="processes in the OCR pool, separate from --workers (default: 1)")
+    parser.add_argument('--ocr-pages', type=int, default=OCR_MAX_PAGES,
+                        help=f"pages OCR'd per document (default: {OCR_MAX_PAGES})")
+    parser.add_argument('--no-thumbnails', dest='thumbnails', action='store_false',
+                        help="skip first-page thumbnail rendering")
+    parser.add_argument('--optimize-pdfs', action='store_true',
+                        help="rewrite organized PDFs compressed and linearized for download")
+    parser.add_argument('--min-savings', type=float, default=MIN_SAVINGS * 100, metavar='PERCENT',
+                        help=f"keep the original unless optimizing saves this much (default: {MIN_SAVINGS:.0%})")
+    return parser.parse_args(argv)
 
 if __name__ == "__main__":
-    scan_and_organize()
+    args = parse_args()
+    RESOURCES_FOLDER, ORGANIZED_FOLDER, THUMBNAILS_FOLDER = args.resources, args.organized, args.thumbnails_dir
+    configure_output(args.output)
+    options = dict(workers=args.workers, full=args.full, thumbnails=args.thumbnails,
+                   duplicates=args.duplicates, placement=args.placement,
+                   profile_report=args.profile_report, slowest=args.slowest, timeout=args.timeout,
+                   memory_mb=args.memory_limit, retry_quarantined=args.retry_quarantined,
+                   scan_threads=args.scan_threads, index=args.index, ocr=args.ocr,
+                   ocr_workers=args.ocr_workers, ocr_pages=args.ocr_pages, resume=args.resume,
+                   cache_mb=args.cache_size, near_duplicates=args.near_duplicates,
+                   optimize=args.optimize_pdfs, min_savings=args.min_savings / 100)
+    if args.reclassify:
+        reclassify(index=args.index, placement=args.placement, near_duplicates=args.near_duplicates)
+    elif args.cprofile:
+        profiler = cProfile.Profile()
+        profiler.runcall(scan_and_organize, **options)
+        profiler.dump_stats(args.cprofile)
+        announce(f"🔬 cProfile stats saved to: {args.cprofile}")
+    else:
+        scan_and_organize(**options)
@@ -0,0 +1,212 @@
+import os
+import time
+import shutil
+import subprocess
+from collections import deque
+from contextlib import nullcontext
+from concurrent.futures import ProcessPoolExecutor
+
+from instrumentation import configure_output, emit, entry_results, output_mode
+
+try:
+    import pymupdf
+except ImportError:
+    try:
+        import fitz as pymupdf
+    except ImportError:
+        pymupdf = None
+
+try:
+    import pikepdf
+except ImportError:
+    pikepdf = None
+
+# Share of the original size an optimized PDF must save to replace it
+MIN_SAVINGS = 0.05
+
+# Seconds allowed for qpdf on a single document before giving up
+QPDF_TIMEOUT = 300
+
+# qpdf exits 3 when it wrote the output but warned about the input
+QPDF_WARNINGS = 3
+
+def qpdf_path():
+    return shutil.which('qpdf')
+
+def linearizer():
+    """Name of the tool that linearizes the output: qpdf, pikepdf or None"""
+    if qpdf_path():
+        return 'qpdf'
+    if pikepdf is not None:
+        return 'pikepdf'
+    return None
+
+def optimizer_available():
+    """True if PyMuPDF (deduplication and compression) or a linearizer is installed"""
+    return pymupdf is not None or linearizer() is not None
+
+def count_pages(pdf_path):
+    if pymupdf is not None:
+        with pymupdf.open(pdf_path) as doc:
+            return doc.page_count
+    if pikepdf is not None:
+        with pikepdf.open(pdf_path) as pdf:
+            return len(pdf.pages)
+    completed = subprocess.run([qpdf_path(), '--show-npages', pdf_path], stdout=subprocess.PIPE,
+                               stderr=subprocess.DEVNULL, timeout=QPDF_TIMEOUT, check=True)
+    return int(completed.stdout)
+
+def protected(pdf_path):
+    """True for encrypted or signed PDFs, which a rewrite would break"""
+    if pymupdf is None:
+        return False
+    with pymupdf.open(pdf_path) as doc:
+        return doc.needs_pass or doc.is_encrypted or doc.get_sigflags() > 0
+
+def compact_with_pymupdf(src, dst):
+    """Drop unused objects, merge identical ones (repeated images and fonts) and deflate every stream"""
+    with pymupdf.open(src) as doc:
+        doc.save(dst, garbage=4, deflate=True, deflate_images=True, deflate_fonts=True, use_objstms=1)
+
+def linearize_with_qpdf(src, dst):
+    completed = subprocess.run(
+        [qpdf_path(), '--linearize', '--object-streams=generate', '--compress-streams=y',
+         '--recompress-flate', src, dst],
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, timeout=QPDF_TIMEOUT
+    )
+    if completed.returncode not in (0, QPDF_WARNINGS):
+        raise subprocess.CalledProcessError(completed.returncode, completed.args,
+                                            stderr=completed.stderr)
+
+def linearize_with_pikepdf(src, dst):
+    with pikepdf.open(src) as pdf:
+        pdf.save(dst, linearize=True, object_stream_mode=pikepdf.ObjectStreamMode.generate,
+                 compress_streams=True, recompress_flate=True)
+
+LINEARIZERS = {
+    'qpdf': linearize_with_qpdf,
+    'pikepdf': linearize_with_pikepdf
+}
+
+def optimize_pdf(pdf_path, min_savings=MIN_SAVINGS):
+    """Rewrite an organized PDF for download, in place; returns the sizes to record
+
+    PyMuPDF compacts and compresses the file, then qpdf or pikepdf (whichever
+    is installed) linearizes it so viewers can show page one before the rest
+    arrives. The rewrite only replaces the file if it has the same number of
+    pages and is at least min_savings smaller. Because it is renamed over the
+    organized path, a hardlinked or symlinked source is never touched.
+    Returns None if nothing could be tried (no tooling, encrypted or signed).
+    """
+    original_size = os.path.getsize(pdf_path)
+    if protected(pdf_path):
+        return None
+    steps = []
+    if pymupdf is not None:
+        steps.append(('pymupdf', compact_with_pymupdf))
+    if linearizer():
+        steps.append((linearizer(), LINEARIZERS[linearizer()]))
+    if not steps:
+        return None
+
+    pages = count_pages(pdf_path)
+    outcome = {'original_size_bytes': original_size, 'optimized_size_bytes': original_size, 'optimized': None}
+    current = pdf_path
+    temporary = []
+    try:
+        for tool, step in steps:
+            output = f"{pdf_path}.{os.getpid()}.{tool}.tmp"
+            temporary.append(output)
+            step(current, output)
+            current = output
+        optimized_size = os.path.getsize(current)
+        optimized_pages = count_pages(current)
+        if optimized_pages != pages:
+            emit('optimize_rejected', [f"    ⚠️  Kept {os.path.basename(pdf_path)}: optimized copy has "
+                                       f"{optimized_pages} pages, not {pages}"],
+                 path=pdf_path, pages=pages, optimized_pages=optimized_pages)
+            return outcome
+        if original_size - optimized_size < original_size * min_savings:
+            return outcome
+        shutil.copymode(pdf_path, current)
+        os.replace(current, pdf_path)
+        outcome['optimized_size_bytes'] = optimized_size
+        outcome['optimized'] = "+".join(tool for tool, _ in steps)
+        return outcome
+    finally:
+        for path in temporary:
+            if os.path.exists(path):
+                os.remove(path)
+
+def timed_optimize(pdf_path, min_savings=MIN_SAVINGS):
+    """optimize_pdf plus the seconds it took, for the stage profile; errors leave the file as it was"""
+    start = time.perf_counter()
+    try:
+        outcome = optimize_pdf(pdf_path, min_savings)
+    except Exception as e:
+        emit('optimize_error', [f"    ⚠️  Error optimizing {os.path.basename(pdf_path)}: {e}"],
+             path=pdf_path, error=str(e))
+        outcome = None
+    return outcome, time.perf_counter() - start
+
+def apply_optimization(result, outcome, format_size):
+    """Record original and served sizes on a result; file_size follows the served file"""
+    if not outcome:
+        return
+    result.update(outcome)
+    if outcome['optimized']:
+        result['size_bytes'] = outcome['optimized_size_bytes']
+        result['file_size'] = format_size(outcome['optimized_size_bytes'])
+
+def _needs_optimizing(result):
+    return (result is not None
+            and result.get('file_type') == 'pdf'
+            and not result.get('alias_of')
+            and 'original_size_bytes' not in result)
+
+def iter_optimized(records, format_size, min_savings=MIN_SAVINGS, workers=1, profile=None, executor=None):
+    """Optimize the PDFs in a stream of (key, manifest entry) records, preserving order
+
+    Works like iter_thumbnailed: a process pool with a bounded number of
+    documents in flight. PDFs already tried on an earlier run (their result
+    has 'original_size_bytes') pass straight through, as do aliases, which
+    share their canonical copy's file. executor, if given, is a process pool
+    of workers processes shared with the other stages.
+    """
+    if not optimizer_available():
+        emit('optimize_disabled', ["⚠️  Neither PyMuPDF, qpdf nor pikepdf is installed, skipping PDF optimization"])
+        yield from records
+        return
+
+    if workers <= 1:
+        for key, entry in records:
+            for result in entry_results(entry):
+                if _needs_optimizing(result):
+                    outcome, seconds = timed_optimize(result['new_path'], min_savings)
+                    apply_optimization(result, outcome, format_size)
+                    if profile:
+                        profile.record('optimize', result['file_type'], seconds)
+            yield key, entry
+        return
+
+    with nullcontext(executor) if executor else ProcessPoolExecutor(
+            max_workers=workers, initializer=configure_output, initargs=(output_mode(),)) as executor:
+        pending = deque()
+
+        def finish():
+            (key, entry), futures = pending.popleft()
+            for result, future in futures:
+                outcome, seconds = future.result()
+                apply_optimization(result, outcome, format_size)
+                if profile:
+                    profile.record('optimize', result['file_type'], seconds)
+            return key, entry
+
+        for key, entry in records:
+            futures = [(result, executor.submit(timed_optimize, result['new_path'], min_savings))
+                       for result in entry_results(entry) if _needs_optimizing(result)]
+            pending.append(((key, entry), futures))
+            while len(pending) > workers * 4:
+                yield finish()
+        while pending:
+            yield finish()
@@ -0,0 +1,124 @@
+import os
+import errno
+import shutil
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# How organized copies are created from the source files
+PLACEMENT_MODES = ['copy', 'hardlink', 'reflink', 'symlink', 'move']
+
+# Linux ioctl that shares a file's extents (btrfs, XFS, bcachefs...)
+FICLONE = 0x40049409
+
+COPY_CHUNK_SIZE = 8 * 1024 * 1024
+
+# Errors meaning "this fast path is not available here", not "the copy failed"
+FALLBACK_ERRNOS = {
+    errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP,
+    errno.ENOTTY, errno.EBADF, errno.EPERM
+}
+
+def _copy_file_range(src_fd, dst_fd, size):
+    """Copy inside the kernel; may share extents on filesystems that support it"""
+    copied = 0
+    while copied < size:
+        sent = os.copy_file_range(src_fd, dst_fd, min(COPY_CHUNK_SIZE, size - copied))
+        if sent == 0:
+            break
+        copied += sent
+
+def _sendfile(src_fd, dst_fd, size):
+    """Copy inside the kernel without bouncing through user-space buffers"""
+    copied = 0
+    while copied < size:
+        sent = os.sendfile(dst_fd, src_fd, copied, min(COPY_CHUNK_SIZE, size - copied))
+        if sent == 0:
+            break
+        copied += sent
+
+KERNEL_COPIERS = [
+    copier for name, copier in (('copy_file_range', _copy_file_range), ('sendfile', _sendfile))
+    if hasattr(os, name)
+]
+
+def fast_copy(src, dst):
+    """Copy contents with copy_file_range/sendfile where available, then metadata"""
+    with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+        src_fd, dst_fd = fsrc.fileno(), fdst.fileno()
+        size = os.fstat(src_fd).st_size
+        for copier in KERNEL_COPIERS:
+            try:
+                copier(src_fd, dst_fd, size)
+                break
+            except OSError as e:
+                if e.errno not in FALLBACK_ERRNOS:
+                    raise
+                # Discard any partial progress before trying the next method
+                os.lseek(src_fd, 0, os.SEEK_SET)
+                os.lseek(dst_fd, 0, os.SEEK_SET)
+                os.ftruncate(dst_fd, 0)
+        else:
+            shutil.copyfileobj(fsrc, fdst, COPY_CHUNK_SIZE)
+    shutil.copystat(src, dst)
+
+def reflink(src, dst):
+    """Clone src into dst sharing extents (copy-on-write); raises OSError if unsupported"""
+    if fcntl is None:
+        raise OSError(errno.EOPNOTSUPP, "reflink is not supported on this platform")
+    with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+        fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+    shutil.copystat(src, dst)
+
+def _link_over(make_link, src, dst):
+    """Create a link at a temporary name and rename it over dst
+
+    dst is the placeholder claimed by reserve_output_path; replacing it
+    atomically means no other worker can claim the name in between.
+    """
+    tmp_path = f"{dst}.{os.getpid()}.link"
+    make_link(src, tmp_path)
+    try:
+        os.replace(tmp_path, dst)
+    except OSError:
+        os.remove(tmp_path)
+        raise
+
+def place_file(src, dst, mode='copy'):
+    """Put src at dst using the requested mode; returns the mode actually used
+
+    hardlink, reflink and symlink fall back to a copy when the filesystem (or a
+    filesystem boundary) does not allow them; move falls back to copy-and-delete.
+    """
+    if mode == 'hardlink':
+        try:
+            _link_over(os.link, src, dst)
+            return 'hardlink'
+        except OSError:
+            pass
+    elif mode == 'symlink':
+        try:
+            _link_over(os.symlink, os.path.abspath(src), dst)
+            return 'symlink'
+        except OSError:
+            pass
+    elif mode == 'reflink':
+        try:
+            reflink(src, dst)
+            return 'reflink'
+        except OSError:
+            pass
+    elif mode == 'move':
+        try:
+            os.replace(src, dst)
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+            fast_copy(src, dst)
+            os.remove(src)
+        return 'move'
+
+    fast_copy(src, dst)
+    return 'copy'
@@ -0,0 +1,73 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+# Directory listings kept in flight ahead of the consumer, per scan thread
+SCAN_LOOKAHEAD = 4
+
+def _scan_directory(path, suffixes):
+    """List one directory: matching files with their stat, and subdirectories, both sorted
+
+    DirEntry caches its stat, so each entry costs at most one stat call (none
+    for the file/directory test on Windows and most Linux filesystems).
+    Unreadable directories and entries are skipped, as os.walk does.
+    """
+    files = []
+    subdirs = []
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.path)
+                    elif os.path.splitext(entry.name)[1].lower() in suffixes and entry.is_file():
+                        files.append((entry.path, entry.stat()))
+                except OSError:
+                    continue
+    except OSError:
+        return [], []
+    files.sort()
+    subdirs.sort()
+    return files, subdirs
+
+def _walk(path, suffixes):
+    files, subdirs = _scan_directory(path, suffixes)
+    yield from files
+    for subdir in subdirs:
+        yield from _walk(subdir, suffixes)
+
+def _walk_concurrent(executor, root, suffixes, limit):
+    stack = [root]
+    listings = {}
+    while stack:
+        path = stack.pop()
+        future = listings.pop(path, None)
+        files, subdirs = future.result() if future else _scan_directory(path, suffixes)
+        stack.extend(reversed(subdirs))
+        # Start listing the directories consumed next, at most limit at once
+        for upcoming in reversed(stack):
+            if len(listings) >= limit:
+                break
+            if upcoming not in listings:
+                listings[upcoming] = executor.submit(_scan_directory, upcoming, suffixes)
+        yield from files
+
+def scan_files(root, suffixes, threads=1):
+    """Lazily yield (path, stat) for files under root whose lowercase extension is in suffixes
+
+    Files come out in the same order as a sorted os.walk (a directory's files,
+    then its subdirectories depth first). With threads > 1, the next
+    directories in that order are listed concurrently ahead of the consumer,
+    at most SCAN_LOOKAHEAD per thread, which hides the per-directory latency
+    of network shares while keeping that order.
+    """
+    suffixes = frozenset(suffixes)
+    if threads <= 1:
+        yield from _walk(root, suffixes)
+        return
+
+    executor = ThreadPoolExecutor(max_workers=threads)
+    try:
+        yield from _walk_concurrent(executor, root, suffixes, threads * SCAN_LOOKAHEAD)
+    finally:
+        # Stop listing ahead if the consumer gives up early
+        executor.shutdown(wait=True, cancel_futures=True)
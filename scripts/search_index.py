@@ -0,0 +1,290 @@
+import os
+import re
+import sqlite3
+import argparse
+from collections import OrderedDict
+
+# Bumped when the schema changes; an index with another version is rebuilt
+SCHEMA_VERSION = 2
+
+# BM25 with a match in the name column weighted 5x one in the document text;
+# the labels column only serves grade/subject/type filters and does not score
+RANK_FUNCTION = 'bm25(5.0, 1.0, 0.0)'
+
+FACET_FIELDS = ['grade', 'subject', 'type']
+
+# Recent search/facet answers kept in memory. BM25 ranking costs time in
+# proportion to the number of matches, so broad queries (a subject name) are
+# the slow ones, and also the ones a storefront repeats most.
+QUERY_CACHE_SIZE = 256
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY,
+    filename TEXT NOT NULL UNIQUE,
+    content_hash TEXT,
+    grade TEXT,
+    subject TEXT,
+    type TEXT,
+    year TEXT,
+    file_type TEXT,
+    name TEXT,
+    text TEXT,
+    labels TEXT
+);
+CREATE INDEX IF NOT EXISTS documents_grade_subject ON documents (grade, subject);
+CREATE TABLE IF NOT EXISTS facet_counts (
+    id INTEGER PRIMARY KEY,
+    grade TEXT,
+    subject TEXT,
+    type TEXT,
+    documents INTEGER NOT NULL,
+    UNIQUE (grade, subject, type)
+);
+CREATE TABLE IF NOT EXISTS document_facets (
+    id INTEGER PRIMARY KEY,
+    facets INTEGER NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts USING fts5(
+    name, text, labels, content='documents', content_rowid='id', tokenize='porter unicode61'
+);
+CREATE TRIGGER IF NOT EXISTS documents_ai AFTER INSERT ON documents BEGIN
+    INSERT INTO documents_fts (rowid, name, text, labels) VALUES (new.id, new.name, new.text, new.labels);
+    INSERT INTO facet_counts (grade, subject, type, documents) VALUES (new.grade, new.subject, new.type, 1)
+        ON CONFLICT (grade, subject, type) DO UPDATE SET documents = documents + 1;
+    INSERT INTO document_facets (id, facets) SELECT new.id, id FROM facet_counts
+        WHERE grade = new.grade AND subject = new.subject AND type = new.type;
+END;
+CREATE TRIGGER IF NOT EXISTS documents_ad AFTER DELETE ON documents BEGIN
+    INSERT INTO documents_fts (documents_fts, rowid, name, text, labels)
+    VALUES ('delete', old.id, old.name, old.text, old.labels);
+    UPDATE facet_counts SET documents = documents - 1
+        WHERE grade = old.grade AND subject = old.subject AND type = old.type;
+    DELETE FROM document_facets WHERE id = old.id;
+END;
+CREATE TRIGGER IF NOT EXISTS documents_au AFTER UPDATE ON documents BEGIN
+    INSERT INTO documents_fts (documents_fts, rowid, name, text, labels)
+    VALUES ('delete', old.id, old.name, old.text, old.labels);
+    INSERT INTO documents_fts (rowid, name, text, labels) VALUES (new.id, new.name, new.text, new.labels);
+    UPDATE facet_counts SET documents = documents - 1
+        WHERE grade = old.grade AND subject = old.subject AND type = old.type;
+    INSERT INTO facet_counts (grade, subject, type, documents) VALUES (new.grade, new.subject, new.type, 1)
+        ON CONFLICT (grade, subject, type) DO UPDATE SET documents = documents + 1;
+    UPDATE document_facets SET facets = (SELECT id FROM facet_counts
+        WHERE grade = new.grade AND subject = new.subject AND type = new.type)
+        WHERE id = new.id;
+END;
+"""
+
+def searchable_name(result):
+    """Words a shopper might type for a document: its original name plus its labels"""
+    original = os.path.splitext(os.path.basename(result.get('original_path', '')))[0]
+    return " ".join([original, result['grade'], result['subject'], result['type'], result['year']])
+
+def label_token(field, value):
+    """One searchable token per facet value, e.g. ('subject', 'Life Skills') -> 'subjectlifeskills'"""
+    return field + re.sub(r'[^a-z0-9]', '', value.lower())
+
+def searchable_labels(result):
+    return " ".join(label_token(field, result[field]) for field in FACET_FIELDS)
+
+def to_match_query(query, filters=None):
+    """Turn free text into an FTS5 query: every word must match, the last as a prefix
+
+    Words are quoted so that user input can never be read as FTS5 syntax.
+    filters maps facet fields to required values, matched as label tokens so
+    that FTS5 narrows the candidates itself.
+    """
+    words = re.findall(r'\w+', query.lower())
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += '*'
+    match = "{name text} : (" + " ".join(terms) + ")"
+    for field, value in (filters or {}).items():
+        if value:
+            match += f' AND labels : "{label_token(field, value)}"'
+    return match
+
+class SearchIndex:
+    """On-disk full-text index of organized documents (SQLite FTS5, BM25 ranking)"""
+
+    def __init__(self, path):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        version = self.connection.execute("PRAGMA user_version").fetchone()[0]
+        if version not in (0, SCHEMA_VERSION):
+            self.connection.executescript(
+                "DROP TABLE IF EXISTS documents_fts; DROP TABLE IF EXISTS documents; "
+                "DROP TABLE IF EXISTS facet_counts; DROP TABLE IF EXISTS document_facets;")
+        self.connection.executescript(SCHEMA)
+        self.connection.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+        self._cache = OrderedDict()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.connection.commit()
+        self.connection.close()
+
+    def commit(self):
+        """Make changes so far visible to other readers without closing the index"""
+        self.connection.commit()
+
+    def _cached(self, key, compute):
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            return self._cache[key]
+        value = self._cache[key] = compute()
+        if len(self._cache) > QUERY_CACHE_SIZE:
+            self._cache.popitem(last=False)
+        return value
+
+    def clear_cache(self):
+        """Forget cached answers (done automatically whenever the index changes)"""
+        self._cache.clear()
+
+    def filenames(self):
+        """Every organized filename currently in the index"""
+        return {row[0] for row in self.connection.execute("SELECT filename FROM documents")}
+
+    def upsert(self, result, text):
+        """Add or refresh one organized document"""
+        self._cache.clear()
+        self.connection.execute(
+            """INSERT INTO documents (filename, content_hash, grade, subject, type, year, file_type,
+                                       name, text, labels)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+               ON CONFLICT (filename) DO UPDATE SET
+                   content_hash=excluded.content_hash, grade=excluded.grade, subject=excluded.subject,
+                   type=excluded.type, year=excluded.year, file_type=excluded.file_type,
+                   name=excluded.name, text=excluded.text, labels=excluded.labels""",
+            (result['new_filename'], result.get('content_hash'), result['grade'], result['subject'],
+             result['type'], result['year'], result.get('file_type'), searchable_name(result), text,
+             searchable_labels(result))
+        )
+
+    def retain(self, filenames):
+        """Drop every document whose filename is not in filenames; returns how many"""
+        self._cache.clear()
+        self.connection.execute("CREATE TEMP TABLE IF NOT EXISTS keep (filename TEXT PRIMARY KEY)")
+        self.connection.execute("DELETE FROM keep")
+        self.connection.executemany("INSERT OR IGNORE INTO keep VALUES (?)", ((f,) for f in filenames))
+        removed = self.connection.execute(
+            "DELETE FROM documents WHERE filename NOT IN (SELECT filename FROM keep)").rowcount
+        self.connection.commit()
+        return removed
+
+    def optimize(self):
+        """Merge FTS5 segments; worth doing after a large batch of changes"""
+        self.connection.execute("INSERT INTO documents_fts (documents_fts) VALUES ('optimize')")
+        self.connection.commit()
+
+
+    def search(self, query, grade=None, subject=None, doc_type=None, limit=20, offset=0):
+        """Best matches for query, most relevant first, optionally within a grade/subject/type
+
+        FTS5 scores every match but builds snippets only for the rows it
+        returns, so ranking and snippets share one pass over the matches;
+        document fields are then fetched for those rows by id.
+        """
+        key = ('search', query, grade, subject, doc_type, limit, offset)
+        return [dict(hit) for hit in self._cached(
+            key, lambda: self._search(query, grade, subject, doc_type, limit, offset))]
+
+    def _search(self, query, grade, subject, doc_type, limit, offset):
+        match = to_match_query(query, {'grade': grade, 'subject': subject, 'type': doc_type})
+        if match is None:
+            return []
+        ranked = self.connection.execute(
+            """SELECT rowid, rank, snippet(documents_fts, 1, '[', ']', '…', 12) FROM documents_fts
+               WHERE documents_fts MATCH ? AND rank MATCH ?
+               ORDER BY rank LIMIT ? OFFSET ?""",
+            (match, RANK_FUNCTION, limit, offset)
+        ).fetchall()
+        if not ranked:
+            return []
+        
+        # A second MATCH would walk every match again, so fields are looked up by id
+        ids = [row[0] for row in ranked]
+        placeholders = ",".join("?" * len(ids))
+        details = {
+            row['id']: row for row in self.connection.execute(
+                f"""SELECT id, filename, grade, subject, type, year, file_type
+                    FROM documents WHERE id IN ({placeholders})""",
+                ids
+            )
+        }
+        hits = []
+        for rowid, score, snippet in ranked:
+            hit = dict(details[rowid])
+            del hit['id']
+            hit['snippet'] = snippet
+            hit['score'] = score
+            hits.append(hit)
+        return hits
+
+    def facets(self, query=None, grade=None, subject=None, doc_type=None):
+        """Document counts per grade, subject and type, for all documents or those matching query"""
+        key = ('facets', query, grade, subject, doc_type)
+        facets = self._cached(key, lambda: self._facets(query, grade, subject, doc_type))
+        return {field: dict(counts) for field, counts in facets.items()}
+
+    def _facets(self, query, grade, subject, doc_type):
+        filters = {'grade': grade, 'subject': subject, 'type': doc_type}
+        columns = ", ".join(f"c.{field}" for field in FACET_FIELDS)
+        if query:
+            match = to_match_query(query, filters)
+            if match is None:
+                return {field: {} for field in FACET_FIELDS}
+            # Matches are counted per combination id in the narrow document_facets
+            # table; the wide documents rows are never read
+            sql = f"""SELECT {columns}, m.documents FROM (
+                          SELECT f.facets, COUNT(*) AS documents
+                          FROM documents_fts JOIN document_facets f ON f.id = documents_fts.rowid
+                          WHERE documents_fts MATCH ? GROUP BY f.facets
+                      ) m JOIN facet_counts c ON c.id = m.facets"""
+            params = [match]
+        else:
+            # Without a query the counts kept up to date by the triggers are the answer
+            sql = f"SELECT {columns}, c.documents FROM facet_counts c WHERE c.documents > 0"
+            params = []
+            for field, value in filters.items():
+                if value:
+                    sql += f" AND c.{field} = ?"
+                    params.append(value)
+        # Counts per combination, summed per field
+        facets = {field: {} for field in FACET_FIELDS}
+        for *values, count in self.connection.execute(sql, params):
+            for field, value in zip(FACET_FIELDS, values):
+                facets[field][value] = facets[field].get(value, 0) + count
+        return {field: dict(sorted(counts.items(), key=lambda item: -item[1]))
+                for field, counts in facets.items()}
+
+def parse_args(argv=None):
+    """Parse command-line options"""
+    parser = argparse.ArgumentParser(description="Search the organized documents")
+    parser.add_argument('index', help="path to the search index written by organize_pdfs.py")
+    parser.add_argument('query')
+    parser.add_argument('--grade')
+    parser.add_argument('--subject')
+    parser.add_argument('--type', dest='doc_type')
+    parser.add_argument('--limit', type=int, default=20)
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    args = parse_args()
+    with SearchIndex(args.index) as index:
+        for hit in index.search(args.query, args.grade, args.subject, args.doc_type, args.limit):
+            print(f"{hit['score']:8.2f}  {hit['filename']}")
+            print(f"          {hit['snippet']}")
+        print("\nFacets:")
+        for field, counts in index.facets(args.query, args.grade, args.subject, args.doc_type).items():
+            print(f"  {field}: " + ", ".join(f"{value} ({count})" for value, count in counts.items()))
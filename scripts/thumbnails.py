@@ -0,0 +1,233 @@
+import os
+import io
+import time
+import shutil
+import zipfile
+import tempfile
+import subprocess
+from collections import deque
+from contextlib import nullcontext
+from concurrent.futures import ProcessPoolExecutor
+
+from instrumentation import configure_output, emit, entry_results, output_mode
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+try:
+    import pymupdf
+except ImportError:
+    try:
+        import fitz as pymupdf
+    except ImportError:
+        pymupdf = None
+
+# Public URL of THUMBNAILS_FOLDER as served by the storefront
+THUMBNAIL_URL_PREFIX = '/images/products'
+
+# Thumbnail widths in pixels; height follows the page's aspect ratio
+THUMBNAIL_SIZES = {
+    'sm': 160,
+    'md': 320,
+    'lg': 640
+}
+
+THUMBNAIL_FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpg': ('JPEG', {'quality': 85, 'optimize': True, 'progressive': True})
+}
+
+# Size and format stored in the product's single `thumbnail` field
+DEFAULT_THUMBNAIL = ('md', 'jpg')
+
+# Embedded previews that Office writes into OOXML packages
+OOXML_THUMBNAILS = ['docProps/thumbnail.jpeg', 'docProps/thumbnail.jpg', 'docProps/thumbnail.png']
+
+# Seconds allowed for a LibreOffice conversion before giving up
+SOFFICE_TIMEOUT = 120
+
+def thumbnails_available():
+    """True if Pillow is installed, the minimum needed to write thumbnails"""
+    return Image is not None
+
+def thumbnail_name(content_hash, size, fmt):
+    """Content-hash keyed filename, so identical documents share thumbnails"""
+    return f"{content_hash[:20]}-{size}.{fmt}"
+
+def thumbnail_urls(content_hash):
+    """Public URLs of every size and format for one document"""
+    return {
+        size: {fmt: f"{THUMBNAIL_URL_PREFIX}/{thumbnail_name(content_hash, size, fmt)}"
+               for fmt in THUMBNAIL_FORMATS}
+        for size in THUMBNAIL_SIZES
+    }
+
+def thumbnails_exist(content_hash, output_dir):
+    """True if every size and format has already been rendered for this content"""
+    return all(
+        os.path.exists(os.path.join(output_dir, thumbnail_name(content_hash, size, fmt)))
+        for size in THUMBNAIL_SIZES
+        for fmt in THUMBNAIL_FORMATS
+    )
+
+def render_pdf_page(pdf_path, width):
+    """Rasterize the first page of a PDF at the given width"""
+    if pymupdf is None:
+        return None
+    with pymupdf.open(pdf_path) as doc:
+        if doc.page_count == 0:
+            return None
+        page = doc.load_page(0)
+        zoom = width / page.rect.width
+        pixmap = page.get_pixmap(matrix=pymupdf.Matrix(zoom, zoom), alpha=False)
+        return Image.frombytes('RGB', (pixmap.width, pixmap.height), pixmap.samples)
+
+def read_embedded_thumbnail(file_path):
+    """Return the preview image Office embeds in .docx/.xlsx/.pptx packages"""
+    try:
+        with zipfile.ZipFile(file_path) as package:
+            names = set(package.namelist())
+            for name in OOXML_THUMBNAILS:
+                if name in names:
+                    image = Image.open(io.BytesIO(package.read(name)))
+                    image.load()
+                    return image
+    except (zipfile.BadZipFile, OSError):
+        pass
+    return None
+
+def render_with_soffice(file_path, width):
+    """Convert an Office document to PDF with a local LibreOffice and render page one"""
+    soffice = shutil.which('soffice') or shutil.which('libreoffice')
+    if soffice is None or pymupdf is None:
+        return None
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        try:
+            subprocess.run(
+                [soffice, '--headless', '--convert-to', 'pdf', '--outdir', tmp_dir, file_path],
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                timeout=SOFFICE_TIMEOUT, check=True
+            )
+        except (subprocess.SubprocessError, OSError):
+            return None
+        pdf_path = os.path.join(tmp_dir, os.path.splitext(os.path.basename(file_path))[0] + '.pdf')
+        if not os.path.exists(pdf_path):
+            return None
+        return render_pdf_page(pdf_path, width)
+
+def render_first_page(file_path, file_type):
+    """Render a first-page preview with the best locally available renderer"""
+    width = max(THUMBNAIL_SIZES.values())
+    if file_type == 'pdf':
+        return render_pdf_page(file_path, width)
+    if file_type in ('word', 'excel', 'powerpoint'):
+        return read_embedded_thumbnail(file_path) or render_with_soffice(file_path, width)
+    return None
+
+def save_image(image, path, fmt):
+    """Write an image atomically so concurrent workers never expose partial files"""
+    pil_format, options = THUMBNAIL_FORMATS[fmt]
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    image.save(tmp_path, pil_format, **options)
+    os.replace(tmp_path, path)
+
+def generate_thumbnail(file_path, file_type, content_hash, output_dir):
+    """Render every size and format for one document; returns the URL map or None"""
+    if thumbnails_exist(content_hash, output_dir):
+        return thumbnail_urls(content_hash)
+    try:
+        page = render_first_page(file_path, file_type)
+        if page is None:
+            return None
+        page = page.convert('RGB')
+        for size, width in THUMBNAIL_SIZES.items():
+            image = page.copy()
+            image.thumbnail((width, width * 2), Image.LANCZOS)
+            for fmt in THUMBNAIL_FORMATS:
+                save_image(image, os.path.join(output_dir, thumbnail_name(content_hash, size, fmt)), fmt)
+        return thumbnail_urls(content_hash)
+    except Exception as e:
+        emit('thumbnail_error', [f"    ⚠️  Error rendering thumbnail for {os.path.basename(file_path)}: {e}"],
+             path=file_path, error=str(e))
+        return None
+
+def timed_thumbnail(file_path, file_type, content_hash, output_dir):
+    """generate_thumbnail plus the seconds it took, for the stage profile"""
+    start = time.perf_counter()
+    urls = generate_thumbnail(file_path, file_type, content_hash, output_dir)
+    return urls, time.perf_counter() - start
+
+def apply_thumbnail(result, urls):
+    """Record the rendered thumbnail URLs on an organizer result"""
+    if urls:
+        size, fmt = DEFAULT_THUMBNAIL
+        result['thumbnail'] = urls[size][fmt]
+        result['thumbnails'] = urls
+
+def _needs_thumbnail(result, output_dir):
+    return (result is not None
+            and result.get('content_hash')
+            and not result.get('alias_of')
+            and result.get('file_type') != 'archive'
+            and not (result.get('thumbnail') and thumbnails_exist(result['content_hash'], output_dir)))
+
+def _bundle_thumbnail(entry):
+    """A bundle has no first page of its own, so it shows its first member's"""
+    bundle = entry.get('result')
+    if bundle and bundle.get('file_type') == 'archive' and not bundle.get('thumbnail'):
+        first = next((m for m in entry.get('members', ()) if m.get('thumbnail')), None)
+        if first:
+            apply_thumbnail(bundle, first['thumbnails'])
+
+def iter_thumbnailed(records, output_dir, workers=1, profile=None, executor=None):
+    """Add thumbnails to a stream of (key, manifest entry) records, preserving order
+
+    Rendering runs in a process pool with a bounded number of documents in
+    flight: executor if one is shared with the other stages, otherwise a pool
+    of its own. Records whose content already has thumbnails pass straight
+    through. Archive members are rendered like any other document.
+    """
+    if not thumbnails_available():
+        emit('thumbnails_disabled', ["⚠️  Pillow is not installed, skipping thumbnails"])
+        yield from records
+        return
+
+    os.makedirs(output_dir, exist_ok=True)
+    if workers <= 1:
+        for key, entry in records:
+            for result in entry_results(entry):
+                if _needs_thumbnail(result, output_dir):
+                    urls, seconds = timed_thumbnail(
+                        result['new_path'], result['file_type'], result['content_hash'], output_dir)
+                    apply_thumbnail(result, urls)
+                    if profile:
+                        profile.record('thumbnail', result['file_type'], seconds)
+            _bundle_thumbnail(entry)
+            yield key, entry
+        return
+
+    with nullcontext(executor) if executor else ProcessPoolExecutor(
+            max_workers=workers, initializer=configure_output, initargs=(output_mode(),)) as executor:
+        pending = deque()
+
+        def finish():
+            (key, entry), futures = pending.popleft()
+            for result, future in futures:
+                urls, seconds = future.result()
+                apply_thumbnail(result, urls)
+                if profile:
+                    profile.record('thumbnail', result['file_type'], seconds)
+            _bundle_thumbnail(entry)
+            return key, entry
+
+        for key, entry in records:
+            futures = [(result, executor.submit(timed_thumbnail, result['new_path'], result['file_type'],
+                                                result['content_hash'], output_dir))
+                       for result in entry_results(entry) if _needs_thumbnail(result, output_dir)]
+            pending.append(((key, entry), futures))
+            while len(pending) > workers * 4:
+                yield finish()
+        while pending:
+            yield finish()
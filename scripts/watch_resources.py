@@ -0,0 +1,463 @@
+import os
+import time
+import signal
+import argparse
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+
+from pymongo.errors import OperationFailure, PyMongoError
+
+import organize_pdfs
+from organize_pdfs import (
+    DUPLICATE_MODES, EXTRACTION_CACHE_FILENAME, EXTRACTION_CACHE_MB, EXTRACTOR_VERSION, MANIFEST_FILENAME,
+    OCR_CACHE_FOLDER, OCR_MAX_PAGES, RESULTS_FILENAME, SCAN_SUFFIXES, SEARCH_INDEX_FILENAME, STREAM_FILENAME,
+    alias_result, archive_supported, entry_results, format_file_size, get_file_type, hash_file, load_manifest,
+    manifest_entry, moved_members, ocr_available, plan_incremental, process_and_hash, process_archive,
+    process_scanned, release_outputs, remove_orphans, save_manifest, write_results
+)
+from import_to_database import (
+    build_upsert, deactivate_product, ensure_indexes, get_products_collection, write_batch
+)
+from catalogue_snapshots import SNAPSHOT_FOLDER, write_snapshots
+from extraction_cache import ExtractionCache
+from instrumentation import OUTPUT_MODES, announce, configure_output, emit, output_mode
+from pdf_optimizer import MIN_SAVINGS, iter_optimized, optimizer_available
+from placement import PLACEMENT_MODES
+from scanner import scan_files
+from search_index import SearchIndex
+from thumbnails import iter_thumbnailed, thumbnails_available
+from watcher import POLL_INTERVAL, Debouncer, open_watcher, watched
+
+# Seconds a file must go without changing before it is organized
+DEBOUNCE_SECONDS = 2.0
+
+# Longest wait for filesystem events before checking for settled files and finished work
+TICK_SECONDS = 0.5
+
+# While files keep arriving, the manifest, results and search index are saved at least this often
+FLUSH_SECONDS = 10.0
+
+def _init_worker(mode):
+    # Ctrl+C is for the watcher, which finishes the files in flight before exiting
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    configure_output(mode)
+
+def organize_watched(file_path, output_base_dir, content_hash, placement='copy', ocr=False,
+                     cache_path=None, thumbnails_dir=None, min_savings=None):
+    """Organize one settled file or archive in a worker; returns its manifest entry
+
+    Scanned PDFs are OCR'd straight away when ocr is on, PDFs are optimized
+    when min_savings is set, and thumbnails are rendered before the entry
+    comes back, so it is ready for the catalogue.
+    """
+    if get_file_type(file_path) == 'archive':
+        entry = process_archive(file_path, output_base_dir, content_hash=content_hash, placement=placement,
+                                cache_path=cache_path)
+    else:
+        entry = process_and_hash(file_path, output_base_dir, content_hash, placement, ocr, cache_path)
+        if entry.pop('_ocr', False):
+            entry['result'], entry['_text'], _ = process_scanned(
+                file_path, output_base_dir, content_hash, placement,
+                os.path.join(output_base_dir, OCR_CACHE_FOLDER), OCR_MAX_PAGES)
+    if min_savings is not None:
+        for _ in iter_optimized([(file_path, entry)], format_file_size, min_savings):
+            pass
+    if thumbnails_dir:
+        for _ in iter_thumbnailed([(file_path, entry)], thumbnails_dir):
+            pass
+    return entry
+
+def index_entry(search_index, entry):
+    """Add an entry's documents to the search index, dropping the worker-only fields"""
+    text = entry.pop('_text', None)
+    texts = entry.pop('_member_texts', None)
+    entry.pop('_timings', None)
+    entry.pop('_member_timings', None)
+    if search_index is None:
+        return
+    if texts is not None:
+        for member, member_text in zip(entry['members'], texts):
+            search_index.upsert(member, member_text)
+        if entry['result']:
+            search_index.upsert(entry['result'], " ".join(texts))
+    elif text is not None and entry['result']:
+        search_index.upsert(entry['result'], text)
+
+def watch(workers=2, duplicates='alias', placement='copy', thumbnails=True, index=True, ocr=False,
+          catalogue=True, collection=None, uri=None, debounce=DEBOUNCE_SECONDS, poll_interval=POLL_INTERVAL,
+          polling=False, cache_mb=EXTRACTION_CACHE_MB, optimize=False, min_savings=MIN_SAVINGS,
+          snapshot_dir=SNAPSHOT_FOLDER):
+    """Organize files as they arrive in RESOURCES_FOLDER and put them in the catalogue, until stopped
+
+    Changes are picked up from inotify (or by polling where it is missing),
+    held until the file has settled, and only the changed paths are
+    processed, at most workers * 2 at a time. Each organized file is upserted
+    into the products collection as soon as it is done. Products whose file
+    is deleted or reclassified to another name are deactivated. On start,
+    anything that changed while nothing was watching is caught up with one
+    incremental scan. Runs until Ctrl+C or SIGTERM, then finishes the files
+    in flight and saves the manifest, results and search index. Whenever
+    the catalogue changed, storefront snapshots are rewritten into
+    snapshot_dir (None to skip) as part of the periodic save. collection
+    may be any pymongo-compatible products collection.
+    """
+    resources = organize_pdfs.RESOURCES_FOLDER
+    organized = organize_pdfs.ORGANIZED_FOLDER
+    announce("=" * 80)
+    announce("CAPS RESOURCES WATCHER")
+    announce("=" * 80)
+
+    if not os.path.exists(resources):
+        announce(f"❌ Resources folder not found: {resources}")
+        return
+    os.makedirs(organized, exist_ok=True)
+    thumbnails_dir = None
+    if thumbnails:
+        if thumbnails_available():
+            thumbnails_dir = organize_pdfs.THUMBNAILS_FOLDER
+            os.makedirs(thumbnails_dir, exist_ok=True)
+        else:
+            announce("⚠️  Pillow is not installed, skipping thumbnails")
+    if ocr and not ocr_available():
+        announce("⚠️  OCR needs PyMuPDF and a tesseract binary on PATH, continuing without OCR")
+        ocr = False
+    if optimize and not optimizer_available():
+        announce("⚠️  Neither PyMuPDF, qpdf nor pikepdf is installed, skipping PDF optimization")
+        optimize = False
+
+    if not catalogue:
+        collection = None
+    elif collection is None:
+        collection = get_products_collection(uri)
+    if collection is not None:
+        try:
+            ensure_indexes(collection)
+        except OperationFailure as e:
+            announce(f"❌ Could not create unique index on pdfFileName: {e}")
+            return
+
+    manifest_path = os.path.join(organized, MANIFEST_FILENAME)
+    stream_path = os.path.join(organized, STREAM_FILENAME)
+    results_file = os.path.join(organized, RESULTS_FILENAME)
+    manifest = load_manifest(manifest_path)
+    cache_path = os.path.join(organized, EXTRACTION_CACHE_FILENAME) if cache_mb else None
+    if cache_path:
+        ExtractionCache(cache_path, EXTRACTOR_VERSION).close()
+    search_index = SearchIndex(os.path.join(organized, SEARCH_INDEX_FILENAME)) if index else None
+
+    # Watch before the catch-up scan, so nothing that changes during it is missed
+    watcher, fallback = open_watcher(resources, SCAN_SUFFIXES, poll_interval, polling=polling)
+    debouncer = Debouncer(debounce)
+    backlog = deque()
+    in_flight = {}
+    by_hash = {}
+    unsent = []
+    counts = Counter()
+    state = {'dirty': False, 'retired': False, 'catalogued': False, 'flushed': time.monotonic(), 'stop': False}
+
+    def organized_names():
+        return {result['new_filename'] for entry in manifest.values() for result in entry_results(entry)
+                if not result.get('alias_of')}
+
+    def remember(file_path, entry):
+        if entry.get('hash') and entry['result'] and not entry['result'].get('alias_of'):
+            by_hash[entry['hash']] = file_path
+
+    def send(operations):
+        if collection is None or not operations:
+            return
+        try:
+            counts['errors'] += write_batch(collection, operations)[3]
+            state['catalogued'] = bool(snapshot_dir)
+        except PyMongoError as e:
+            # The database is unreachable; keep the changes for the next save
+            emit('error', [f"  ❌ Catalogue update failed, will retry: {e}"], error=str(e))
+            unsent.extend(operations)
+
+    def publish(entry):
+        results = [result for result in entry_results(entry)
+                   if not (result.get('alias_of') or result.get('near_duplicate_of'))]
+        send([build_upsert(result, activate=True) for result in results])
+        for result in results:
+            emit('catalogued', [f"  🛒 In the catalogue: {result['new_filename']}"],
+                 path=result['original_path'], name=result['new_filename'])
+
+    def retire(results):
+        """Deactivate the products of results no longer organized from any source"""
+        names = {result['new_filename'] for result in results if not result.get('alias_of')}
+        names -= organized_names()
+        if not names:
+            return
+        state['retired'] = True
+        counts['deactivated'] += len(names)
+        send([deactivate_product(name) for name in sorted(names)])
+        for name in sorted(names):
+            emit('deactivated', [f"  🚫 Deactivated: {name}"], name=name)
+
+    def replace(file_path, entry):
+        old = manifest.get(file_path)
+        manifest[file_path] = entry
+        remember(file_path, entry)
+        state['dirty'] = True
+        if old:
+            retire(entry_results(old))
+
+    def catch_up():
+        """Queue every file that changed while nothing was watching"""
+        nonlocal manifest
+        reused, renamed, pending = plan_incremental(scan_files(resources, SCAN_SUFFIXES), manifest)
+        pending_paths = set(pending)
+        gone = {}
+        kept = {}
+        for file_path, entry in manifest.items():
+            if file_path in reused:
+                continue
+            if file_path in pending_paths or (entry['result'] or {}).get('placement') == 'move':
+                kept[file_path] = entry
+            else:
+                gone[file_path] = entry
+        manifest = {**kept, **reused}
+        by_hash.clear()
+        for file_path, entry in manifest.items():
+            remember(file_path, entry)
+        announce(f"♻️  Unchanged: {len(reused) - renamed} | Renamed/moved: {renamed} | "
+                 f"To organize: {len(pending)} | Gone: {len(gone)}")
+        retire([result for entry in gone.values() for result in entry_results(entry)])
+        settled = time.monotonic() - debounce
+        for file_path in pending:
+            debouncer.touch(file_path, settled)
+        state['dirty'] = state['dirty'] or bool(gone or renamed)
+
+    def settle(file_path, stat_signature):
+        """Decide what a settled change needs: nothing, a manifest update, or a worker"""
+        entry = manifest.get(file_path)
+        if stat_signature is None:
+            if entry is None or (entry['result'] or {}).get('placement') == 'move':
+                return
+            del manifest[file_path]
+            state['dirty'] = True
+            counts['removed'] += 1
+            emit('removed', [f"\n🗑️  Removed: {os.path.basename(file_path)}"], path=file_path)
+            retire(entry_results(entry))
+            return
+        if entry and (entry['size'], entry['mtime']) == stat_signature:
+            return
+        try:
+            stat = os.stat(file_path)
+            content_hash = hash_file(file_path)
+        except OSError:
+            return
+        if entry and entry['hash'] == content_hash:
+            # Touched but not modified
+            manifest[file_path] = dict(entry, size=stat.st_size, mtime=stat.st_mtime_ns)
+            state['dirty'] = True
+            return
+        if any(queued_hash == content_hash for _, queued_hash in in_flight.values()):
+            # An identical file is being organized; decide once it is done
+            debouncer.touch(file_path)
+            return
+
+        canonical_path = by_hash.get(content_hash)
+        if canonical_path and canonical_path != file_path:
+            canonical = manifest[canonical_path]
+            if not os.path.exists(canonical_path):
+                # Renamed or moved: the earlier result follows the file
+                manifest.pop(canonical_path)
+                result = dict(canonical['result'], original_path=file_path)
+                replace(file_path, manifest_entry(stat, content_hash, result, canonical.get('quick'),
+                                                  moved_members(canonical.get('members'), file_path)))
+                counts['moved'] += 1
+                emit('moved', [f"\n📁 Moved: {os.path.basename(canonical_path)} -> {file_path}"],
+                     path=file_path, previous=canonical_path)
+                return
+            if duplicates != 'copy':
+                replace(file_path, manifest_entry(stat, content_hash,
+                                                  alias_result(file_path, canonical['result'], duplicates)))
+                counts['duplicates'] += 1
+                return
+
+        if get_file_type(file_path) == 'archive' and not archive_supported(file_path):
+            emit('skipped', [f"⚠️  No library installed for {os.path.basename(file_path)}, skipping..."],
+                 path=file_path, reason='archive format not supported')
+            return
+        if entry:
+            # Changed content: the new copy takes the old one's name
+            release_outputs({file_path: entry}, manifest)
+        backlog.append((file_path, content_hash))
+
+    def complete(future):
+        file_path, content_hash = in_flight.pop(future)
+        try:
+            entry = future.result()
+        except Exception as e:
+            emit('error', [f"  ❌ Error processing {os.path.basename(file_path)}: {e}"],
+                 path=file_path, error=str(e))
+            return
+        index_entry(search_index, entry)
+        replace(file_path, entry)
+        if entry['result'] or entry.get('members'):
+            counts['organized'] += 1
+            publish(entry)
+        else:
+            counts['skipped'] += 1
+
+    def flush():
+        save_manifest(manifest_path, manifest)
+        if not in_flight:
+            # Nothing is being placed, so every journaled copy is recorded or orphaned
+            remove_orphans(organized, manifest)
+        write_results(manifest, stream_path, results_file)
+        if search_index:
+            if state['retired']:
+                search_index.retain(organized_names())
+            search_index.commit()
+        if unsent:
+            retry = list(unsent)
+            unsent.clear()
+            send(retry)
+        if state['catalogued'] and snapshot_dir:
+            try:
+                snapshot = write_snapshots(collection, snapshot_dir)
+                state['catalogued'] = False
+                emit('snapshot', [f"  🗂️  Catalogue snapshot {snapshot['version']}: "
+                                  f"{snapshot['products']} products in {snapshot['shards']} shards"], **snapshot)
+            except PyMongoError as e:
+                emit('error', [f"  ❌ Catalogue snapshot failed, will retry: {e}"], error=str(e))
+        state.update(dirty=False, retired=False, flushed=time.monotonic())
+
+    def stop(*_):
+        state['stop'] = True
+
+    signal.signal(signal.SIGTERM, stop)
+    announce(f"\n👀 Watching: {resources}")
+    announce(f"📤 Output directory: {organized}")
+    announce(f"⚙️  Workers: {workers} | Placement: {placement} | Settle time: {debounce}s")
+    announce("🔔 Change events: inotify" if fallback is None
+             else f"🔔 Change events: polling every {poll_interval}s ({fallback})")
+    announce("🛒 Catalogue: " + ("updated as files are organized" if collection is not None else "off"))
+    removed, _ = remove_orphans(organized, manifest)
+    if removed:
+        announce(f"🧹 Removed {removed} organized copies a stopped watcher never recorded")
+    if collection is not None and snapshot_dir:
+        announce(f"🗂️  Snapshots: {snapshot_dir}")
+    catch_up()
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(output_mode(),)) as executor:
+        try:
+            while not state['stop']:
+                changed, overflow = watcher.poll(TICK_SECONDS)
+                if overflow:
+                    announce("⚠️  Too many changes at once for inotify, rescanning")
+                    catch_up()
+                now = time.monotonic()
+                for file_path in changed:
+                    if watched(file_path, SCAN_SUFFIXES):
+                        debouncer.touch(file_path, now)
+
+                # Deletions last, so a move's new path claims the old result before the old path lets it go
+                busy = {file_path for file_path, _ in in_flight.values()}
+                busy.update(file_path for file_path, _ in backlog)
+                for file_path, stat_signature in sorted(debouncer.ready(now), key=lambda item: item[1] is None):
+                    if file_path in busy:
+                        debouncer.touch(file_path, now)
+                        continue
+                    settle(file_path, stat_signature)
+
+                while backlog and len(in_flight) < workers * 2:
+                    file_path, content_hash = backlog.popleft()
+                    future = executor.submit(organize_watched, file_path, organized, content_hash, placement,
+                                             ocr, cache_path, thumbnails_dir,
+                                             min_savings if optimize else None)
+                    in_flight[future] = (file_path, content_hash)
+                for future in [future for future in in_flight if future.done()]:
+                    complete(future)
+
+                idle = not (in_flight or backlog or len(debouncer))
+                if (state['dirty'] or unsent) and (idle or time.monotonic() - state['flushed'] >= FLUSH_SECONDS):
+                    flush()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            announce("\n⏹️  Stopping: finishing files in flight...")
+            for future in list(in_flight):
+                complete(future)
+            flush()
+            watcher.close()
+            if search_index:
+                search_index.close()
+            if cache_path:
+                with ExtractionCache(cache_path, EXTRACTOR_VERSION) as cache:
+                    cache.evict(cache_mb * 1024 * 1024)
+
+    announce("\n" + "=" * 80)
+    announce("WATCH SUMMARY")
+    announce("=" * 80)
+    announce(f"✅ Organized: {counts['organized']}")
+    announce(f"⚠️  Skipped: {counts['skipped']}")
+    announce(f"📁 Renamed/moved: {counts['moved']}")
+    announce(f"🔗 Duplicates: {counts['duplicates']}")
+    announce(f"🗑️  Removed: {counts['removed']}")
+    announce(f"🚫 Products deactivated: {counts['deactivated']}")
+    announce(f"❌ Catalogue errors: {counts['errors']}")
+    emit('summary', organized=counts['organized'], skipped=counts['skipped'], moved=counts['moved'],
+         duplicates=counts['duplicates'], removed=counts['removed'], deactivated=counts['deactivated'],
+         errors=counts['errors'], results=results_file)
+    return counts
+
+def parse_args(argv=None):
+    """Parse command-line options"""
+    parser = argparse.ArgumentParser(
+        description="Organize documents as they arrive and add them to the catalogue")
+    parser.add_argument('--resources', default=organize_pdfs.RESOURCES_FOLDER,
+                        help=f"folder to watch (default: {organize_pdfs.RESOURCES_FOLDER})")
+    parser.add_argument('--organized', default=organize_pdfs.ORGANIZED_FOLDER,
+                        help=f"where organized files and reports go (default: {organize_pdfs.ORGANIZED_FOLDER})")
+    parser.add_argument('--thumbnails-dir', default=organize_pdfs.THUMBNAILS_FOLDER,
+                        help=f"where thumbnails go (default: {organize_pdfs.THUMBNAILS_FOLDER})")
+    parser.add_argument('--workers', type=int, default=2,
+                        help="number of worker processes (default: 2)")
+    parser.add_argument('--duplicates', choices=DUPLICATE_MODES, default='alias',
+                        help="exact duplicates: record as alias (default), hardlink, or copy again")
+    parser.add_argument('--placement', choices=PLACEMENT_MODES, default='copy',
+                        help="how organized files are created (default: copy)")
+    parser.add_argument('--settle', type=float, default=DEBOUNCE_SECONDS, metavar='SECONDS',
+                        help=f"wait until a file has not changed for this long (default: {DEBOUNCE_SECONDS})")
+    parser.add_argument('--poll', action='store_true',
+                        help="rescan the folder instead of using inotify (e.g. for network shares)")
+    parser.add_argument('--poll-interval', type=float, default=POLL_INTERVAL, metavar='SECONDS',
+                        help=f"seconds between rescans when polling (default: {POLL_INTERVAL})")
+    parser.add_argument('--uri', help="MongoDB URI (default: MONGODB_URI from server/.env)")
+    parser.add_argument('--no-catalogue', dest='catalogue', action='store_false',
+                        help="organize only; do not write to MongoDB")
+    parser.add_argument('--snapshot-dir', default=SNAPSHOT_FOLDER,
+                        help=f"where storefront catalogue snapshots go (default: {SNAPSHOT_FOLDER})")
+    parser.add_argument('--no-snapshots', dest='snapshots', action='store_false',
+                        help="do not rewrite catalogue snapshots when the catalogue changes")
+    parser.add_argument('--ocr', action='store_true',
+                        help="OCR PDFs that have no text layer (needs a local tesseract)")
+    parser.add_argument('--cache-size', type=int, default=EXTRACTION_CACHE_MB, metavar='MB',
+                        help=f"extraction cache budget, 0 to disable (default: {EXTRACTION_CACHE_MB})")
+    parser.add_argument('--no-index', dest='index', action='store_false',
+                        help="skip the full-text search index")
+    parser.add_argument('--no-thumbnails', dest='thumbnails', action='store_false',
+                        help="skip first-page thumbnail rendering")
+    parser.add_argument('--optimize-pdfs', action='store_true',
+                        help="rewrite organized PDFs compressed and linearized for download")
+    parser.add_argument('--min-savings', type=float, default=MIN_SAVINGS * 100, metavar='PERCENT',
+                        help=f"keep the original unless optimizing saves this much (default: {MIN_SAVINGS:.0%})")
+    parser.add_argument('--output', choices=OUTPUT_MODES, default='text',
+                        help="per-file output: text (default), json lines, or quiet")
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    args = parse_args()
+    organize_pdfs.RESOURCES_FOLDER = args.resources
+    organize_pdfs.ORGANIZED_FOLDER = args.organized
+    organize_pdfs.THUMBNAILS_FOLDER = args.thumbnails_dir
+    configure_output(args.output)
+    watch(workers=args.workers, duplicates=args.duplicates, placement=args.placement,
+          thumbnails=args.thumbnails, index=args.index, ocr=args.ocr, catalogue=args.catalogue,
+          uri=args.uri, debounce=args.settle, poll_interval=args.poll_interval, polling=args.poll,
+          cache_mb=args.cache_size, optimize=args.optimize_pdfs, min_savings=args.min_savings / 100,
+          snapshot_dir=args.snapshot_dir if args.snapshots else None)
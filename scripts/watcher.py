@@ -0,0 +1,216 @@
+import os
+import sys
+import time
+import errno
+import select
+import struct
+import ctypes
+import ctypes.util
+
+from scanner import scan_files
+
+# inotify event bits (see inotify(7))
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+# struct inotify_event: wd, mask, cookie, len, then len bytes of NUL-padded name
+EVENT_HEADER = struct.Struct('iIII')
+
+# Seconds between rescans when inotify is not available
+POLL_INTERVAL = 5.0
+
+# Names uploaders and editors use while a file is still being written
+TEMPORARY_PREFIXES = ('.', '~$')
+TEMPORARY_SUFFIXES = ('.part', '.partial', '.crdownload', '.download', '.tmp')
+
+def watched(path, suffixes):
+    """True if a changed path is a document or archive worth organizing"""
+    name = os.path.basename(path).lower()
+    if name.startswith(TEMPORARY_PREFIXES) or name.endswith(TEMPORARY_SUFFIXES):
+        return False
+    return os.path.splitext(name)[1] in suffixes
+
+def signature(path):
+    """(size, mtime) of a file, or None if it is gone"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+class InotifyWatcher:
+    """Recursive inotify watch on a folder tree (Linux only)
+
+    poll() returns the paths created, written, moved or deleted since the last
+    call; nothing is rescanned. Directories created or moved into the tree are
+    watched as they appear, and the files already in them are reported.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.directories = {}
+        try:
+            self._watch_tree(root)
+        except OSError:
+            self.close()
+            raise
+
+    def _watch(self, directory):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(directory), WATCH_MASK)
+        if wd < 0:
+            error = ctypes.get_errno()
+            if error in (errno.ENOENT, errno.ENOTDIR):
+                return
+            # ENOSPC means fs.inotify.max_user_watches is too low for this tree
+            raise OSError(error, f"inotify_add_watch failed on {directory}: {os.strerror(error)}")
+        self.directories[wd] = directory
+
+    def _watch_tree(self, root):
+        """Watch root and every directory below it; returns the files already there"""
+        found = []
+        for directory, _, files in os.walk(root):
+            self._watch(directory)
+            found.extend(os.path.join(directory, name) for name in files)
+        return found
+
+    def _read(self):
+        data = b""
+        while True:
+            try:
+                chunk = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                return data
+            if not chunk:
+                return data
+            data += chunk
+
+    def poll(self, timeout):
+        """Wait up to timeout seconds; returns (changed paths, True if events were lost)"""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return [], False
+        data = self._read()
+        changed = set()
+        overflow = False
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            name = data[offset + EVENT_HEADER.size:offset + EVENT_HEADER.size + length].rstrip(b"\0")
+            offset += EVENT_HEADER.size + length
+            if mask & IN_Q_OVERFLOW:
+                overflow = True
+                continue
+            if mask & IN_IGNORED:
+                self.directories.pop(wd, None)
+                continue
+            directory = self.directories.get(wd)
+            if directory is None:
+                continue
+            path = os.path.join(directory, os.fsdecode(name))
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    changed.update(self._watch_tree(path))
+                continue
+            changed.add(path)
+        return sorted(changed), overflow
+
+    def close(self):
+        os.close(self.fd)
+
+class PollingWatcher:
+    """Fallback for platforms without inotify: rescan the tree every interval
+
+    Only directory entries are compared (size and mtime from scandir), so no
+    file is opened, but the whole tree is listed on every poll.
+    """
+
+    def __init__(self, root, suffixes, interval=POLL_INTERVAL, threads=1):
+        self.root = root
+        self.suffixes = suffixes
+        self.interval = interval
+        self.threads = threads
+        self.snapshot = self._scan()
+        self.next_scan = time.monotonic() + interval
+
+    def _scan(self):
+        return {path: (stat.st_size, stat.st_mtime_ns)
+                for path, stat in scan_files(self.root, self.suffixes, self.threads)}
+
+    def poll(self, timeout):
+        """Wait up to timeout seconds; returns (changed paths, False)"""
+        wait = self.next_scan - time.monotonic()
+        if wait > timeout:
+            time.sleep(timeout)
+            return [], False
+        time.sleep(max(0, wait))
+        self.next_scan = time.monotonic() + self.interval
+        previous, self.snapshot = self.snapshot, self._scan()
+        changed = [path for path, seen in self.snapshot.items() if previous.get(path) != seen]
+        changed += [path for path in previous if path not in self.snapshot]
+        return sorted(changed), False
+
+    def close(self):
+        pass
+
+def open_watcher(root, suffixes, poll_interval=POLL_INTERVAL, threads=1, polling=False):
+    """An InotifyWatcher on Linux, a PollingWatcher elsewhere or if inotify fails
+
+    Returns (watcher, reason for polling or None).
+    """
+    if polling:
+        return PollingWatcher(root, suffixes, poll_interval, threads), "polling requested"
+    if not sys.platform.startswith('linux'):
+        return PollingWatcher(root, suffixes, poll_interval, threads), f"no inotify on {sys.platform}"
+    try:
+        return InotifyWatcher(root), None
+    except (OSError, AttributeError) as e:
+        return PollingWatcher(root, suffixes, poll_interval, threads), str(e)
+
+class Debouncer:
+    """Hold changed paths until they stop changing
+
+    A path is released once no change has been seen for `quiet` seconds and
+    its size and mtime are the same as at the last change, so a file that is
+    still being uploaded (even over a share that sends no events) is held
+    back. Released paths that are gone come out with a None signature.
+    """
+
+    def __init__(self, quiet):
+        self.quiet = quiet
+        self.pending = {}
+
+    def __len__(self):
+        return len(self.pending)
+
+    def touch(self, path, now=None):
+        self.pending[path] = (now if now is not None else time.monotonic(), signature(path))
+
+    def ready(self, now=None):
+        """Pop and return (path, signature) for every path that has settled"""
+        now = now if now is not None else time.monotonic()
+        settled = []
+        for path, (seen, last) in list(self.pending.items()):
+            if now - seen < self.quiet:
+                continue
+            current = signature(path)
+            if current != last:
+                self.pending[path] = (now, current)
+                continue
+            del self.pending[path]
+            settled.append((path, current))
+        return settled
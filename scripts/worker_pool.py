@@ -0,0 +1,180 @@
+import os
+import time
+import multiprocessing
+from multiprocessing.connection import wait
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# How often the supervisor checks deadlines and memory while waiting on workers
+POLL_INTERVAL = 0.5
+
+# The address-space ceiling set inside workers, as a multiple of the RSS budget.
+# RSS is what the budget means; the ceiling only stops runaway allocations
+# between two polls.
+ADDRESS_SPACE_FACTOR = 2
+
+def _rss_bytes(pid):
+    """Resident set size of a process, or None where neither psutil nor /proc is available"""
+    if psutil is not None:
+        try:
+            return psutil.Process(pid).memory_info().rss
+        except psutil.Error:
+            return None
+    try:
+        with open(f'/proc/{pid}/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+def memory_limit_supported():
+    """Whether a worker's memory can be measured here (psutil, or /proc on Linux)"""
+    return _rss_bytes(os.getpid()) is not None
+
+def _worker_main(conn, initializer, initargs, memory_limit):
+    """Run tasks sent over conn until told to stop"""
+    if memory_limit and resource is not None:
+        ceiling = memory_limit * ADDRESS_SPACE_FACTOR
+        try:
+            resource.setrlimit(resource.RLIMIT_AS, (ceiling, ceiling))
+        except (ValueError, OSError):
+            pass
+    if initializer is not None:
+        initializer(*initargs)
+
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            return
+        if message is None:
+            return
+        index, func, args = message
+        try:
+            conn.send(('ok', index, func(*args)))
+        except MemoryError:
+            conn.send(('memory', index, "ran out of memory"))
+            return
+        except Exception as e:
+            conn.send(('error', index, f"{type(e).__name__}: {e}"))
+
+class IsolatedPool:
+    """Process pool that kills and replaces a worker stuck on, or bloated by, one task
+
+    Unlike ProcessPoolExecutor, every task runs under a wall-clock budget
+    (timeout, seconds) and a resident memory budget (memory_mb). A worker that
+    overruns either, or dies outright, is killed and replaced, and its task is
+    reported as failed with the reason instead of stalling the whole run.
+    """
+
+    def __init__(self, workers=1, timeout=None, memory_mb=None, initializer=None, initargs=()):
+        self.workers = max(1, workers)
+        self.timeout = timeout
+        self.memory_limit = memory_mb * 1024 * 1024 if memory_mb else None
+        self.initializer = initializer
+        self.initargs = initargs
+        self.context = multiprocessing.get_context()
+
+    def _start_worker(self):
+        parent_conn, child_conn = self.context.Pipe()
+        process = self.context.Process(
+            target=_worker_main,
+            args=(child_conn, self.initializer, self.initargs, self.memory_limit),
+            daemon=True
+        )
+        process.start()
+        child_conn.close()
+        return {'process': process, 'conn': parent_conn, 'task': None, 'started': None}
+
+    def _stop_worker(self, worker, kill=False):
+        process = worker['process']
+        if not kill:
+            try:
+                worker['conn'].send(None)
+            except OSError:
+                kill = True
+            process.join(timeout=1)
+        if process.is_alive():
+            process.kill()
+            process.join()
+        worker['conn'].close()
+
+    def _recycle(self, worker):
+        """Kill a worker and put a fresh one in its slot"""
+        self._stop_worker(worker, kill=True)
+        worker.update(self._start_worker())
+
+    def imap(self, func, arg_tuples):
+        """Yield (status, value) for each args tuple, in submission order
+
+        status is 'ok' (value is the return value) or one of 'error', 'timeout',
+        'memory' and 'crashed' (value is a human-readable reason).
+        """
+        tasks = enumerate(arg_tuples)
+        workers = [self._start_worker() for _ in range(self.workers)]
+        done = {}
+        next_index = 0
+        exhausted = False
+        try:
+            while True:
+                for worker in workers:
+                    # Results held back for ordering are capped, so a slow file does not let
+                    # the others run far ahead of what the caller has recorded
+                    if worker['task'] is None and not exhausted and len(done) < self.workers * 2:
+                        task = next(tasks, None)
+                        if task is None:
+                            exhausted = True
+                            break
+                        index, args = task
+                        worker['conn'].send((index, func, args))
+                        worker['task'] = index
+                        worker['started'] = time.monotonic()
+
+                while next_index in done:
+                    yield done.pop(next_index)
+                    next_index += 1
+
+                busy = [worker for worker in workers if worker['task'] is not None]
+                if not busy:
+                    if exhausted:
+                        return
+                    continue
+
+                ready = wait([worker['conn'] for worker in busy], timeout=POLL_INTERVAL)
+                for worker in busy:
+                    index = worker['task']
+                    if worker['conn'] in ready:
+                        try:
+                            status, _, value = worker['conn'].recv()
+                        except (EOFError, OSError):
+                            worker['process'].join(timeout=1)
+                            done[index] = ('crashed', f"worker died (exit code {worker['process'].exitcode})")
+                            self._recycle(worker)
+                            continue
+                        done[index] = (status, value)
+                        worker['task'] = None
+                        if status == 'memory':
+                            self._recycle(worker)
+                        continue
+
+                    elapsed = time.monotonic() - worker['started']
+                    if self.timeout and elapsed > self.timeout:
+                        done[index] = ('timeout', f"exceeded {self.timeout:g}s wall-clock budget")
+                        self._recycle(worker)
+                        continue
+
+                    rss = _rss_bytes(worker['process'].pid) if self.memory_limit else None
+                    if rss and rss > self.memory_limit:
+                        done[index] = ('memory', f"RSS {rss // (1024 * 1024)} MB exceeded "
+                                                 f"{self.memory_limit // (1024 * 1024)} MB budget")
+                        self._recycle(worker)
+        finally:
+            for worker in workers:
+                self._stop_worker(worker, kill=worker['task'] is not None)
@@ -27,7 +27,8 @@ const productSchema = new mongoose.Schema({
   },
   pdfFileName: {
     type: String,
-    required: true
+    required: true,
+    unique: true
   },
   fileSize: {
     type: String
@@ -35,9 +36,20 @@ const productSchema = new mongoose.Schema({
   pages: {
     type: Number
   },
+  textPreview: {
+    type: String
+  },
   thumbnail: {
     type: String
   },
+  memberCount: {
+    type: Number
+  },
+  bundleMembers: [String],
+  bundleFileName: {
+    type: String
+  },
+  alternateFiles: [String],
   category: {
     type: String,
     enum: ['worksheets', 'assessments', 'lesson-plans', 'activities', 'study-guides']
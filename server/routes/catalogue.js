@@ -0,0 +1,50 @@
+const express = require('express');
+const fs = require('fs');
+const path = require('path');
+const router = express.Router();
+
+// Written by scripts/import_to_database.py (see catalogue_snapshots.py)
+const catalogueDir = process.env.CATALOGUE_PATH || path.join(__dirname, '../../catalogue');
+
+// Shards and indexes are named by content hash, so they never change once written
+const HASHED_FILE = /^[\w-]+\.[0-9a-f]{16}\.json$/;
+const PRECOMPRESSED = { br: '.br', gzip: '.gz' };
+
+// Current version pointer: always revalidated
+router.get('/latest.json', (req, res) => {
+  res.set('Cache-Control', 'no-cache');
+  res.sendFile(path.join(catalogueDir, 'latest.json'), (err) => {
+    if (err && !res.headersSent) {
+      res.status(404).json({ message: 'Catalogue snapshot not found' });
+    }
+  });
+});
+
+// Snapshot files: the brotli or gzip copy when the browser accepts it, cached forever
+router.get('/:file', (req, res) => {
+  const { file } = req.params;
+  if (!HASHED_FILE.test(file)) {
+    return res.status(404).json({ message: 'Catalogue snapshot not found' });
+  }
+
+  let filePath = path.join(catalogueDir, file);
+  const encoding = req.acceptsEncodings('br', 'gzip');
+  if (encoding && fs.existsSync(filePath + PRECOMPRESSED[encoding])) {
+    filePath += PRECOMPRESSED[encoding];
+    res.set('Content-Encoding', encoding);
+  }
+
+  res.set({
+    'Content-Type': 'application/json; charset=utf-8',
+    'Cache-Control': 'public, max-age=31536000, immutable',
+    'Vary': 'Accept-Encoding'
+  });
+  res.sendFile(filePath, (err) => {
+    if (err && !res.headersSent) {
+      res.removeHeader('Content-Encoding');
+      res.status(404).json({ message: 'Catalogue snapshot not found' });
+    }
+  });
+});
+
+module.exports = router;
@@ -24,6 +24,9 @@ app.use('/api/products', require('./routes/products'));
 app.use('/api/orders', require('./routes/orders'));
 app.use('/api/download', require('./routes/download'));
 
+// Static catalogue snapshots for storefront browsing
+app.use('/catalogue', require('./routes/catalogue'));
+
 // Health check
 app.get('/health', (req, res) => {
   res.json({ 